@@ -0,0 +1,88 @@
+"""
+Benchmark of the extraction of Mupix objects from a parsed music21 score.
+
+The single traversal of :func:`mupix.typewise.extract_part` is compared with
+the previous extraction, which walked through every part once per category.
+
+	$ python -m benchmarks.parse --parts 8 --measures 200
+"""
+import timeit
+
+import click
+import music21
+
+from mupix.core import (
+	NoteObject,
+	RestObject,
+	TimeSignatureObject,
+	KeySignatureObject,
+	ClefObject,
+	SpannerObject,
+	DynamicObject,
+)
+from mupix.typewise import extract_part
+
+
+def build_score(parts: int, measures: int):
+	"""
+	Create a score with notes, rests, dynamics, hairpins and a key change every 8 measures.
+	"""
+	score = music21.stream.Score()
+	for part_number in range(parts):
+		part = music21.stream.Part(id=f"part{part_number}")
+		for measure_number in range(1, measures + 1):
+			measure = music21.stream.Measure(number=measure_number)
+			if measure_number == 1:
+				measure.append(music21.clef.TrebleClef())
+				measure.append(music21.meter.TimeSignature("4/4"))
+			if measure_number % 8 == 1:
+				measure.append(music21.key.KeySignature(measure_number % 7))
+				measure.insert(0, music21.dynamics.Dynamic("mf"))
+			notes = [music21.note.Note(pitch, quarterLength=1) for pitch in ("C4", "E4", "G4")]
+			measure.append(notes + [music21.note.Rest(quarterLength=1)])
+			part.insert(0, music21.dynamics.Crescendo(notes[0], notes[-1]))
+			part.append(measure)
+		score.insert(0, part)
+	return score
+
+
+def extract_multiple_traversals(part, parts_index):
+	"""
+	The extraction as it was before, one recursion per category.
+	"""
+	return {
+		"notes": [NoteObject(item, parts_index) for item in part.recurse().notes if not item.isChord],
+		"rests": [RestObject(item, parts_index) for item in part.recurse().notesAndRests if not item.isNote],
+		"timeSignatures": [TimeSignatureObject(item, parts_index) for item in part.recurse().getElementsByClass("TimeSignature")],  # noqa
+		"keySignatures": [KeySignatureObject(item, parts_index) for item in part.recurse().getElementsByClass("KeySignature")],  # noqa
+		"clefs": [ClefObject(item, parts_index) for item in part.recurse().getElementsByClass("Clef")],
+		"dynamics": [DynamicObject(item, parts_index) for item in part.recurse().getElementsByClass("Dynamic")],
+		"spanners": [
+			SpannerObject(item, parts_index)
+			for measure in part.recurse().getElementsByClass("Measure")
+			for item in measure.activeSite.spanners
+		],
+		"_keySignatures": [KeySignatureObject(item, parts_index) for item in part.recurse().getElementsByClass("KeySignature")],  # noqa
+	}
+
+
+@click.command()
+@click.option("--parts", default=4, help="Number of parts in the generated score.")
+@click.option("--measures", default=100, help="Number of measures in each part.")
+@click.option("--repeat", default=3, help="Number of timed runs, the best one is kept.")
+def main(parts, measures, repeat):
+	score = build_score(parts, measures)
+	score_parts = list(score.recurse().getElementsByClass("Part"))
+
+	def run(func):
+		return min(timeit.repeat(lambda: [func(part, index) for index, part in enumerate(score_parts, 1)], number=1, repeat=repeat))
+
+	before = run(extract_multiple_traversals)
+	after = run(extract_part)
+	print(f"{parts} parts, {measures} measures")
+	print(f"  multiple traversals: {before:.3f}s")
+	print(f"  single traversal:    {after:.3f}s ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+	main()
@@ -11,11 +11,10 @@ Documentation
 *************
 """
 
-from io import BytesIO
-
 from lxml import etree
 
 from mupix.extra import __return_root_path
+from mupix.inputs import InputFile
 from mupix.sequence_alignment import (
 	AffineNeedlemanWunsch,
 	AdvancedAffineNeedlemanWunsch
@@ -29,8 +28,8 @@ class BasicCompare(BaseCompareClass):
 	Using 1-to-1 comparisons based on the index of each element.
 	Obviously not ideal, but can be an interesting comparison.
 	"""
-	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = []):
-		super().__init__(true_filepath, test_filepath, do_not_count)
+	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = [], **parse_options):
+		super().__init__(true_filepath, test_filepath, do_not_count, **parse_options)
 		self._object_split()
 		self._total()
 
@@ -54,8 +53,8 @@ class SimpleNeedlemanWunsch(BaseCompareClass):
 
 		- Clefs           are aligned by measure number as a single char
 	"""
-	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = []):
-		super().__init__(true_filepath, test_filepath, do_not_count)
+	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = [], **parse_options):
+		super().__init__(true_filepath, test_filepath, do_not_count, **parse_options)
 		self.basic_sequence_alignment(func=AffineNeedlemanWunsch)
 		self._total()
 
@@ -65,8 +64,8 @@ class WeightedNeedlemanWunsch(BaseCompareClass):
 	Using a weighted version of Affine Needleman-Wunsch, the way it should be
 	used.
 	"""
-	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = []):
-		super().__init__(true_filepath, test_filepath, do_not_count)
+	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = [], **parse_options):
+		super().__init__(true_filepath, test_filepath, do_not_count, **parse_options)
 		self.sequence_alignment(func=AdvancedAffineNeedlemanWunsch)
 		self._total()
 
@@ -74,8 +73,8 @@ class WeightedNeedlemanWunsch(BaseCompareClass):
 class PartwiseWeightedNeedlemanWunsch(PartiwiseCompareClass):
 	"""
 	"""
-	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = []):
-		super().__init__(true_filepath, test_filepath, do_not_count)
+	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = [], **parse_options):
+		super().__init__(true_filepath, test_filepath, do_not_count, **parse_options)
 		self.sequence_alignment(func=AdvancedAffineNeedlemanWunsch)
 
 	# 	# Parse both files
@@ -101,8 +100,9 @@ class PartwiseWeightedNeedlemanWunsch(PartiwiseCompareClass):
 def xml_validator(musicxml_filepath, schema_filepath=__return_root_path() + "/tests/xml/musicxml.xsd"):
 	"""Return if the provided musicxml file is valid against the current musicxml schema.
 
-	:param [musicxml_filepath]: A character string that represents the filepath and filename of the file to open.
-	:type [musicxml_filepath]: String
+	:param [musicxml_filepath]: A character string that represents the filepath and filename of the file to open,
+		or a file that was already read.
+	:type [musicxml_filepath]: String or mupix.inputs.InputFile
 
 	:param [schema_filepath](optional): A character string that represents the filepath and filename of the schema to use.
 	:type [schema_filepath]: String
@@ -110,8 +110,7 @@ def xml_validator(musicxml_filepath, schema_filepath=__return_root_path() + "/te
 	:return: Returns a boolean value, either it is a valid MusicXML file or it is not.
 	:rtype: Bool
 	"""
-	with open(musicxml_filepath, "rb") as xml_file:
-		test = BytesIO(xml_file.read())
+	test = InputFile.open(musicxml_filepath).stream()
 
 	try:
 		xml_schema = etree.XMLSchema(etree.parse(schema_filepath))
@@ -123,21 +122,17 @@ def xml_validator(musicxml_filepath, schema_filepath=__return_root_path() + "/te
 
 def xml_type_finder(musicxml_filepath):
 	"""
-	Check if the xml file is written in a partwise or timewise fashion. This is just the fastest way
-	to check.
+	Check if the xml file is written in a partwise or timewise fashion. Only the
+	header of the file is looked at.
 
-	:param [filepath]: A character string that represents the filepath and filename of the file to open.
-	:type [filepath]: String
+	:param [filepath]: A character string that represents the filepath and filename of the file to open,
+		or a file that was already read.
+	:type [filepath]: String or mupix.inputs.InputFile
 
 	:return: Either a Partwise or a Timewise string will return.
 	:rtype: String
 	"""
-	with open(musicxml_filepath, "r") as xml_file:
-		for line in xml_file:
-			if "score-partwise" in line.lower():
-				return "Partwise"
-			elif "score-timewise" in line.lower():
-				return "Timewise"
-			else:
-				pass  # Leave room 
+	xml_type = InputFile.open(musicxml_filepath).xml_type
+	if xml_type is None:
 		raise Exception("File has neither time-wise or part-wise tags")
+	return xml_type
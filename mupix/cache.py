@@ -0,0 +1,255 @@
+"""
+A persistent cache of parsed symbolic music-files.
+
+Parsing is by far the slowest part of reading or comparing files, and the
+ground truths of a corpus are parsed again on every run. The cache stores the
+values of the extracted Mupix objects, so that a file that did not change is
+never parsed twice.
+
+Entries are content-addressed: the key is a hash of the file contents, the
+version of mupix and the reader options, so an edited file, a new release or a
+different reader simply miss the cache. Every entry is one compressed file in
+the cache directory. When the directory grows over its size limit, the least
+recently used entries are removed.
+
+Cached objects have no music21 object, they can't be visualized.
+
+Comparing many files with the same ground truth also keeps the parsed ground
+truth in memory (:data:`ground_truths`), so it is parsed once per process.
+"""
+import collections
+import copy
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import zlib
+
+import attr
+
+from mupix.core import CATEGORIES
+from mupix.inputs import InputFile
+
+# Bump when the layout of the cached data changes.
+_FORMAT_VERSION = 3
+_SUFFIX = ".mupix"
+
+
+def _version():
+	# mupix/__init__.py imports the commands, which import this module.
+	import mupix
+	return mupix.__version__
+
+
+def dump_markings(data: dict) -> bytes:
+	"""
+	Serialize the categories of a Mupix object (lists of Marking objects) and its
+	other values to compressed bytes. Each category is stored as its field names
+	and one tuple of values per object.
+	"""
+	payload = {"format": _FORMAT_VERSION}
+	for name, value in data.items():
+		if name in CATEGORIES:
+			fields = [field.name for field in attr.fields(CATEGORIES[name]) if field.name != "_music21_object"]
+			value = (fields, [tuple(getattr(marking, field) for field in fields) for marking in value])
+		payload[name] = value
+	return zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_markings(blob: bytes) -> dict:
+	"""
+	The inverse of :func:`dump_markings`, the Marking objects are detached.
+	"""
+	payload = pickle.loads(zlib.decompress(blob))
+	if payload.pop("format") != _FORMAT_VERSION:
+		raise ValueError("Unknown cache format.")
+	for name in CATEGORIES:
+		if name in payload:
+			fields, rows = payload[name]
+			payload[name] = [CATEGORIES[name].from_values(**dict(zip(fields, row))) for row in rows]
+	return payload
+
+
+@attr.s
+class ParseCache:
+	"""
+	A size-bounded directory of parsed symbolic music-files.
+
+	:param [directory]: Where the entries are stored, created if needed.
+	:type [directory]: String
+
+	:param [max_bytes]: The size of the directory above which the least recently used entries are removed.
+	:type [max_bytes]: Integer
+	"""
+	directory = attr.ib(type=str)
+	max_bytes = attr.ib(default=512 * 1024 * 1024, type=int)
+
+	def key(self, filepath, **options) -> str:
+		"""
+		Return the key of a file (a filepath or an InputFile) parsed with the given options.
+		"""
+		description = json.dumps(
+			{"digest": InputFile.open(filepath).digest, "version": _version(), "format": _FORMAT_VERSION, "options": options},
+			sort_keys=True,
+		)
+		return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+	def _path(self, key):
+		return os.path.join(self.directory, key + _SUFFIX)
+
+	def _entries(self):
+		"""
+		Return (last use, size, path) of every entry, least recently used first.
+		"""
+		if not os.path.isdir(self.directory):
+			return []
+		entries = []
+		for name in os.listdir(self.directory):
+			if name.endswith(_SUFFIX):
+				stat = os.stat(os.path.join(self.directory, name))
+				entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+		return sorted(entries)
+
+	def load(self, filepath, **options):
+		"""
+		Return the cached values of a file, or None if it was never stored.
+		"""
+		path = self._path(self.key(filepath, **options))
+		try:
+			with open(path, "rb") as f:
+				data = load_markings(f.read())
+		except (OSError, ValueError, EOFError, pickle.UnpicklingError, zlib.error):
+			return None
+		# Mark the entry as recently used.
+		os.utime(path)
+		return data
+
+	def store(self, filepath, data: dict, **options):
+		"""
+		Store the values of a parsed file, then remove old entries if the cache is too big.
+		"""
+		os.makedirs(self.directory, exist_ok=True)
+		path = self._path(self.key(filepath, **options))
+		# Write then rename, so that a concurrent reader never sees half an entry.
+		descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+		with os.fdopen(descriptor, "wb") as f:
+			f.write(dump_markings(data))
+		os.replace(temporary, path)
+		self.prune()
+
+	def prune(self, max_bytes=None):
+		"""
+		Remove the least recently used entries until the cache is below `max_bytes`
+		(the size limit of the cache by default).
+
+		:return: The number of removed entries.
+		:rtype: Integer
+		"""
+		max_bytes = self.max_bytes if max_bytes is None else max_bytes
+		entries = self._entries()
+		total = sum(size for _, size, _ in entries)
+		removed = 0
+		for _, size, path in entries:
+			if total <= max_bytes:
+				break
+			try:
+				os.remove(path)
+			except OSError:
+				continue
+			total -= size
+			removed += 1
+		return removed
+
+	def clear(self):
+		"""
+		Remove every entry.
+		"""
+		return self.prune(max_bytes=0)
+
+	def stats(self):
+		"""
+		Return the location, number of entries and size of the cache.
+		"""
+		entries = self._entries()
+		return {
+			"Directory": self.directory,
+			"Entries": len(entries),
+			"Bytes": sum(size for _, size, _ in entries),
+			"MaxBytes": self.max_bytes,
+		}
+
+
+def _isolated(mupix_object):
+	"""
+	A copy of a Mupix object whose Marking objects and error description can be
+	changed without changing the original.
+	"""
+	return attr.evolve(
+		mupix_object,
+		error_description=dict(mupix_object.error_description),
+		**{category: [copy.copy(marking) for marking in getattr(mupix_object, category)] for category in CATEGORIES},
+	)
+
+
+@attr.s
+class GroundTruthCache:
+	"""
+	An in-process, least recently used cache of parsed Mupix objects.
+
+	Entries are keyed by the absolute path, the modification time (of the archive,
+	for the members of an archive) and the hash of the file, and by the parse options. Every lookup returns a copy of the cached
+	object, so a comparison can't change what the next comparison gets. Only
+	detached objects are cached, a copy would still share the music21 objects.
+
+	:param [max_objects]: The number of Marking objects above which the least recently used entries are dropped.
+	:type [max_objects]: Integer
+	"""
+	max_objects = attr.ib(default=500000, type=int)
+	_entries = attr.ib(init=False, factory=collections.OrderedDict, repr=False)
+
+	def key(self, input_file, **options):
+		stat = os.stat(input_file.disk_path)
+		# The persistent cache is not an option of the parse itself.
+		options = sorted((name, repr(value)) for name, value in options.items() if name != "cache")
+		return (os.path.abspath(input_file.filepath), stat.st_mtime_ns, input_file.digest, tuple(options))
+
+	def get(self, filepath, parse, **options):
+		"""
+		Return a copy of the cached object of a file, calling `parse(input_file, **options)` the first time.
+
+		:param [parse]: The function that parses the file (an InputFile), usually `MupixObject.from_filepath`.
+		:type [parse]: Function
+		"""
+		if not options.get("detach"):
+			return parse(filepath, **options)
+
+		# The file is read once, for the key and for the parser.
+		input_file = InputFile.open(filepath)
+		key = self.key(input_file, **options)
+		try:
+			self._entries.move_to_end(key)
+		except KeyError:
+			self._entries[key] = parse(input_file, **options)
+			self._evict()
+		return _isolated(self._entries[key])
+
+	def _size(self, mupix_object):
+		return sum(len(getattr(mupix_object, category)) for category in CATEGORIES)
+
+	def _evict(self):
+		# The most recent entry is always kept.
+		total = sum(self._size(mupix_object) for mupix_object in self._entries.values())
+		while total > self.max_objects and len(self._entries) > 1:
+			_, mupix_object = self._entries.popitem(last=False)
+			total -= self._size(mupix_object)
+
+	def clear(self):
+		self._entries.clear()
+
+	def __len__(self):
+		return len(self._entries)
+
+
+# The ground truths of the comparisons made by this process.
+ground_truths = GroundTruthCache()
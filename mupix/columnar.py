@@ -0,0 +1,411 @@
+"""
+A columnar (struct-of-arrays) alternative to :class:`mupix.typewise.MupixObject`.
+
+Every category (notes, rests, etc.) is stored as one NumPy array per property
+instead of a list of Marking objects, so that sorting, filtering and comparing
+a property can be done for a whole score at once.
+
+There are three kinds of columns, chosen from the values of each property:
+
+	- Integers (part, measure, voice, octave, etc.) are stored as they are.
+	- Strings (onset, duration, name, etc.) are codes into a sorted vocabulary, sorting the codes sorts the strings.
+	- Anything else (beams, articulations, a mix of None and integers) is an object array.
+
+Iterating over a category gives lightweight row views that behave like the
+Marking objects they were built from (attributes, `asdict`, `asname`, equality),
+so the output and comparison code keeps working unchanged.
+"""
+import operator
+
+import attr
+import numpy
+
+from mupix.core import (
+	CATEGORIES,
+	Marking,
+	output_fields,
+)
+from mupix.extra import (
+	STEP_SEMITONES,
+	tonic_semitones,
+)
+
+_INTEGER = "integer"
+_CODED = "coded"
+_OBJECT = "object"
+_INTEGER_TYPES = {int}
+_CODED_TYPES = {str, type(None)}
+
+
+def _fields(marking_class):
+	"""
+	The names of the properties of a Marking class, without the music21 object.
+	The ticks are columns too, they are not shown.
+	"""
+	return [field.name for field in attr.fields(marking_class) if field.name != "_music21_object"]
+
+
+def _column_kind(values):
+	types = set(map(type, values))
+	if types <= _INTEGER_TYPES:
+		return _INTEGER
+	if types <= _CODED_TYPES:
+		return _CODED
+	return _OBJECT
+
+
+def _build_column(values):
+	"""
+	Return the kind, the array and the vocabulary (or None) of a column.
+	"""
+	kind = _column_kind(values)
+	if kind == _INTEGER:
+		return kind, numpy.array(values, dtype=numpy.int64), None
+	if kind == _CODED:
+		# None comes first, then the strings in the same order as `sorted`.
+		vocabulary = sorted(set(values), key=lambda value: (value is not None, value or ""))
+		codes = {value: code for code, value in enumerate(vocabulary)}
+		return kind, numpy.fromiter(map(codes.__getitem__, values), dtype=numpy.int32, count=len(values)), vocabulary
+	array = numpy.empty(len(values), dtype=object)
+	array[:] = values
+	return kind, array, None
+
+
+class MarkingView:
+	"""
+	A row of a :class:`ColumnarCategory`, read like the Marking object it replaces.
+	The values are only looked up when they are read.
+	"""
+	__slots__ = ("_category", "_index")
+
+	def __init__(self, category, index):
+		self._category = category
+		self._index = index
+
+	def __getattr__(self, name):
+		if name == "_music21_object":
+			return None
+		return self._category.value(name, self._index)
+
+	def __repr__(self):
+		values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._category.fields)
+		return f"{self._category.marking_class.__name__}View({values})"
+
+	def __eq__(self, other):
+		if not isinstance(other, (MarkingView, Marking)):
+			return NotImplemented
+		if self._category.marking_class is not _marking_class(other):
+			return NotImplemented
+		return all(getattr(self, name) == getattr(other, name) for name in self._category.eq_fields)
+
+	def __ne__(self, other):
+		result = self.__eq__(other)
+		return result if result is NotImplemented else not result
+
+	__hash__ = None
+
+	def asdict(self):
+		"""
+		Return the row as a JSON serializable python dictionary, like :func:`mupix.core.Marking.asdict`.
+		"""
+		return {
+			name: list(value) if isinstance(value, (set, tuple, list)) else value
+			for name, value in ((name, getattr(self, name)) for name in self._category.fields)
+		}
+
+	def _values(self):
+		return {name: getattr(self, name) for name in self._category.columns}
+
+	def asname(self):
+		"""
+		Returns the name of the category, like :func:`mupix.core.Marking.asname`.
+		"""
+		string = self._category.marking_class.__name__.replace("Object", "")
+		return string[0].lower() + string[1:] + "s"
+
+	def to_marking(self):
+		"""
+		Return a detached Marking object with the values of the row.
+		"""
+		return self._category.marking_class.from_values(**self._values())
+
+
+def _marking_class(item):
+	if isinstance(item, MarkingView):
+		return item._category.marking_class
+	return type(item)
+
+
+@attr.s
+class ColumnarCategory:
+	"""
+	All the objects of one category (notes, rests, etc.) of a score, as columns.
+
+	:param [marking_class]: The Marking class of the rows (NoteObject, RestObject, etc.)
+	:type [marking_class]: Class
+
+	:param [columns]: The NumPy array of each property.
+	:type [columns]: Dictionary
+
+	:param [vocabularies]: The sorted values of each coded property.
+	:type [vocabularies]: Dictionary
+	"""
+	marking_class = attr.ib()
+	columns = attr.ib(repr=False)
+	vocabularies = attr.ib(repr=False)
+	length = attr.ib(type=int)
+
+	@classmethod
+	def from_markings(cls, marking_class, markings, names=None):
+		"""
+		Build the columns from a list of Marking objects (or row views) of the same class.
+
+		:param [names]: The properties to make columns of, every property when None.
+		:type [names]: Iterable
+		"""
+		columns, vocabularies = {}, {}
+		for name in _fields(marking_class) if names is None else names:
+			kind, array, vocabulary = _build_column(list(map(operator.attrgetter(name), markings)))
+			columns[name] = array
+			if kind == _CODED:
+				vocabularies[name] = vocabulary
+		return cls(marking_class, columns, vocabularies, len(markings))
+
+	@property
+	def fields(self):
+		return list(output_fields(self.marking_class))
+
+	@property
+	def eq_fields(self):
+		return [field.name for field in attr.fields(self.marking_class) if field.eq and field.name != "_music21_object"]
+
+	def __len__(self):
+		return self.length
+
+	def __iter__(self):
+		return (MarkingView(self, index) for index in range(self.length))
+
+	def __getitem__(self, key):
+		"""
+		An integer gives a row view. A slice, an array of indices or a boolean mask
+		gives a new category with the selected rows.
+		"""
+		if isinstance(key, (int, numpy.integer)):
+			if key < 0:
+				key += self.length
+			if not 0 <= key < self.length:
+				raise IndexError(key)
+			return MarkingView(self, int(key))
+		return self.take(numpy.arange(self.length)[key])
+
+	def value(self, name, index):
+		"""
+		The value of a property for one row, with the same type as in the Marking object.
+		"""
+		try:
+			value = self.columns[name][index]
+		except KeyError:
+			raise AttributeError(f"'{self.marking_class.__name__}' has no attribute '{name}'")
+		if name in self.vocabularies:
+			return self.vocabularies[name][value]
+		if isinstance(value, numpy.integer):
+			return int(value)
+		return value
+
+	def values(self, name):
+		"""
+		All the values of a property. Coded properties are decoded, use `codes` to
+		work with integers.
+		"""
+		if name in self.vocabularies:
+			vocabulary = numpy.empty(len(self.vocabularies[name]), dtype=object)
+			vocabulary[:] = self.vocabularies[name]
+			return vocabulary[self.columns[name]]
+		return self.columns[name]
+
+	def codes(self, name):
+		"""
+		The sortable integer codes of a property (the values of integer properties).
+		"""
+		if self.columns[name].dtype == object:
+			raise ValueError(f"{name} holds objects, it has no integer codes.")
+		return self.columns[name]
+
+	def take(self, indices):
+		"""
+		Return a new category with the rows at the given indices, in that order.
+		"""
+		indices = numpy.asarray(indices, dtype=numpy.int64)
+		columns = {name: array[indices] for name, array in self.columns.items()}
+		return attr.evolve(self, columns=columns, length=len(indices))
+
+	def filter(self, mask):
+		"""
+		Return a new category with the rows where the boolean mask is True.
+		"""
+		return self.take(numpy.flatnonzero(mask))
+
+	def argsort(self, *names):
+		"""
+		The indices that sort the rows by the given properties, like
+		`sorted(markings, key=operator.attrgetter(*names))`. The sort is stable.
+		"""
+		if not names:
+			return numpy.arange(self.length)
+		# lexsort uses the last key as the primary key.
+		return numpy.lexsort([self.codes(name) for name in reversed(names)])
+
+	def sort(self, *names):
+		"""
+		Return a new category sorted by the given properties.
+		"""
+		return self.take(self.argsort(*names))
+
+	def equal(self, other, name):
+		"""
+		Compare a property with the same property of another category, row by row.
+
+		:return: A boolean array, True where the values are the same.
+		:rtype: numpy.ndarray
+		"""
+		if len(self) != len(other):
+			raise ValueError(f"Can't compare {len(self)} rows with {len(other)} rows.")
+		coded = (name in self.vocabularies) + (name in other.vocabularies)
+		if coded == 2:
+			# Translate the codes of the other category into the codes of this one.
+			positions = {value: code for code, value in enumerate(self.vocabularies[name])}
+			translate = numpy.array([positions.get(value, -1) for value in other.vocabularies[name]], dtype=numpy.int64)
+			return self.columns[name] == translate[other.columns[name]]
+		# Codes can only be compared with codes.
+		if coded == 0 and self.columns[name].dtype != object and other.columns[name].dtype != object:
+			return self.columns[name] == other.columns[name]
+		return numpy.fromiter(
+			(mine == theirs for mine, theirs in zip(self.values(name), other.values(name))),
+			dtype=bool,
+			count=len(self),
+		)
+
+	def to_markings(self):
+		"""
+		Return a list of detached Marking objects.
+		"""
+		return [row.to_marking() for row in self]
+
+
+def note_steps(notes, keySignatures):
+	"""
+	The vectorized version of :func:`mupix.extra.add_step_information`: the step of
+	every note, computed from the columns of the notes and of the key signatures.
+
+	:param [notes]: The notes of a score.
+	:type [notes]: ColumnarCategory
+
+	:param [keySignatures]: The key signatures of the score, one per part and measure at least.
+	:type [keySignatures]: ColumnarCategory
+
+	:return: The step of each note, -1 when its measure has no key signature.
+	:rtype: numpy.ndarray
+	"""
+	steps = numpy.full(len(notes), -1, dtype=numpy.int64)
+	if len(notes) == 0 or len(keySignatures) == 0:
+		return steps
+
+	# Pitch classes, looked up once per distinct value instead of once per row.
+	tonics = numpy.array([tonic_semitones(step) for step in keySignatures.vocabularies["step"]])[keySignatures.codes("step")]
+	names = numpy.array([STEP_SEMITONES[name] for name in notes.vocabularies["name"]])[notes.codes("name")]
+
+	# (part, measure) as a single integer, for the keys and the notes.
+	width = int(max(keySignatures.codes("measure").max(), notes.codes("measure").max())) + 1
+	key_positions = keySignatures.codes("part") * width + keySignatures.codes("measure")
+	note_positions = notes.codes("part") * width + notes.codes("measure")
+
+	# The last key signature of a measure wins, like in add_step_information.
+	positions, last = numpy.unique(key_positions[::-1], return_index=True)
+	tonics = tonics[::-1][last]
+
+	found = numpy.searchsorted(positions, note_positions).clip(max=len(positions) - 1)
+	has_key = positions[found] == note_positions
+	steps[has_key] = (names[has_key] - tonics[found[has_key]]) % 12
+	return steps
+
+
+@attr.s
+class ColumnarMupixObject:
+	"""
+	The columnar version of :class:`mupix.typewise.MupixObject`. Each category is a
+	:class:`ColumnarCategory`, the other properties are the same.
+	"""
+	notes = attr.ib(kw_only=True)
+	rests = attr.ib(kw_only=True)
+	timeSignatures = attr.ib(kw_only=True)
+	keySignatures = attr.ib(kw_only=True)
+	clefs = attr.ib(kw_only=True)
+	spanners = attr.ib(kw_only=True)
+	dynamics = attr.ib(kw_only=True)
+	parts = attr.ib(kw_only=True, type=int, validator=[attr.validators.instance_of(int)])
+	error_description = attr.ib(kw_only=True, type=dict, validator=[attr.validators.instance_of(dict)])
+	visualize = attr.ib(kw_only=True, default=None)
+	software_vendor = attr.ib(kw_only=True, type=list, default=[], validator=[attr.validators.instance_of(list)])
+	ticks_per_quarter = attr.ib(kw_only=True, type=int, default=1, repr=False, validator=[attr.validators.instance_of(int)])
+
+	@notes.validator
+	@rests.validator
+	@timeSignatures.validator
+	@keySignatures.validator
+	@clefs.validator
+	@spanners.validator
+	@dynamics.validator
+	def check(self, attribute, value):
+		if not isinstance(value, ColumnarCategory):
+			raise ValueError(f"Must be a ColumnarCategory. {type(value)}")
+
+	def ret(self):
+		"""
+		Return all information about the object as a tuple, like :func:`mupix.typewise.MupixObject.ret`.
+		"""
+		return self.notes, self.rests, self.timeSignatures, self.keySignatures, self.clefs, self.spanners, self.dynamics, self.error_description
+
+	def __iter__(self):
+		return iter(self.ret())
+
+	@classmethod
+	def from_mupix_object(cls, mupix_object):
+		"""
+		Convert a MupixObject. Its Marking objects must all be evaluated (or detached),
+		because the columns don't keep the music21 objects.
+		"""
+		categories = {
+			category: ColumnarCategory.from_markings(marking_class, getattr(mupix_object, category))
+			for category, marking_class in CATEGORIES.items()
+		}
+		return cls(
+			parts=mupix_object.parts,
+			error_description=mupix_object.error_description,
+			software_vendor=mupix_object.software_vendor,
+			ticks_per_quarter=mupix_object.ticks_per_quarter,
+			**categories,
+		)
+
+	@classmethod
+	def from_filepath(cls, filepath, **parse_options):
+		"""
+		Parse a symbolic music-file, the options are the ones of :func:`mupix.typewise.MupixObject.from_filepath`.
+		"""
+		# The typewise module compares with columns, it imports this module.
+		from mupix.typewise import MupixObject
+		parse_options["detach"] = True
+		return cls.from_mupix_object(MupixObject.from_filepath(filepath, **parse_options))
+
+	def to_mupix_object(self):
+		"""
+		Convert back to a MupixObject of detached Marking objects.
+		"""
+		from mupix.typewise import MupixObject
+		return MupixObject(
+			parts=self.parts,
+			error_description=self.error_description,
+			visualize=None,
+			software_vendor=self.software_vendor,
+			ticks_per_quarter=self.ticks_per_quarter,
+			**{category: getattr(self, category).to_markings() for category in CATEGORIES},
+		)
@@ -29,6 +29,24 @@ Example
 
 		$ mupix -p read ./xml/*
 
+	Only the categories chosen with the flags are extracted from the files, so reading or
+	comparing a few categories of a large score is faster than reading all of them::
+
+		$ mupix -n read ./my_musicxml_file.xml
+
+	Compressed MusicXML files (`.mxl`) and zip or tar archives of MusicXML files are read
+	directly, without extracting them. Every file of an archive is read::
+
+		$ mupix -p read ./score.mxl ./corpus.tar.gz
+
+	Or only read some measures of some parts (the first part is 1)::
+
+		$ mupix -p read --measures 120-180 --parts 1,2 ./my_musicxml_file.xml
+
+	Part-wise MusicXML files can be read without music21, which is much faster::
+
+		$ mupix -p read --reader=lxml ./xml/*
+
 *************
 Mupix Compare
 *************
@@ -59,6 +77,22 @@ Example
 		$ mupix -rk compare --sort=anw-1 ./ground_truth.xml ./5-D.xml
 		$ mupix -ntk compare --sort=basic ./ground_truth.xml ./5-D.xml
 
+	Only compare some measures of some parts::
+
+		$ mupix -pT compare --measures 120-180 --parts 1,2 ./ground_truth.xml ./5-D.xml
+
+	Count which value of each property is read as which (eg: eighth notes read as sixteenths)::
+
+		$ mupix -pT compare --confusion ./ground_truth.xml ./5-D.xml
+
+	Count the errors of each part (rows) and measure (columns), to find where a file is the most wrong::
+
+		$ mupix -e compare ./ground_truth.xml ./xml/*
+
+	Leave some results out, they are neither extracted, compared nor shown::
+
+		$ mupix -pT compare --do-not-count notes_beam,notes_stemdirection ./ground_truth.xml ./5-D.xml
+
 	Just the total with `pretty-print`::
 
 		$ mupix -pT compare ./ground_truth.xml ./5-D.xml
@@ -67,6 +101,10 @@ Example
 
 		$ mupix -pT compare ./ground_truth.xml ./xml/*
 
+	Or compare every file of a zip or tar archive::
+
+		$ mupix -pT compare ./ground_truth.mxl ./omr_outputs.zip
+
 **************
 Mupix Validate
 **************
@@ -88,7 +126,58 @@ Mupix xml_finder
 
 		$ mupix xml_finder ./testing_xml.xml
 
+***********
+Mupix Merge
+***********
+
+	The results of comparisons can be added up later, eg: when the files of a corpus are
+	compared on many machines. Save the outputs of `compare` with `-p`, a file can hold
+	the outputs of many comparisons::
+
+		$ mupix -p compare ./ground_truth.xml ./first_half/* > first_half.json
+		$ mupix -p compare ./ground_truth.xml ./second_half/* > second_half.json
+		$ mupix -pT merge ./first_half.json ./second_half.json
+
+***********
+Mupix Index
+***********
+
+	You can build an index of ground truth files, to later find which ground truth an unlabelled
+	file belongs to. Files are added to the index if it already exists::
+
+		$ mupix index ./my_index ./ground_truths/*
+
+************
+Mupix Lookup
+************
+
+	Find the most similar ground truths of a file in an index::
+
+		$ mupix -p lookup ./my_index ./unknown_output.xml
+
+	And directly compare the file with the best candidate::
+
+		$ mupix -pT lookup --compare --sort=anw-1 ./my_index ./unknown_output.xml
+
+***********
+Mupix Cache
+***********
+
+	Parsed files can be kept in a cache directory, so that a file that did not change is never
+	parsed twice. Give the directory with `--cache-dir` (or the `MUPIX_CACHE_DIR` environment
+	variable) to any command::
+
+		$ mupix -pT --cache-dir ./.mupix_cache compare ./ground_truth.xml ./xml/*
+
+	The least recently used files are removed when the cache grows over `--cache-size` megabytes.
+	Show the state of the cache, remove old entries or empty it::
+
+		$ mupix -p --cache-dir ./.mupix_cache cache
+		$ mupix --cache-dir ./.mupix_cache --cache-size 100 cache --prune
+		$ mupix --cache-dir ./.mupix_cache cache --clear
+
 """
+import json
 
 import click
 
@@ -98,11 +187,125 @@ from mupix.application import BasicCompare
 from mupix.application import SimpleNeedlemanWunsch
 from mupix.application import WeightedNeedlemanWunsch
 from mupix.application import PartwiseWeightedNeedlemanWunsch
+from mupix.cache import ParseCache
+from mupix.confusion import ConfusionMatrices
+from mupix.index import CorpusIndex
+from mupix.inputs import iter_input_files
+from mupix.result_objects import ResultSet
 from mupix.typewise import MupixObject
+from mupix.typewise import countable_results
 # from mupix.partwise import MupixPartwiseObject
 from mupix.extra import output_filter
 
 
+algorithms_dispatcher = {
+	"basic": BasicCompare,
+	"anw": SimpleNeedlemanWunsch,
+	"anw-1": WeightedNeedlemanWunsch,
+	"pw-anw-1": PartwiseWeightedNeedlemanWunsch,
+}
+
+
+def _parse_cache(params):
+	"""
+	The parse cache selected by the `--cache-dir` option, or None.
+	"""
+	if not params["cache_dir"]:
+		return None
+	return ParseCache(params["cache_dir"], max_bytes=params["cache_size"] * 1024 * 1024)
+
+
+# The command line flag of each category of a Mupix object.
+_CATEGORY_FLAGS = {
+	"notes": "notes",
+	"rests": "rests",
+	"time_signatures": "timeSignatures",
+	"key_signatures": "keySignatures",
+	"clefs": "clefs",
+	"spanners": "spanners",
+	"dynamics": "dynamics",
+}
+
+
+def _categories(params):
+	"""
+	The categories selected with `-n`, `-r`, `-t`, `-k`, `-c`, `-s` and `-d`, or None
+	(every category) when there is no such flag.
+	"""
+	categories = [category for flag, category in _CATEGORY_FLAGS.items() if params[flag]]
+	return categories or None
+
+
+def _measure_range(ctx, param, value):
+	"""
+	Turn `--measures A-B` (or a single measure `A`) into a (first, last) tuple.
+	"""
+	if value is None:
+		return None
+	first, _, last = value.partition("-")
+	try:
+		measures = (int(first), int(last or first))
+	except ValueError:
+		raise click.BadParameter("use a range of measure numbers, eg: 120-180")
+	if measures[0] > measures[1]:
+		raise click.BadParameter(f"the first measure is after the last one ({value})")
+	return measures
+
+
+def _part_list(ctx, param, value):
+	"""
+	Turn `--parts 1,3` into a list of part numbers.
+	"""
+	if value is None:
+		return None
+	try:
+		return [int(part) for part in value.split(",")]
+	except ValueError:
+		raise click.BadParameter("use part numbers separated by commas, eg: 1,3")
+
+
+def _result_list(ctx, param, value):
+	"""
+	Turn `--do-not-count notes_beam,notes_stemdirection` into a list of result names.
+	"""
+	if value is None:
+		return []
+	results = value.split(",")
+	unknown = sorted(set(results) - set(countable_results()))
+	if unknown:
+		raise click.BadParameter(f"unknown results {unknown}, use {','.join(countable_results())}")
+	return results
+
+
+def _json_documents(text):
+	"""
+	Yield every JSON object of a text, eg: the outputs of many comparisons written
+	to a single file. Anything between the objects is skipped.
+	"""
+	decoder = json.JSONDecoder()
+	start = text.find("{")
+	while start != -1:
+		document, end = decoder.raw_decode(text, start)
+		yield document
+		start = text.find("{", end)
+
+
+def _parse_options(params, reader, measures=None, parts=None):
+	"""
+	The options of `MupixObject.from_filepath` for the given command line options.
+	"""
+	return {
+		"reader": reader,
+		# Only keep the music21 objects around when they will be shown.
+		"detach": not params["visualize"],
+		"cache": _parse_cache(params),
+		# Categories that are not shown are neither extracted nor compared.
+		"categories": _categories(params),
+		"measures": measures,
+		"parts": parts,
+	}
+
+
 @click.group()
 @click.option("-p", "--pretty-print", is_flag=True, help="Print the output with and automatic indent.")
 @click.option("-n", "--notes", is_flag=True, help="Show note objects")
@@ -112,11 +315,14 @@ from mupix.extra import output_filter
 @click.option("-c", "--clefs", is_flag=True, help="Show the clefs")
 @click.option("-s", "--spanners", is_flag=True, help="Show the spanners")
 @click.option("-d", "--dynamics", is_flag=True, help="Show the dynamics")
-@click.option("-z", "--error-description", is_flag=True, help="What element matched with what")
+@click.option("-z", "--error-description", is_flag=True, help="What element matched with what, one record per error")
+@click.option("-e", "--error-density", is_flag=True, help="The number of errors of each part and measure")
 @click.option("-v", "--visualize", is_flag=True, help="Uses Music21 to visualize the errors")
 @click.option("-T", "--total-only", is_flag=True, help="Show the total of each category")
+@click.option("--cache-dir", envvar="MUPIX_CACHE_DIR", default=None, help="Directory where parsed files are cached.")
+@click.option("--cache-size", default=512, help="Size of the cache directory, in megabytes.")
 @click.pass_context
-def cli(ctx, pretty_print, notes, rests, time_signatures, key_signatures, clefs, spanners, dynamics, error_description, visualize, total_only):
+def cli(ctx, pretty_print, notes, rests, time_signatures, key_signatures, clefs, spanners, dynamics, error_description, error_density, visualize, total_only, cache_dir, cache_size):  # noqa
 	"""
 	This tool helps parse MusicXML files and can list how many discrepancies there are, and what type they are.
 
@@ -126,10 +332,15 @@ def cli(ctx, pretty_print, notes, rests, time_signatures, key_signatures, clefs,
 
 @cli.command("compare", short_help="Compare two or more MusicXML files. You may also select the type of algorithm you want to use by specifying --sort=anw")  # noqa
 @click.option("--sort", default="basic", help="Note alignment algorithm to use when aligning Mupix objects.")
+@click.option("--reader", default="music21", type=click.Choice(["music21", "lxml"]), help="How the MusicXML files are parsed.")
+@click.option("--measures", callback=_measure_range, help="Only compare these measures, eg: 120-180.")
+@click.option("--parts", callback=_part_list, help="Only compare these parts, eg: 1,3.")
+@click.option("--do-not-count", callback=_result_list, help="Leave these results out, eg: notes_beam,notes_stemdirection.")
+@click.option("--confusion", is_flag=True, help="Count which value of each property is compared with which.")
 @click.argument("true_data")
 @click.argument("test_data", nargs=-1)
 @click.pass_context
-def compare(ctx, sort, true_data, test_data):
+def compare(ctx, sort, reader, measures, parts, do_not_count, confusion, true_data, test_data):
 	"""
 	Compares two MusicXML files.
 
@@ -141,6 +352,18 @@ def compare(ctx, sort, true_data, test_data):
 
 		--sort=anw-1    Uses the first version of the Affine-Needleman-Wunsch algorithm, based on multiple elements from each of the Mupix Objects.
 
+		--reader=lxml   Reads part-wise MusicXML files directly, much faster than music21 but nothing can be visualized.
+
+		--measures=A-B  Only compares the measures A to B (inclusive).
+
+		--parts=1,3     Only compares the given parts (1 for the first part).
+
+		--do-not-count=notes_beam,notes_stemdirection
+						Leaves these results out, their properties are not extracted or compared.
+
+		--confusion     Adds the confusion matrix of each property: its values, and how many times
+						each true value was compared with each test value.
+
 	TRUE_DATA:
 
 		<file>                        A single file
@@ -150,39 +373,57 @@ def compare(ctx, sort, true_data, test_data):
 		<file>                        A single file
 
 		<file A> <file B> <file C>    Or a list of files with spaces for separation
-	"""
-	algorithms_dispatcher = {
-		"basic": BasicCompare,
-		"anw": SimpleNeedlemanWunsch,
-		"anw-1": WeightedNeedlemanWunsch,
-		"pw-anw-1": PartwiseWeightedNeedlemanWunsch,
-	}
 
+		<archive>                     Or a zip or tar archive of files
+	"""
 	for f in test_data:
-		output_filter(
-			ctx.parent.params,
-			algorithms_dispatcher[sort],
-			true_data,  # true_filepath
-			f,  # test_filepath
-			[],  # do_not_count will be implemented gradually
-		)
+		for input_file in iter_input_files(f):
+			output_filter(
+				ctx.parent.params,
+				algorithms_dispatcher[sort],
+				true_data,  # true_filepath
+				input_file,  # test_filepath
+				do_not_count,
+				visualize=ctx.parent.params["visualize"],
+				confusion=confusion,
+				**_parse_options(ctx.parent.params, reader, measures, parts),
+			)
 
 
 @cli.command("read", short_help="Show the parsed Symbolic file as a list of elements")
+@click.option("--reader", default="music21", type=click.Choice(["music21", "lxml"]), help="How the MusicXML files are parsed.")
+@click.option("--measures", callback=_measure_range, help="Only read these measures, eg: 120-180.")
+@click.option("--parts", callback=_part_list, help="Only read these parts, eg: 1,3.")
 @click.argument("file_path", nargs=-1)
 @click.pass_context
-def read(ctx, file_path):
+def read(ctx, reader, measures, parts, file_path):
 	"""
 	Prints to screen the parsed symbolic file as a list of elements.
 
+	OPTIONS:
+
+		--reader=lxml   Reads part-wise MusicXML files directly, much faster than music21 but nothing can be visualized.
+
+		--measures=A-B  Only reads the measures A to B (inclusive).
+
+		--parts=1,3     Only reads the given parts (1 for the first part).
+
 	[FILE_PATH]:
 
 		<file>                        A single file
 
 		<file A> <file B> <file C>    Or a list of files with spaces for separation
+
+		<archive>                     Or a zip or tar archive of files
 	"""
 	for f in file_path:
-		output_filter(ctx.parent.params, MupixObject.from_filepath, f)
+		for input_file in iter_input_files(f):
+			output_filter(
+				ctx.parent.params,
+				MupixObject.from_filepath,
+				input_file,
+				**_parse_options(ctx.parent.params, reader, measures, parts),
+			)
 		# output_filter(ctx.parent.params, MupixPartwiseObject.from_filepath, f)
 
 
@@ -197,9 +438,12 @@ def validate(file_path):
 		<file>                        A single file
 
 		<file A> <file B> <file C>    Or a list of files with spaces for separation
+
+		<archive>                     Or a zip or tar archive of files
 	"""
 	for f in file_path:
-		print(f"{f}: {xml_validator(f)}")
+		for input_file in iter_input_files(f):
+			print(f"{input_file.filepath}: {xml_validator(input_file)}")
 
 
 @cli.command("xml_type", short_help="Check the format of the musicxml.")
@@ -213,6 +457,145 @@ def xml_finder(file_path):
 		<file>                        A single file
 
 		<file A> <file B> <file C>    Or a list of files with spaces for separation
+
+		<archive>                     Or a zip or tar archive of files
 	"""
 	for f in file_path:
-		print(f"{f}: {xml_type_finder(f)}")
+		for input_file in iter_input_files(f):
+			print(f"{input_file.filepath}: {xml_type_finder(input_file)}")
+
+
+@cli.command("index", short_help="Add MusicXML files to a corpus index.")
+@click.argument("index_directory")
+@click.argument("file_path", nargs=-1)
+@click.pass_context
+def index(ctx, index_directory, file_path):
+	"""
+	Adds files to the index stored in INDEX_DIRECTORY, creating it if needed.
+
+	INDEX_DIRECTORY:
+
+		<directory>                   Where the index is stored
+
+	[FILE_PATH]:
+
+		<file>                        A single file
+
+		<file A> <file B> <file C>    Or a list of files with spaces for separation
+	"""
+	corpus_index = CorpusIndex.load(index_directory)
+	for f in file_path:
+		corpus_index.add(f)
+	corpus_index.save()
+
+	msg = {"Index": index_directory, "Files": len(corpus_index.filepaths)}
+	print(json.dumps(msg, indent=2) if ctx.parent.params["pretty_print"] else msg)
+
+
+@cli.command("lookup", short_help="Find the most similar files in a corpus index.")
+@click.option("--top", default=5, help="Number of candidates to show.")
+@click.option("--compare", "compare_", is_flag=True, help="Compare the file with the best candidate.")
+@click.option("--sort", default="basic", help="Note alignment algorithm to use with --compare.")
+@click.option("--do-not-count", callback=_result_list, help="Leave these results out of --compare, eg: notes_beam.")
+@click.argument("index_directory")
+@click.argument("file_path", nargs=-1)
+@click.pass_context
+def lookup(ctx, top, compare_, sort, do_not_count, index_directory, file_path):
+	"""
+	Lists the files of the index that are the most similar to each given file.
+
+	OPTIONS:
+
+		--top=5         The number of candidates to show.
+
+		--compare       Compare each file with its best candidate, using the --sort algorithm.
+
+		--do-not-count=notes_beam
+						Leaves these results out of the comparison.
+
+	INDEX_DIRECTORY:
+
+		<directory>                   Where the index is stored
+
+	[FILE_PATH]:
+
+		<file>                        A single file
+
+		<file A> <file B> <file C>    Or a list of files with spaces for separation
+	"""
+	corpus_index = CorpusIndex.load(index_directory)
+	for f in file_path:
+		candidates = corpus_index.lookup(f, top=top)
+
+		if compare_ and candidates:
+			output_filter(
+				ctx.parent.params,
+				algorithms_dispatcher[sort],
+				candidates[0]["filepath"],  # true_filepath
+				f,  # test_filepath
+				do_not_count,
+				visualize=ctx.parent.params["visualize"],
+			)
+			continue
+
+		msg = {"File": f, "Candidates": candidates}
+		print(json.dumps(msg, indent=2) if ctx.parent.params["pretty_print"] else msg)
+
+
+@cli.command("merge", short_help="Add up the results of comparisons.")
+@click.argument("file_path", nargs=-1)
+@click.pass_context
+def merge(ctx, file_path):
+	"""
+	Adds up the results of comparisons, saved with `mupix -p compare` (or `merge`). The
+	confusion matrices of `compare --confusion` are added up too.
+
+	[FILE_PATH]:
+
+		<file>                        A file with the outputs of one or more comparisons
+
+		<file A> <file B> <file C>    Or a list of files with spaces for separation
+	"""
+	results, confusion_matrices = ResultSet(), ConfusionMatrices()
+	for f in file_path:
+		with open(f) as results_file:
+			for output in _json_documents(results_file.read()):
+				results += ResultSet.from_dict(output)
+				confusion_matrices += ConfusionMatrices.from_dict(output.get("Confusion", {}))
+
+	msg = results.asdict()
+	categories = _categories(ctx.parent.params)
+	if categories is not None:
+		msg = {name: value for name, value in msg.items() if name[0].lower() + name[1:] in categories}
+	if ctx.parent.params["total_only"]:
+		msg = {name: [item for item in value if "Total" in item["name"]] for name, value in msg.items()}
+	if confusion_matrices.matrices:
+		msg["Confusion"] = confusion_matrices.asdict()
+	print(json.dumps(msg, indent=2) if ctx.parent.params["pretty_print"] else msg)
+
+
+@cli.command("cache", short_help="Show, prune or clear the parse cache.")
+@click.option("--prune", is_flag=True, help="Remove the least recently used files until the cache fits in --cache-size.")
+@click.option("--clear", is_flag=True, help="Remove every file from the cache.")
+@click.pass_context
+def cache(ctx, prune, clear):
+	"""
+	Shows the number of files and the size of the cache given with --cache-dir.
+
+	OPTIONS:
+
+		--prune         Remove the least recently used files until the cache fits in --cache-size.
+
+		--clear         Remove every file from the cache.
+	"""
+	parse_cache = _parse_cache(ctx.parent.params)
+	if parse_cache is None:
+		raise click.UsageError("No cache directory, use --cache-dir or MUPIX_CACHE_DIR.")
+
+	msg = {}
+	if clear:
+		msg["Removed"] = parse_cache.clear()
+	elif prune:
+		msg["Removed"] = parse_cache.prune()
+	msg.update(parse_cache.stats())
+	print(json.dumps(msg, indent=2) if ctx.parent.params["pretty_print"] else msg)
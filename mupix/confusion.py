@@ -0,0 +1,186 @@
+"""
+Which values of a property are confused with which.
+
+A right/wrong count says how often the durations of the notes are wrong, a
+confusion matrix says which durations are read as which (eg: eighths read as
+sixteenths). Every matrix has its own list of labels (the values seen so far),
+values are turned into the integer codes of their labels a column at a time
+and the pairs are counted with `numpy.bincount`.
+
+Matrices are counts, so like :class:`mupix.result_objects.ResultSet` they can
+be added up across files. They are exported as their labels and the non-zero
+cells only.
+"""
+import json
+
+import numpy
+
+from mupix.extra import quarter_length_fraction
+
+# The properties that are labelled by their exact quarter length ("1/3" instead of "0.3333333333333333").
+_TIME_PROPERTIES = {"onset", "duration"}
+
+
+def _label(value):
+	"""
+	A hashable label for a value, sets and lists are sorted tuples.
+	"""
+	if isinstance(value, (set, frozenset)):
+		return tuple(sorted(value, key=str))
+	if isinstance(value, list):
+		return tuple(value)
+	return value
+
+
+def _time_label(value):
+	return None if value is None else str(quarter_length_fraction(value))
+
+
+def _json_label(label):
+	return list(label) if isinstance(label, tuple) else label
+
+
+class ConfusionMatrix:
+	"""
+	The number of times each true value of a property was compared with each test value.
+
+	:param [labels]: The values, the code of a value is its position.
+	:type [labels]: List
+
+	:param [counts]: counts[true code, test code], square and as large as the labels.
+	:type [counts]: numpy.ndarray
+	"""
+	def __init__(self, labels=(), counts=None):
+		self.labels = list(labels)
+		self._codes = {label: code for code, label in enumerate(self.labels)}
+		self.counts = numpy.zeros((len(self.labels), len(self.labels)), dtype=numpy.int64) if counts is None else counts
+
+	def __eq__(self, other):
+		if not isinstance(other, ConfusionMatrix):
+			return NotImplemented
+		return self.asdict() == other.asdict()
+
+	def codes(self, labels) -> numpy.ndarray:
+		"""
+		The codes of labels, new labels are added (and the matrix grows).
+		"""
+		codes = numpy.fromiter(
+			(self._codes[label] if label in self._codes else self._add_label(label) for label in labels),
+			dtype=numpy.int64,
+		)
+		if len(self.labels) > len(self.counts):
+			grown = numpy.zeros((len(self.labels), len(self.labels)), dtype=numpy.int64)
+			grown[:len(self.counts), :len(self.counts)] = self.counts
+			self.counts = grown
+		return codes
+
+	def _add_label(self, label):
+		self._codes[label] = len(self.labels)
+		self.labels.append(label)
+		return self._codes[label]
+
+	def add(self, true_codes, test_codes):
+		"""
+		Count pairs of codes (see :func:`codes`), one pair per compared object.
+		"""
+		size = len(self.labels)
+		pairs = numpy.asarray(true_codes, dtype=numpy.int64) * size + numpy.asarray(test_codes, dtype=numpy.int64)
+		self.counts += numpy.bincount(pairs, minlength=size * size).reshape(size, size)
+
+	def __add__(self, other):
+		if other == 0:
+			return self + ConfusionMatrix()
+		if not isinstance(other, ConfusionMatrix):
+			return NotImplemented
+		merged = ConfusionMatrix(self.labels)
+		mine, theirs = merged.codes(self.labels), merged.codes(other.labels)
+		merged.counts[numpy.ix_(mine, mine)] += self.counts
+		merged.counts[numpy.ix_(theirs, theirs)] += other.counts
+		return merged
+
+	__radd__ = __add__
+
+	def asdict(self) -> dict:
+		"""
+		The labels and the non-zero cells as [true code, test code, count] triples, for example:
+			{"labels": ["1/2", "1/4"], "counts": [[0, 0, 12], [0, 1, 3], [1, 1, 40]]}
+		"""
+		true_codes, test_codes = numpy.nonzero(self.counts)
+		return {
+			"labels": [_json_label(label) for label in self.labels],
+			"counts": numpy.column_stack([true_codes, test_codes, self.counts[true_codes, test_codes]]).tolist(),
+		}
+
+	@classmethod
+	def from_dict(cls, data: dict):
+		"""
+		The inverse of :func:`asdict`.
+		"""
+		matrix = cls([_label(label) for label in data["labels"]])
+		cells = numpy.array(data["counts"], dtype=numpy.int64).reshape(-1, 3)
+		numpy.add.at(matrix.counts, (cells[:, 0], cells[:, 1]), cells[:, 2])
+		return matrix
+
+
+class ConfusionMatrices:
+	"""
+	The confusion matrix of each compared property of a comparison (or of many),
+	by result name (eg: "notes_duration").
+	"""
+	def __init__(self, matrices=None):
+		self.matrices = {} if matrices is None else matrices
+
+	def __eq__(self, other):
+		if not isinstance(other, ConfusionMatrices):
+			return NotImplemented
+		return self.matrices == other.matrices
+
+	def __getitem__(self, name):
+		return self.matrices[name]
+
+	def __contains__(self, name):
+		return name in self.matrices
+
+	def add_columns(self, name, property_, true_rows, test_rows):
+		"""
+		Count the values of a property of aligned rows, two :class:`mupix.columnar.ColumnarCategory`
+		of the same length. The vocabulary of coded columns is labelled instead of every row.
+		"""
+		matrix = self.matrices.setdefault(name, ConfusionMatrix())
+		matrix.add(self._column_codes(matrix, property_, true_rows), self._column_codes(matrix, property_, test_rows))
+
+	def _column_codes(self, matrix, property_, rows):
+		label = _time_label if property_ in _TIME_PROPERTIES else _label
+		column = rows.columns[property_]
+		if property_ in rows.vocabularies:
+			return matrix.codes(map(label, rows.vocabularies[property_]))[column]
+		if column.dtype != object:
+			values, inverse = numpy.unique(column, return_inverse=True)
+			return matrix.codes(map(label, values.tolist()))[inverse]
+		return matrix.codes(map(label, column))
+
+	def __add__(self, other):
+		if other == 0:
+			return self + ConfusionMatrices()
+		if not isinstance(other, ConfusionMatrices):
+			return NotImplemented
+		matrices = {name: matrix + 0 for name, matrix in self.matrices.items()}
+		for name, matrix in other.matrices.items():
+			matrices[name] = matrices.get(name, 0) + matrix
+		return ConfusionMatrices(matrices)
+
+	__radd__ = __add__
+
+	def asdict(self) -> dict:
+		return {name: matrix.asdict() for name, matrix in self.matrices.items()}
+
+	@classmethod
+	def from_dict(cls, data: dict):
+		return cls({name: ConfusionMatrix.from_dict(matrix) for name, matrix in data.items()})
+
+	def dumps(self) -> str:
+		return json.dumps(self.asdict())
+
+	@classmethod
+	def loads(cls, text: str):
+		return cls.from_dict(json.loads(text))
@@ -3,11 +3,82 @@ The properties of these objects are named in a specific way for a reason. Any
 property that is not to be evaluated has an underscore in them
 (eg: _music21_object). If the property requires more than a word to describe
 it, then write it in camelCase style.
+
+Properties that only depend on the music21 object itself (names, durations,
+beams, etc.) are lazy, they are only evaluated the first time they are read and
+then stored on the object. Printing the totals or a single category never pays
+for the other properties. The position of an object (measure, onset, voice)
+depends on the stream it was found in, so it is evaluated right away while
+that stream still exists.
+
+The objects are slotted and their strings are interned, a score has thousands of
+objects sharing a handful of durations, onsets and names. Once every property
+is known, :func:`Marking.detach` drops the reference to the music21 object so
+that the music21 stream can be freed.
+
+Onsets and durations are also kept as integer ticks (see :func:`mupix.extra.assign_ticks`),
+which are used to sort, compare and align objects. The strings are what is shown.
 """
+import functools
+import operator
+import sys
+
 import attr
 
+_GETTER = "mupix_getter"
+# Attributes that are not part of the output of a Marking (see `Marking.asdict`).
+_INTERNAL = "mupix_internal"
+
+
+def lazy(getter, **kwargs):
+	"""
+	An attribute that is evaluated by calling the method named `getter` the
+	first time it is read, instead of when the object is created. The result is
+	stored on the object, so equality, hashing and the representation are the
+	same as for an eager attribute.
+
+	:param [getter]: The name of the method that evaluates the attribute. It is looked up on the instance, subclasses can override it.
+	:type [getter]: String
+
+	:param [kwargs]: Passed to `attr.ib`.
+	"""
+	return attr.ib(init=False, metadata={_GETTER: getter}, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def _lazy_getters(cls):
+	"""
+	Map the lazy attributes of a Marking class to the name of their getter.
+	"""
+	return {field.name: field.metadata[_GETTER] for field in attr.fields(cls) if _GETTER in field.metadata}
 
-@attr.s
+
+@functools.lru_cache(maxsize=None)
+def _internal_fields(cls):
+	return tuple(field for field in attr.fields(cls) if field.metadata.get(_INTERNAL))
+
+
+@functools.lru_cache(maxsize=None)
+def output_fields(cls) -> tuple:
+	"""
+	The names of the attributes of a Marking class that are shown, without the music21 object and the ticks.
+	"""
+	return tuple(
+		field.name for field in attr.fields(cls)
+		if field.name != "_music21_object" and not field.metadata.get(_INTERNAL)
+	)
+
+
+@functools.lru_cache(maxsize=None)
+def equality_key(cls):
+	"""
+	A function returning the values that make two objects of a Marking class equal
+	(part, measure, onset and voice for notes), usable as a dictionary key.
+	"""
+	return operator.attrgetter(*[field.name for field in attr.fields(cls) if field.eq])
+
+
+@attr.s(slots=True)
 class Marking:
 	"""
 	The base class for all the components of a Mupix object
@@ -21,6 +92,9 @@ class Marking:
 
 	:property [onset]: The time in the measure where this event occurs. It is
 	inferred by the music21 object.
+
+	:property [onset_ticks]: The onset as an integer number of ticks, at the resolution
+	of the score. None until the ticks of the score are assigned.
 	"""
 	_music21_object = attr.ib(eq=False)
 	part = attr.ib(type=int)
@@ -30,18 +104,75 @@ class Marking:
 	def _get_measure(self):
 		return int(self._music21_object.measureNumber)
 
-	onset = attr.ib(init=False, type=str)
+	onset = attr.ib(init=False, type=str, eq=False)
 	@onset.default
 	def _get_onset(self):
-		return str(self._music21_object.offset)
+		return sys.intern(str(self._music21_object.offset))
+
+	onset_ticks = attr.ib(init=False, default=None, repr=False, metadata={_INTERNAL: True})
+
+	def __getattr__(self, name):
+		# Only called when `name` is not set yet, which is how lazy attributes are evaluated.
+		getter = _lazy_getters(type(self)).get(name)
+		if getter is None:
+			raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+		value = getattr(self, getter)()
+		if isinstance(value, str):
+			value = sys.intern(value)
+		setattr(self, name, value)
+		return value
+
+	def evaluate(self):
+		"""
+		Evaluate every lazy attribute now. Objects that are about to be copied many
+		times are evaluated first, so that the copies don't evaluate them again.
+		"""
+		for name in _lazy_getters(type(self)):
+			getattr(self, name)
+		return self
+
+	def detach(self, skip=()):
+		"""
+		Evaluate every lazy attribute and drop the reference to the music21 object.
+		The object can't be colored for visualization anymore.
+
+		:param [skip]: Lazy attributes that are not evaluated, they are None (eg: ["beam", "stemdirection"]).
+		:type [skip]: Iterable
+		"""
+		for name in _lazy_getters(type(self)):
+			if name in skip:
+				setattr(self, name, None)
+			else:
+				getattr(self, name)
+		self._music21_object = None
+		return self
+
+	@classmethod
+	def from_values(cls, part, **values):
+		"""
+		Create the object from values that are already known, instead of inferring
+		them from a music21 object. This is used by readers that do not build a
+		music21 stream (see :mod:`mupix.reader`), `_music21_object` is None.
+
+		:param [part]: An integer representing the instrument.
+		:type [part]: Integer
+
+		:param [values]: Every other property of the object (measure, onset, etc.)
+		"""
+		mupix_object = cls.__new__(cls)
+		mupix_object._music21_object = None
+		mupix_object.part = part
+		for field in _internal_fields(cls):
+			setattr(mupix_object, field.name, field.default)
+		for name, value in values.items():
+			setattr(mupix_object, name, sys.intern(value) if isinstance(value, str) else value)
+		return mupix_object
 
 	def asdict(self):
 		"""
 		Return the object as a JSON serializable python dictionary.
 		"""
-		tmp = attr.asdict(self)
-		del tmp["_music21_object"]
-		return tmp
+		return attr.asdict(self, filter=lambda attribute, value: attribute.name in output_fields(type(self)))
 
 	def asname(self):
 		"""
@@ -51,7 +182,7 @@ class Marking:
 		return string[0].lower() + string[1:-2] + "s"
 
 
-@attr.s
+@attr.s(slots=True)
 class MusicalEvent(Marking):
 	"""
 	A musical event is an **active** marking in a score, rather than **passive**
@@ -64,12 +195,16 @@ class MusicalEvent(Marking):
 	is a numerical representation of which instrument it represents.
 
 	:property [articulation]: A musical articulation (staccato, tenuto, accents, etc.)
+
+	:property [duration_ticks]: The duration as an integer number of ticks, like `onset_ticks`.
 	"""
-	duration = attr.ib(init=False, type=str, eq=False)
-	@duration.default
+	duration = lazy("_get_duration", type=str, eq=False)
+
 	def _get_duration(self):
 		return str(self._music21_object.quarterLength)
 
+	duration_ticks = attr.ib(init=False, default=None, eq=False, repr=False, metadata={_INTERNAL: True})
+
 	voice = attr.ib(init=False, type=int)
 	@voice.default
 	def _get_voice(self):
@@ -78,13 +213,13 @@ class MusicalEvent(Marking):
 		else:
 			return int(self._music21_object.activeSite.id)
 
-	articulation = attr.ib(init=False, eq=False)
-	@articulation.default
+	articulation = lazy("_get_articulation", eq=False)
+
 	def _get_articulation(self):
 		return [item.name for item in self._music21_object.articulations]
 
 
-@attr.s
+@attr.s(slots=True)
 class NoteObject(MusicalEvent):
 	"""
 	A NoteObject holds information useful to Mupix for symbolic music
@@ -124,18 +259,18 @@ class NoteObject(MusicalEvent):
 	"""
 	step = attr.ib(kw_only=True, eq=False, default=None)
 
-	name = attr.ib(init=False, eq=False)
-	@name.default
+	name = lazy("_get_name", eq=False)
+
 	def _get_name(self):
 		return self._music21_object.step
 
-	octave = attr.ib(init=False, eq=False)
-	@octave.default
+	octave = lazy("_get_octave", eq=False)
+
 	def _get_octave(self):
 		return self._music21_object.octave
 
-	accidental = attr.ib(init=False, type=str, eq=False)
-	@accidental.default
+	accidental = lazy("_get_accidental", type=str, eq=False)
+
 	def _get_accidental(self):
 		note = self._music21_object
 		if len(note.name) > 1:
@@ -143,13 +278,13 @@ class NoteObject(MusicalEvent):
 		else:
 			return ""
 
-	stemdirection = attr.ib(init=False, eq=False)
-	@stemdirection.default
+	stemdirection = lazy("_get_stem_direction", eq=False)
+
 	def _get_stem_direction(self):
 		return self._music21_object.stemDirection
 
-	beam = attr.ib(init=False, eq=False)
-	@beam.default
+	beam = lazy("_get_beam", eq=False)
+
 	def _get_beam(self):
 		note = self._music21_object
 		note.beams.getTypes()
@@ -157,8 +292,8 @@ class NoteObject(MusicalEvent):
 		# We do not want the errors be disproportionate if the duration is wrong too.
 		return set([item for item in note.beams.getTypes()])
 
-	tiestyle = attr.ib(init=False, eq=False)
-	@tiestyle.default
+	tiestyle = lazy("_get_tie_style", eq=False)
+
 	def _get_tie_style(self):
 		"""
 		"normal" or "dotted" or "dashed" or "hidden"
@@ -168,8 +303,8 @@ class NoteObject(MusicalEvent):
 		except AttributeError:
 			return None
 
-	tietype = attr.ib(init=False, eq=False)
-	@tietype.default
+	tietype = lazy("_get_tie_type", eq=False)
+
 	def _get_tie_type(self):
 		"""
 		"start", "stop", "continue", "let-ring", "continue-let-ring"
@@ -179,8 +314,8 @@ class NoteObject(MusicalEvent):
 		except AttributeError:
 			return None
 
-	tieplacement = attr.ib(init=False, eq=False)
-	@tieplacement.default
+	tieplacement = lazy("_get_tie_placement", eq=False)
+
 	def _get_tie_placement(self):
 		"""
 		None, above, below
@@ -191,7 +326,7 @@ class NoteObject(MusicalEvent):
 			return None
 
 
-@attr.s
+@attr.s(slots=True)
 class RestObject(MusicalEvent):
 	"""
 	Same as :func:`mupix.core.MusicalEvent`
@@ -199,67 +334,74 @@ class RestObject(MusicalEvent):
 	pass
 
 
-@attr.s
+@attr.s(slots=True)
 class TimeSignatureObject(Marking):
 	"""
 	This is an object that holds information related to all time signatures.
 	"""
-	numerator = attr.ib(init=False, eq=False)
-	@numerator.default
+	numerator = lazy("_get_numerator", eq=False)
+
 	def _get_numerator(self):
 		return self._music21_object._getNumerator()
 
-	denominator = attr.ib(init=False, eq=False)
-	@denominator.default
+	denominator = lazy("_get_denominator", eq=False)
+
 	def _get_denominator(self):
 		return self._music21_object._getDenominator()
 
 
-@attr.s
+@attr.s(slots=True)
 class KeySignatureObject(Marking):
 	"""
 	This is an object that holds information related to all key signatures.
 	"""
-	step = attr.ib(init=False, eq=False)
-	@step.default
+	step = lazy("_get_step", eq=False)
+
 	def _get_step(self):
-		return self._music21_object.asKey().name.split(" ")[0]
+		return self._get_key()[0]
+
+	mode = lazy("_get_mode", eq=False)
 
-	mode = attr.ib(init=False, eq=False)
-	@mode.default
 	def _get_mode(self):
-		return self._music21_object.asKey().name.split(" ")[1]
+		return self._get_key()[1]
+
+	def _get_key(self):
+		"""
+		`asKey` is expensive, the step and the mode are both stored after a single call.
+		"""
+		self.step, self.mode = self._music21_object.asKey().name.split(" ")
+		return self.step, self.mode
 
 
-@attr.s
+@attr.s(slots=True)
 class ClefObject(Marking):
 	"""
 	This is an object that holds information related to all clefs.
 	"""
-	name = attr.ib(init=False, eq=False)
-	@name.default
+	name = lazy("_get_name", eq=False)
+
 	def _get_name(self):
 		return self._music21_object.sign
 
-	line = attr.ib(init=False, eq=False)
-	@line.default
+	line = lazy("_get_line", eq=False)
+
 	def _get_line(self):
 		return self._music21_object.line
 
-	octave = attr.ib(init=False, eq=False)
-	@octave.default
+	octave = lazy("_get_octave", eq=False)
+
 	def _get_octave(self):
 		return self._music21_object.octaveChange
 
 
-@attr.s
+@attr.s(slots=True)
 class SpannerObject(Marking):
 	"""
 	This is an object that holds information related to musical objects which can span multiple
 	measures like crescendos.
 	"""
-	name = attr.ib(init=False, eq=False)
-	@name.default
+	name = lazy("_get_name", eq=False)
+
 	def _get_name(self):
 		return self._music21_object.type
 
@@ -269,28 +411,62 @@ class SpannerObject(Marking):
 	def _get_measure(self):
 		return self._music21_object.getFirst().measureNumber
 
-	placement = attr.ib(init=False, eq=False)
-	@placement.default
+	# The measure of the last spanned element, the spanner covers measure to end (inclusive).
+	end = attr.ib(init=False, eq=False)
+	@end.default
+	def _get_end(self):
+		return self._music21_object.getLast().measureNumber
+
+	placement = lazy("_get_placement", eq=False)
+
 	def _get_placement(self):
 		return self._music21_object.placement
 
-	length = attr.ib(init=False, eq=False)
-	@length.default
+	length = lazy("_get_length", eq=False)
+
 	def _get_length(self):
 		return self._music21_object.spread
 
 
-@attr.s
+@attr.s(slots=True)
 class DynamicObject(Marking):
 	"""
 	This is an object that holds information related to dynamics
 	"""
-	name = attr.ib(init=False, eq=False)
-	@name.default
+	name = lazy("_get_name", eq=False)
+
 	def _get_name(self):
 		return self._music21_object.longName
 
 
+# The Marking class of each category of a Mupix object, in output order.
+CATEGORIES = {
+	"notes": NoteObject,
+	"rests": RestObject,
+	"timeSignatures": TimeSignatureObject,
+	"keySignatures": KeySignatureObject,
+	"clefs": ClefObject,
+	"spanners": SpannerObject,
+	"dynamics": DynamicObject,
+}
+
+
+def select_categories(categories=None) -> tuple:
+	"""
+	Return the names of the selected categories, in output order. Every category
+	is selected when `categories` is None.
+
+	:param [categories]: Names of categories (keys of :data:`CATEGORIES`), or None.
+	:type [categories]: Iterable
+	"""
+	if categories is None:
+		return tuple(CATEGORIES)
+	unknown = set(categories) - set(CATEGORIES)
+	if unknown:
+		raise ValueError(f"Unknown categories {sorted(unknown)}, use {list(CATEGORIES)}.")
+	return tuple(category for category in CATEGORIES if category in categories)
+
+
 if __name__ == "__main__":
 	"""
 	How to create Mupix Objects.
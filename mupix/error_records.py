@@ -0,0 +1,272 @@
+"""
+The errors found by a comparison, as compact records.
+
+Every wrong property of an aligned pair is one row of four integers: the
+category (notes, rests, etc.), the name of the error (notes_duration,
+note_articulation, etc.), the index of the true object and the index of the
+test object in their category, -1 when the alignment has a gap. The rows are
+stored in a NumPy array that grows by doubling, nothing is formatted while
+comparing.
+
+The records are only turned into something readable when asked for: the
+strings of :attr:`mupix.typewise.BaseCompareClass.error_description`
+(:func:`ErrorRecords.descriptions`), one JSON object per error for the
+`-z` option (:func:`ErrorRecords.asdicts`), or the number of errors of each
+part and measure for the `-e` option (:func:`ErrorRecords.density`).
+"""
+import numpy
+
+from mupix.core import CATEGORIES
+
+# The columns of a record.
+CATEGORY, NAME, TRUE_INDEX, TEST_INDEX = range(4)
+# The index of the missing object of a gap.
+MISSING = -1
+_CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+_CATEGORY_NAMES = list(CATEGORIES)
+
+
+def _json_value(value):
+	if isinstance(value, (set, frozenset)):
+		return sorted(value)
+	if isinstance(value, tuple):
+		return list(value)
+	return value
+
+
+class ErrorRecords:
+	"""
+	The errors of a comparison between two Mupix objects.
+
+	:param [true_data]: The ground truth, the true indices are indices in its categories.
+	:type [true_data]: MupixObject
+
+	:param [test_data]: The compared file, the test indices are indices in its categories.
+	:type [test_data]: MupixObject
+
+	:param [capacity]: The number of records allocated before the array has to grow.
+	:type [capacity]: Integer
+	"""
+	def __init__(self, true_data, test_data, capacity=1024):
+		self.true_data = true_data
+		self.test_data = test_data
+		# Errors that are not about a pair of objects, by name.
+		self.messages = {}
+		self._records = numpy.empty((capacity, 4), dtype=numpy.int32)
+		self._length = 0
+		# The names of the errors, the code of a name is its position.
+		self._names = []
+		self._name_codes = {}
+		self._positions = {}
+		self._locations = {}
+
+	def __len__(self):
+		return self._length
+
+	@property
+	def records(self):
+		"""
+		The (category, name, true index, test index) rows, in the order the errors were found.
+		"""
+		return self._records[:self._length]
+
+	def name_code(self, name: str) -> int:
+		"""
+		The integer code of an error name (eg: "notes_duration").
+		"""
+		try:
+			return self._name_codes[name]
+		except KeyError:
+			self._name_codes[name] = len(self._names)
+			self._names.append(name)
+			return self._name_codes[name]
+
+	def category_code(self, category: str) -> int:
+		return _CATEGORY_CODES[category]
+
+	def index(self, marking, category: str, side: str) -> int:
+		"""
+		The index of a marking in its category of the true ("true") or test ("test")
+		data, MISSING for "_".
+
+		:param [side]: Either "true" or "test".
+		:type [side]: String
+		"""
+		if isinstance(marking, str):
+			return MISSING
+		return self.positions(category, side)[id(marking)]
+
+	def positions(self, category: str, side: str) -> dict:
+		"""
+		The index of each marking of a category, by the id of the marking.
+		"""
+		try:
+			return self._positions[category, side]
+		except KeyError:
+			data = self.true_data if side == "true" else self.test_data
+			self._positions[category, side] = {id(marking): index for index, marking in enumerate(getattr(data, category))}
+			return self._positions[category, side]
+
+	def locations(self, category: str, side: str):
+		"""
+		The parts and the measures of the objects of a category, as two arrays.
+		"""
+		try:
+			return self._locations[category, side]
+		except KeyError:
+			markings = getattr(self.true_data if side == "true" else self.test_data, category)
+			self._locations[category, side] = (
+				numpy.fromiter((marking.part for marking in markings), dtype=numpy.int64, count=len(markings)),
+				numpy.fromiter((marking.measure for marking in markings), dtype=numpy.int64, count=len(markings)),
+			)
+			return self._locations[category, side]
+
+	def _reserve(self, count):
+		needed = self._length + count
+		if needed > len(self._records):
+			grown = numpy.empty((max(needed, 2 * len(self._records)), 4), dtype=numpy.int32)
+			grown[:self._length] = self._records[:self._length]
+			self._records = grown
+
+	def add(self, category: str, name: str, true_index: int, test_index: int):
+		"""
+		Record one error.
+		"""
+		self._reserve(1)
+		self._records[self._length] = (_CATEGORY_CODES[category], self.name_code(name), true_index, test_index)
+		self._length += 1
+
+	def extend(self, records):
+		"""
+		Record many errors at once, from an array of (category, name, true index, test index) rows.
+		"""
+		records = numpy.asarray(records, dtype=numpy.int32).reshape(-1, 4)
+		self._reserve(len(records))
+		self._records[self._length:self._length + len(records)] = records
+		self._length += len(records)
+
+	def discard(self, name: str):
+		"""
+		Remove every error of a name (eg: "notes_name"), when its result is not reported.
+		"""
+		if name in self._name_codes:
+			kept = self.records[self.records[:, NAME] != self._name_codes[name]]
+			self._records[:len(kept)] = kept
+			self._length = len(kept)
+
+	def categories_with_errors(self) -> list:
+		"""
+		The categories that have at least one error.
+		"""
+		return [_CATEGORY_NAMES[code] for code in numpy.unique(self.records[:, CATEGORY]).tolist()]
+
+	def test_indices(self, category: str):
+		"""
+		The indices of the test objects of a category that have at least one error, in order.
+		"""
+		records = self.records[self.records[:, CATEGORY] == _CATEGORY_CODES[category]]
+		indices = numpy.unique(records[:, TEST_INDEX])
+		return indices[indices != MISSING].tolist()
+
+	def density(self, category: str = None):
+		"""
+		Count the errors of each part and measure. An error is located at the true
+		object, or at the test object when the true object is missing. The measures
+		go from the first to the last measure of both files, so every file of a
+		corpus has a row per part and a column per measure.
+
+		:param [category]: Only count the errors of a category (eg: "notes"), every error when None.
+		:type [category]: String
+
+		:return: The number of the first measure, and the (part, measure) array of error counts
+			(density[0, 0] is the first part, in the first measure).
+		:rtype: Tuple of Integer and numpy.ndarray
+		"""
+		records = self.records
+		if category is not None:
+			records = records[records[:, CATEGORY] == _CATEGORY_CODES[category]]
+		parts = numpy.empty(len(records), dtype=numpy.int64)
+		measures = numpy.empty(len(records), dtype=numpy.int64)
+		for code in numpy.unique(records[:, CATEGORY]).tolist():
+			rows = records[:, CATEGORY] == code
+			for side, column in [("test", TEST_INDEX), ("true", TRUE_INDEX)]:
+				located = rows & (records[:, column] != MISSING)
+				side_parts, side_measures = self.locations(_CATEGORY_NAMES[code], side)
+				parts[located] = side_parts[records[located, column]]
+				measures[located] = side_measures[records[located, column]]
+
+		all_parts, all_measures = [parts], [measures]
+		for name in CATEGORIES:
+			for side in ["true", "test"]:
+				side_parts, side_measures = self.locations(name, side)
+				all_parts.append(side_parts)
+				all_measures.append(side_measures)
+		all_parts, all_measures = numpy.concatenate(all_parts), numpy.concatenate(all_measures)
+		if not len(all_measures):
+			return 0, numpy.zeros((0, 0), dtype=numpy.int64)
+		first = int(all_measures.min())
+		width = int(all_measures.max()) - first + 1
+		height = max(int(all_parts.max()), self.true_data.parts, self.test_data.parts)
+		counts = numpy.bincount((parts - 1) * width + measures - first, minlength=height * width)
+		return first, counts.reshape(height, width)
+
+	def _objects(self, record):
+		category = _CATEGORY_NAMES[record[CATEGORY]]
+		true_object = None if record[TRUE_INDEX] == MISSING else getattr(self.true_data, category)[record[TRUE_INDEX]]
+		test_object = None if record[TEST_INDEX] == MISSING else getattr(self.test_data, category)[record[TEST_INDEX]]
+		return category, self._names[record[NAME]], true_object, test_object
+
+	def descriptions(self) -> dict:
+		"""
+		The errors as strings, by name, like "1-4-2.0=>1-4-2.0__C_D" (part, measure and
+		onset of each object, then the true and test values).
+		"""
+		output = {}
+		for record in self.records.tolist():
+			category, name, true_object, test_object = self._objects(record)
+			property_ = name.split("_")[-1]
+			if test_object is None:
+				out = f"{true_object.part}-{true_object.measure}-{true_object.onset}=>skip adjustment"
+			elif true_object is None:
+				out = f"skip adjustment=>{test_object.part}-{test_object.measure}-{test_object.onset}__{name}"
+			elif not name.startswith(category):
+				# The articulations that are missing from the test object ("note_articulation").
+				out = (
+					f"{true_object.part}-{true_object.measure}-{true_object.onset}=>{test_object.part}"
+					f"-{test_object.measure}-{test_object.onset}"
+				)
+			else:
+				out = (
+					f"{true_object.part}-{true_object.measure}-{true_object.onset}=>{test_object.part}-"
+					f"{test_object.measure}-{test_object.onset}__{getattr(true_object, property_)}"
+					f"_{getattr(test_object, property_)}"
+				)
+			output.setdefault(name, []).append(out)
+		output.update(self.messages)
+		return output
+
+	def asdicts(self) -> list:
+		"""
+		The errors as JSON serializable dictionaries, one per error. A missing object is None.
+
+		For example:
+			{"category": "notes", "name": "notes_step", "property": "step",
+			"true": {"index": 3, "part": 1, "measure": 1, "onset": "3.0", "value": 11},
+			"test": {"index": 3, "part": 1, "measure": 1, "onset": "3.0", "value": 0}}
+		"""
+		output = []
+		for record in self.records.tolist():
+			category, name, true_object, test_object = self._objects(record)
+			property_ = name.split("_")[-1]
+			error = {"category": category, "name": name, "property": property_}
+			for side, marking, index in [("true", true_object, record[TRUE_INDEX]), ("test", test_object, record[TEST_INDEX])]:
+				error[side] = None if marking is None else {
+					"index": index,
+					"part": marking.part,
+					"measure": marking.measure,
+					"onset": marking.onset,
+					"value": _json_value(getattr(marking, property_)),
+				}
+			output.append(error)
+		output += [{"name": name, "message": message} for name, message in self.messages.items()]
+		return output
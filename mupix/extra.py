@@ -1,12 +1,23 @@
+import bisect
+import collections
 import copy
+import functools
 import json
+import math
 import os
 import re
 import sys
+from fractions import Fraction
 
-from music21.interval import Interval
-from music21.key import Key
-from music21.note import Note
+from mupix.core import equality_key
+
+# Semitones between C and each note name, in the same octave.
+STEP_SEMITONES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+# music21 accidentals in the name of a key tonic (F#, B-, etc.)
+_TONIC_MODIFIERS = {"#": 1, "-": -1}
+# Quarter lengths written as decimals ("0.3333333333333333") are rounded to the closest
+# fraction with a denominator under this limit, like music21 does.
+_TICK_DENOMINATOR_LIMIT = 65535
 
 
 def __return_root_path() -> str:
@@ -57,7 +68,7 @@ def output_filter(ctx, func, *args, **kwargs):
 	msg = {}
 
 	# If no filtering options are defined, output all information
-	if all(value == False for value in [ctx["notes"], ctx["rests"], ctx["time_signatures"], ctx["key_signatures"], ctx["clefs"], ctx["spanners"], ctx["dynamics"], ctx["visualize"], ctx["error_description"]]):  # noqa
+	if all(value == False for value in [ctx["notes"], ctx["rests"], ctx["time_signatures"], ctx["key_signatures"], ctx["clefs"], ctx["spanners"], ctx["dynamics"], ctx["visualize"], ctx["error_description"], ctx["error_density"]]):  # noqa
 		# turn to json serializable.
 		msg["Notes"] = [i.asdict() for i in output.notes]
 		msg["Rests"] = [i.asdict() for i in output.rests]
@@ -85,30 +96,58 @@ def output_filter(ctx, func, *args, **kwargs):
 		if ctx["dynamics"]:
 			msg["Dynamics"] = [i.asdict() for i in output.dynamics]
 		if ctx["error_description"]:
-			msg["ErrorDescription"] = output.error_description
+			# The errors of a comparison are records, one JSON object per error (see :mod:`mupix.error_records`).
+			errors = getattr(output, "errors", None)
+			msg["ErrorDescription"] = output.error_description if errors is None else errors.asdicts()
 
 	if ctx["total_only"]:
-		for category in msg:
+		# The errors are not results, they are shown as they are.
+		for category in [category for category in msg if category != "ErrorDescription"]:
 			try:
 				msg[category] = [item for item in msg[category] if 'Total' in item['name']]
 			except KeyError:
 				print(f"[{func}] - Does not have a Total output or something went wrong with it.")
 				sys.exit(0)
 
+	if ctx["error_density"] and getattr(output, "errors", None) is not None:
+		# One row of error counts per part, one column per measure from the first measure.
+		first_measure, density = output.errors.density()
+		msg["ErrorDensity"] = {"FirstMeasure": first_measure, "Errors": density.tolist()}
+
+	# The confusion matrices of a comparison, when they were asked for (see :mod:`mupix.confusion`).
+	if getattr(output, "confusion_matrices", None) is not None:
+		msg["Confusion"] = output.confusion_matrices.asdict()
+
 	if ctx["visualize"]:
+		if output.visualize is None:
+			raise Exception("[-] Only files read with music21 can be visualized.")
 		# get Music21 to display the file
 		try:
 			output.visualize.show()
 		except:  # noqa
 			raise Exception("[-] You must install MuseScore for this feature.")
 
-	if not ctx["pretty_print"]:
-		print(msg)
-	else:
+	if ctx["pretty_print"]:
 		print(json.dumps(msg, indent=2))
+	elif ctx["error_description"]:
+		# The error records are meant to be parsed, they are always JSON.
+		print(json.dumps(msg))
+	else:
+		print(msg)
 
 
-def _populate_list(input_list, maximum):
+def _duplicate(marking):
+	"""
+	Return a shallow copy of a Mupix object, without its music21 object. The
+	duplicates are not part of the score, so there is nothing to color when they are
+	wrong, and deep-copying music21 objects is slow.
+	"""
+	duplicate = copy.copy(marking.evaluate())
+	duplicate._music21_object = None
+	return duplicate
+
+
+class ContextTrack:
 	"""
 	Different music engraving software encode time signatures, key signatures,
 	and clefs in a peculiar way. Some repeat the previous object in every
@@ -119,12 +158,265 @@ def _populate_list(input_list, maximum):
 	unchanging clef, was repeated once per measure in the file. The same can happen on a per-system
 	basis. It is not a bad way to explain the music because each element implied, even if it is missing.
 
-	To avoid any further complication, the clefs, time signatures, and key signatures have been
-	"normalized" to always be repeated on every measure, because they are still "acting" on a measure when
-	they are omitted.
+	A context track stores the objects where they actually are (a run-length
+	encoding: for each part, the sorted measures where an object starts) and
+	answers which object is acting on any measure with a binary search. Measures
+	before the first object of a part use the first object. Nothing is copied
+	unless a list with one object per measure is asked for (:func:`ContextTrack.expand`).
+
+	:param [objects]: A list of objects (KeySignatureObject, TimeSignatureObject or ClefObject).
+	:type [objects]: List
+
+	:param [total_measures]: The number of measures in the score, objects don't act past it.
+		None when the number of measures is unknown.
+	:type [total_measures]: Integer
+	"""
+	def __init__(self, objects, total_measures=None):
+		self.total_measures = total_measures
+		self._measures = {}
+		self._objects = {}
+		# Stable sort, the objects of the same measure keep their order.
+		for item in sorted(objects, key=lambda item: (item.part, item.measure)):
+			self._measures.setdefault(item.part, []).append(item.measure)
+			self._objects.setdefault(item.part, []).append(item)
+
+	@property
+	def parts(self):
+		return sorted(self._objects)
+
+	def active(self, part: int, measure: int):
+		"""
+		Return the object acting on a measure of a part (the last one when a measure
+		has many), or None when there is none.
+		"""
+		measures = self._measures.get(part)
+		if not measures or (self.total_measures is not None and measure > self.total_measures):
+			return None
+		index = bisect.bisect_right(measures, measure) - 1
+		if index >= 0:
+			return self._objects[part][index]
+		if measure >= 1:
+			return self._objects[part][0]
+		return None
+
+	def expand(self, part: int):
+		"""
+		Yield the objects of a part "normalized" to be repeated on every measure, up to the
+		total number of measures. The objects of the score are yielded as they are, the
+		missing ones are copies (see :func:`_duplicate`) created as they are reached.
+		"""
+		measures = self._measures.get(part, [])
+		objects = self._objects.get(part, [])
+		if not objects or not self.total_measures:
+			return
+
+		index = 0
+		last = None
+		# Objects before the first measure (eg: a pickup measure numbered 0).
+		while index < len(objects) and measures[index] < 1:
+			last = objects[index]
+			yield last
+			index += 1
+
+		for measure in range(1, self.total_measures + 1):
+			if index < len(objects) and measures[index] == measure:
+				while index < len(objects) and measures[index] == measure:
+					last = objects[index]
+					yield last
+					index += 1
+			else:
+				duplicate = _duplicate(objects[index] if last is None else last)
+				duplicate.measure = measure
+				yield duplicate
+				last = duplicate
+
+
+class IntervalIndex:
+	"""
+	An index of objects spanning several measures (SpannerObject), keyed by part
+	and by the interval of measures they cover, from `measure` to `end` (inclusive).
+
+	For each part the objects are sorted by (measure, end). The running maximum of
+	their ends is kept next to them, so the objects overlapping an interval are
+	found with two binary searches and a scan over the candidates only.
+
+	:param [objects]: A list of objects with a part, a measure and an end.
+	:type [objects]: List
+	"""
+	def __init__(self, objects):
+		self._starts = {}
+		self._reach = {}
+		self._objects = {}
+		for item in sorted(objects, key=lambda item: (item.part, item.measure, _end(item))):
+			reach = self._reach.setdefault(item.part, [])
+			reach.append(max(_end(item), reach[-1]) if reach else _end(item))
+			self._starts.setdefault(item.part, []).append(item.measure)
+			self._objects.setdefault(item.part, []).append(item)
+
+	def __iter__(self):
+		for part in sorted(self._objects):
+			yield from self._objects[part]
+
+	def __len__(self):
+		return sum(len(objects) for objects in self._objects.values())
+
+	def overlapping(self, part: int, start: int, end: int) -> list:
+		"""
+		Return the objects of a part covering at least one measure between start and end (inclusive).
+		"""
+		objects = self._objects.get(part)
+		if not objects:
+			return []
+		# Objects before `low` end before `start`, objects from `high` start after `end`.
+		low = bisect.bisect_left(self._reach[part], start)
+		high = bisect.bisect_right(self._starts[part], end)
+		return [item for item in objects[low:high] if _end(item) >= start]
+
+
+def _end(item) -> int:
+	"""
+	The last measure of an object, objects without an end only cover their measure.
+	"""
+	end = getattr(item, "end", None)
+	return item.measure if end is None else end
+
+
+def match_intervals(true_objects: list, test_objects: list) -> list:
+	"""
+	Pair the true and test objects (SpannerObject) covering the same measures, instead
+	of aligning them as a sequence. Each true object is paired with the unpaired test
+	object of the same part overlapping it, preferring the same name, then the
+	largest overlap, then the closest start. Objects without a partner are paired
+	with "_", like the output of a sequence alignment.
+
+	:param [true_objects]: The objects of the ground truth.
+	:type [true_objects]: List
+
+	:param [test_objects]: The objects of the file being compared.
+	:type [test_objects]: List
+
+	:return: A list of (true object or "_", test object or "_") pairs, in the order of the true objects.
+	:rtype: List
+	"""
+	true_index = IntervalIndex(true_objects)
+	test_index = IntervalIndex(test_objects)
+	paired = set()
+	output = []
+	for true_object in true_index:
+		start, end = true_object.measure, _end(true_object)
+		candidates = [
+			item for item in test_index.overlapping(true_object.part, start, end)
+			if id(item) not in paired
+		]
+		if not candidates:
+			output.append((true_object, "_"))
+			continue
+		best = min(
+			candidates,
+			key=lambda item: (
+				getattr(item, "name", None) != getattr(true_object, "name", None),
+				-(min(end, _end(item)) - max(start, item.measure)),
+				abs(item.measure - start),
+			),
+		)
+		paired.add(id(best))
+		output.append((true_object, best))
+
+	output += [("_", item) for item in test_index if id(item) not in paired]
+	return output
+
+
+def match_equal(true_objects: list, test_objects: list) -> list:
+	"""
+	Pair the objects that are equal (same part, measure, onset and voice for notes)
+	with a hash join, in linear time.
+
+	.. note::
 
-	[TODO] Clean up the algorithm, maybe splitting it into an iter and a yielder or something with dequeue
-	for better readability. This is just a PoC anyway.
+		When several objects share the same key (eg: two notes of a chord), they are
+		paired in the order of the lists: the first true object with the first test
+		object, and so on. The extra objects on either side are not paired, like the
+		objects whose key has no match at all.
+
+	:return: The (true object, test object) pairs, in the order of the true objects.
+	:rtype: List
+	"""
+	buckets = {}
+	for test_object in test_objects:
+		key = (type(test_object), equality_key(type(test_object))(test_object))
+		buckets.setdefault(key, collections.deque()).append(test_object)
+
+	output = []
+	for true_object in true_objects:
+		bucket = buckets.get((type(true_object), equality_key(type(true_object))(true_object)))
+		if bucket:
+			output.append((true_object, bucket.popleft()))
+	return output
+
+
+@functools.lru_cache(maxsize=None)
+def quarter_length_fraction(value: str) -> Fraction:
+	"""
+	The exact quarter length of an onset or a duration ("1.5", "1/3", "0.3333333333333333").
+	"""
+	return Fraction(value).limit_denominator(_TICK_DENOMINATOR_LIMIT)
+
+
+def assign_ticks(markings) -> int:
+	"""
+	Set the `onset_ticks` (and `duration_ticks`) of Marking objects. The resolution
+	is the smallest number of ticks per quarter note that makes every onset and
+	duration of the objects an integer, like the divisions of a MusicXML file.
+
+	:param [markings]: Every Marking object of a score.
+	:type [markings]: Iterable
+
+	:return: The number of ticks per quarter note.
+	:rtype: Integer
+	"""
+	markings = list(markings)
+	ticks_per_quarter = 1
+	for marking in markings:
+		for name in ("onset", "duration"):
+			value = getattr(marking, name, None)
+			if value is not None:
+				denominator = quarter_length_fraction(value).denominator
+				ticks_per_quarter *= denominator // math.gcd(ticks_per_quarter, denominator)
+
+	for marking in markings:
+		marking.onset_ticks = int(quarter_length_fraction(marking.onset) * ticks_per_quarter)
+		if hasattr(type(marking), "duration_ticks"):
+			marking.duration_ticks = int(quarter_length_fraction(marking.duration) * ticks_per_quarter)
+	return ticks_per_quarter
+
+
+def align_ticks(*mupix_objects) -> int:
+	"""
+	Rescale the ticks of Mupix objects to a common resolution, so that their
+	onsets and durations can be compared. Each object is changed in place.
+
+	:return: The common number of ticks per quarter note.
+	:rtype: Integer
+	"""
+	common = 1
+	for mupix_object in mupix_objects:
+		common *= mupix_object.ticks_per_quarter // math.gcd(common, mupix_object.ticks_per_quarter)
+
+	for mupix_object in mupix_objects:
+		factor = common // mupix_object.ticks_per_quarter
+		if factor != 1:
+			for marking in mupix_object.markings():
+				marking.onset_ticks *= factor
+				if getattr(marking, "duration_ticks", None) is not None:
+					marking.duration_ticks *= factor
+		mupix_object.ticks_per_quarter = common
+	return common
+
+
+def _populate_list(input_list, maximum):
+	"""
+	Returns a the list of objects of one part with added objects if they are missing from each measure.
+	See :class:`ContextTrack`.
 
 	:param [input_list]: A list of objects (KeySignatureObject, TimeSignatureObject or ClefObject).
 	:type [input_list]: List
@@ -135,46 +427,8 @@ def _populate_list(input_list, maximum):
 	:return: Returns a the original list with added objects if they are missing from each measure.
 	:rtype: List
 	"""
-
-	measure = 1
-	output_list = []
-	# If there are no inputs given, skip everything.
-	if len(input_list) == 0:
-		return []
-
-	while measure <= maximum:
-		try:
-			# Next element follows sequential number
-			if input_list[0].measure == measure:
-				output_list.append(input_list.pop(0))
-				measure += 1
-			# Missing element, create a new one and add it at the end of the list
-			elif input_list[0].measure > measure:
-				# If there is no information in the first measure, pick the information from the first element and duplicate
-				if len(output_list) == 0:
-					last_object = copy.deepcopy(input_list[0])
-					last_object.measure = measure
-					output_list.append(last_object)
-					measure += 1
-				else:
-					last_object = copy.deepcopy(output_list[-1])
-					last_object.measure += 1
-					output_list.append(last_object)
-					measure += 1
-			# Next element has the same number as the previous one, but the other attributes are different.
-			elif input_list[0].measure < measure:
-				output_list.append(input_list.pop(0))
-		# `input_list` last item's number was smaller than maximum.
-		# Keep creating a duplicate of the last item until maximum is reached.
-		except IndexError:
-			try:
-				tail_object = copy.deepcopy(output_list[-1])
-			except IndexError:
-					raise Exception(len(input_list), input_list, output_list)
-			tail_object.measure += 1
-			output_list.append(tail_object)
-			measure += 1
-	return output_list
+	track = ContextTrack(input_list, maximum)
+	return [item for part in track.parts for item in track.expand(part)]
 
 
 def normalize_object_list(object_list, total_measures, total_parts):
@@ -183,13 +437,22 @@ def normalize_object_list(object_list, total_measures, total_parts):
 	part and populate missing information in place. This small function just
 	makes sure :func:`mupix.base._populate_list` occurs on every part.
 	"""
+	track = ContextTrack(object_list, total_measures)
 	obj = []
 	for part in range(1, total_parts + 1):
-		obj += _populate_list([x for x in object_list if x.part == part], total_measures)
+		obj += track.expand(part)
 	return obj
 
 
-def add_step_information(notes: list, keySignatures: list):
+@functools.lru_cache(maxsize=None)
+def tonic_semitones(tonic: str) -> int:
+	"""
+	Return the pitch class (0 to 11) of a key tonic written like music21 does (C, F#, B-, etc.)
+	"""
+	return (STEP_SEMITONES[tonic[0].upper()] + sum(_TONIC_MODIFIERS[modifier] for modifier in tonic[1:])) % 12
+
+
+def add_step_information(notes: list, keySignatures):
 	"""
 	This function will populate the step information into Mupix note objects, it
 	is required because music21 will not keep key signature information in
@@ -197,21 +460,26 @@ def add_step_information(notes: list, keySignatures: list):
 	The maintainers of music21 don't believe this is an issue and won't fix it,
 	so this and others must exist.
 
+	The step is the number of semitones between the tonic of the key and the
+	note name, modulo 12. The mode does not matter, music21 only gives major keys
+	and a minor key has the same tonic.
+
 	:param [notes]: A list of Mupix NoteObjects.
 	:type [notes]: List
 
-	:param [keySignatures]: A list of Mupix KeySignatureObjects.
-	:type [keySignatures]: List
+	:param [keySignatures]: The key signatures acting on each measure, or a list of Mupix KeySignatureObjects.
+	:type [keySignatures]: ContextTrack or List
 
 	:return [List]: The original list of Mupix NoteObjects (in order) with step information included.
 	:rtype: List
 	"""
-	for key in keySignatures:  # min 1 keySignatures per measure
+	if not isinstance(keySignatures, ContextTrack):
+		keySignatures = ContextTrack(keySignatures)
 
-		key_name = key.step.upper() if key.mode == "major" else key.step.lower()
-		for note in notes:
-			if note.part == key.part and note.measure == key.measure:
-				note.step = Interval(noteStart=Note(Key(key_name).asKey().tonic), noteEnd=Note(note._music21_object.step)).semitones % 12
+	for note in notes:
+		key = keySignatures.active(note.part, note.measure)
+		if key is not None:
+			note.step = (STEP_SEMITONES[note.name] - tonic_semitones(key.step)) % 12
 
 	return notes
 
@@ -0,0 +1,259 @@
+"""
+A small on-disk index used to find which ground truth an unlabelled symbolic
+music-file most likely belongs to, without comparing it against the whole corpus.
+
+Every score is reduced to a set of note-feature n-grams (note names, accidentals,
+octaves and durations in musical order), which is summarized by a MinHash
+sketch. Sketches are split into bands, and every band is stored in an inverted
+index (band hash -> documents), so that a lookup only has to score the few
+documents sharing at least one band with the query.
+
+The index is a directory with two files:
+
+	- `index.json`         The indexed filepaths, the parameters and the inverted index.
+	- `signatures.npy`     The MinHash sketches, one row per indexed filepath.
+"""
+import hashlib
+import json
+import os
+
+import attr
+import numpy
+
+from mupix.typewise import MupixObject
+
+# Largest 31 bit prime, keeps (a * x + b) below 2 ** 63 for 32 bit hashes.
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _stable_hash(value: str) -> int:
+	"""
+	The builtin `hash` is salted per process, the index has to survive restarts.
+	"""
+	return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def score_features(mupix_object, ngram: int = 3) -> set:
+	"""
+	Return the set of note-feature n-grams of a Mupix object.
+
+	Notes and rests of each part are put back in musical order and turned into
+	tokens (`C#4:1.0`, `r:0.5`). Part numbers are not part of the features, OMR
+	outputs regularly merge or split staves.
+
+	:param [mupix_object]: A parsed Mupix object.
+	:type [mupix_object]: MupixObject
+
+	:param [ngram]: How many consecutive tokens make one feature.
+	:type [ngram]: Integer
+
+	:return: A set of features, as strings.
+	:rtype: Set
+	"""
+	events = []
+	for note in mupix_object.notes:
+		events.append((note.part, note.measure, note.onset_ticks, f"{note.name}{note.accidental}{note.octave}:{note.duration}"))
+	for rest in mupix_object.rests:
+		events.append((rest.part, rest.measure, rest.onset_ticks, f"r:{rest.duration}"))
+	events.sort(key=lambda event: event[:3])
+
+	features = set()
+	for part in sorted(set(event[0] for event in events)):
+		tokens = [event[3] for event in events if event[0] == part]
+		if len(tokens) < ngram:
+			features.add(" ".join(tokens))
+			continue
+		for index in range(len(tokens) - ngram + 1):
+			features.add(" ".join(tokens[index:index + ngram]))
+	return features
+
+
+@attr.s
+class MinHash:
+	"""
+	A MinHash sketcher, turning a set of features into a fixed size signature.
+	The estimated Jaccard similarity of two sets is the fraction of equal values
+	in their signatures.
+
+	:param [num_perm]: The number of hash functions (length of the signatures).
+	:type [num_perm]: Integer
+
+	:param [seed]: The seed of the hash functions, signatures built with different seeds can't be compared.
+	:type [seed]: Integer
+	"""
+	num_perm = attr.ib(default=64, type=int)
+	seed = attr.ib(default=1, type=int)
+
+	def __attrs_post_init__(self):
+		generator = numpy.random.RandomState(self.seed)
+		self._a = generator.randint(1, _MERSENNE_PRIME, size=self.num_perm, dtype=numpy.int64)
+		self._b = generator.randint(0, _MERSENNE_PRIME, size=self.num_perm, dtype=numpy.int64)
+
+	def signature(self, features: set):
+		"""
+		Return the MinHash signature of a set of features.
+		"""
+		if len(features) == 0:
+			return numpy.full(self.num_perm, _MERSENNE_PRIME, dtype=numpy.int64)
+		hashes = numpy.fromiter((_stable_hash(item) for item in features), dtype=numpy.int64, count=len(features))
+		permuted = (numpy.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+		return permuted.min(axis=0)
+
+
+@attr.s
+class CorpusIndex:
+	"""
+	Inverted index of MinHash sketches, one per symbolic music-file.
+
+	:param [directory]: Where the index is stored on disk.
+	:type [directory]: String
+
+	:param [num_perm]: Length of the MinHash signatures.
+	:type [num_perm]: Integer
+
+	:param [bands]: In how many bands the signatures are split for the inverted index.
+		More bands find more (and less similar) candidates.
+	:type [bands]: Integer
+
+	:param [ngram]: How many consecutive notes make one feature.
+	:type [ngram]: Integer
+	"""
+	directory = attr.ib(type=str)
+	num_perm = attr.ib(kw_only=True, default=64, type=int)
+	bands = attr.ib(kw_only=True, default=16, type=int)
+	ngram = attr.ib(kw_only=True, default=3, type=int)
+
+	filepaths = attr.ib(init=False, factory=list)
+	buckets = attr.ib(init=False, factory=dict, repr=False)
+	signatures = attr.ib(init=False, default=None, repr=False)
+
+	@bands.validator
+	def _check_bands(self, attribute, value):
+		if self.num_perm % value != 0:
+			raise ValueError(f"num_perm ({self.num_perm}) must be a multiple of bands ({value}).")
+
+	def __attrs_post_init__(self):
+		self._minhash = MinHash(num_perm=self.num_perm)
+		self.signatures = numpy.zeros((0, self.num_perm), dtype=numpy.int64)
+
+	@property
+	def _metadata_path(self):
+		return os.path.join(self.directory, "index.json")
+
+	@property
+	def _signatures_path(self):
+		return os.path.join(self.directory, "signatures.npy")
+
+	@classmethod
+	def load(cls, directory):
+		"""
+		Open an existing index, or start a new one if the directory has no index.
+		"""
+		metadata_path = os.path.join(directory, "index.json")
+		if not os.path.exists(metadata_path):
+			return cls(directory)
+
+		with open(metadata_path, "r") as f:
+			metadata = json.load(f)
+
+		index = cls(directory, num_perm=metadata["num_perm"], bands=metadata["bands"], ngram=metadata["ngram"])
+		index.filepaths = metadata["filepaths"]
+		index.buckets = metadata["buckets"]
+		index.signatures = numpy.load(index._signatures_path, mmap_mode="r")
+		return index
+
+	def save(self):
+		"""
+		Write the index to its directory.
+		"""
+		os.makedirs(self.directory, exist_ok=True)
+		numpy.save(self._signatures_path, numpy.asarray(self.signatures))
+		with open(self._metadata_path, "w") as f:
+			json.dump(
+				{
+					"num_perm": self.num_perm,
+					"bands": self.bands,
+					"ngram": self.ngram,
+					"filepaths": self.filepaths,
+					"buckets": self.buckets,
+				},
+				f,
+			)
+
+	def _band_keys(self, signature):
+		"""
+		Return the inverted index key of each band of a signature.
+		"""
+		rows = self.num_perm // self.bands
+		return [
+			f"{band}:{_stable_hash(','.join(map(str, signature[band * rows:(band + 1) * rows])))}"
+			for band in range(self.bands)
+		]
+
+	def sketch(self, filepath):
+		"""
+		Parse a file and return its MinHash signature.
+		"""
+		return self._minhash.signature(score_features(MupixObject.from_filepath(filepath), ngram=self.ngram))
+
+	def add(self, filepath):
+		"""
+		Add a file to the index. Files that are already indexed are replaced.
+
+		:return: The position of the file in the index.
+		:rtype: Integer
+		"""
+		filepath = os.path.abspath(filepath)
+		signature = self.sketch(filepath)
+
+		if filepath in self.filepaths:
+			position = self.filepaths.index(filepath)
+			for key in self._band_keys(self.signatures[position]):
+				self.buckets[key].remove(position)
+			self.signatures = numpy.array(self.signatures)
+			self.signatures[position] = signature
+		else:
+			position = len(self.filepaths)
+			self.filepaths.append(filepath)
+			self.signatures = numpy.vstack([self.signatures, signature[numpy.newaxis, :]])
+
+		for key in self._band_keys(signature):
+			self.buckets.setdefault(key, []).append(position)
+		return position
+
+	def lookup(self, filepath, top: int = 5):
+		"""
+		Return the indexed files that are the most similar to the given file.
+
+		Only the files sharing at least one band with the query are scored. When
+		no file shares a band, every signature is scored instead, which is still
+		a single vectorized operation.
+
+		:param [filepath]: The file to look for.
+		:type [filepath]: String
+
+		:param [top]: The maximum number of candidates to return.
+		:type [top]: Integer
+
+		:return: A list of `{"filepath": ..., "similarity": ...}`, most similar first.
+		:rtype: List
+		"""
+		if len(self.filepaths) == 0:
+			return []
+
+		signature = self.sketch(filepath)
+		candidates = set()
+		for key in self._band_keys(signature):
+			candidates.update(self.buckets.get(key, []))
+
+		if candidates:
+			candidates = numpy.array(sorted(candidates))
+		else:
+			candidates = numpy.arange(len(self.filepaths))
+
+		similarity = (numpy.asarray(self.signatures[candidates]) == signature).mean(axis=1)
+		order = numpy.argsort(-similarity, kind="stable")[:top]
+		return [
+			{"filepath": self.filepaths[candidates[position]], "similarity": float(similarity[position])}
+			for position in order
+		]
@@ -0,0 +1,245 @@
+"""
+The input layer: every symbolic music-file is read from disk once.
+
+An :class:`InputFile` holds the bytes of a file. The header (everything before
+the first part or measure) is enough to know the encoding, whether the file is
+part-wise or time-wise, and which software wrote it, so those are found
+without looking at the rest of the file. The same bytes are then given to the
+parser (music21 or :mod:`mupix.reader`), the validator and the caches.
+
+Compressed MusicXML (`.mxl`) files are opened in memory, the score is the root
+file named in `META-INF/container.xml`. Zip and tar archives of MusicXML files
+are read member by member with :func:`iter_input_files`, nothing is extracted
+to the disk.
+"""
+import hashlib
+import io
+import os
+import re
+import tarfile
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+import attr
+from music21.musicxml import xmlToM21
+
+_ENCODING_DECLARATION = re.compile(rb"""^\s*<\?xml[^>]*encoding=["']([A-Za-z0-9._-]+)["']""")
+_BYTE_ORDER_MARKS = [
+	(b"\xef\xbb\xbf", "utf-8-sig"),
+	(b"\xff\xfe", "utf-16"),
+	(b"\xfe\xff", "utf-16"),
+]
+# The header ends where the first part (part-wise) or measure (time-wise) starts.
+_HEADER_END = re.compile(r"<(part|measure)[\s>]")
+_ROOT = re.compile(r"<score-(partwise|timewise)[\s>]")
+_SOFTWARE = re.compile(r"<software>(.+?)</software>")
+_HEADER_CHUNK = 64 * 1024
+_ZIP_MAGIC = b"PK\x03\x04"
+_MXL_CONTAINER = "META-INF/container.xml"
+# The members of an archive that are symbolic music-files.
+_MUSICXML_EXTENSIONS = (".xml", ".musicxml", ".mxl")
+
+
+def _mxl_root(archive: zipfile.ZipFile) -> str:
+	"""
+	The name of the score in a compressed MusicXML file: the first root file of
+	its container, or the first MusicXML file when there is no container.
+	"""
+	names = archive.namelist()
+	if _MXL_CONTAINER in names:
+		container = ElementTree.fromstring(archive.read(_MXL_CONTAINER))
+		for rootfile in container.iter():
+			if rootfile.tag.split("}")[-1] == "rootfile" and rootfile.get("full-path"):
+				return rootfile.get("full-path")
+	for name in names:
+		if name.endswith((".xml", ".musicxml")) and not name.startswith("META-INF/"):
+			return name
+	raise ValueError("The compressed MusicXML file has no score.")
+
+
+@attr.s
+class InputFile:
+	"""
+	The contents of a symbolic music-file, read once.
+
+	:param [filepath]: Where the file was read from.
+	:type [filepath]: String
+
+	:param [data]: The bytes of the file (the uncompressed score of a `.mxl` file).
+	:type [data]: Bytes
+
+	:param [container]: The file on the disk, when the file was read from an archive.
+	:type [container]: String
+	"""
+	filepath = attr.ib(type=str)
+	data = attr.ib(type=bytes, repr=False)
+	container = attr.ib(default=None, type=str)
+
+	_header = attr.ib(init=False, default=None, repr=False)
+	_digest = attr.ib(init=False, default=None, repr=False)
+
+	@classmethod
+	def open(cls, source):
+		"""
+		Read a file. An InputFile is returned as it is, so functions can accept both.
+
+		:param [source]: A filepath or an InputFile.
+		:type [source]: String or InputFile
+		"""
+		if isinstance(source, InputFile):
+			return source
+		with open(source, "rb") as f:
+			return cls.from_bytes(source, f.read())
+
+	@classmethod
+	def from_bytes(cls, filepath, data: bytes, container=None):
+		"""
+		Create an InputFile from bytes that were already read, uncompressing `.mxl` files.
+
+		:param [filepath]: The name of the file.
+		:type [filepath]: String
+
+		:param [data]: The contents of the file.
+		:type [data]: Bytes
+
+		:param [container]: The archive the file was read from, if any.
+		:type [container]: String
+		"""
+		if data.startswith(_ZIP_MAGIC):
+			with zipfile.ZipFile(io.BytesIO(data)) as archive:
+				data = archive.read(_mxl_root(archive))
+		return cls(filepath, data, container=container)
+
+	@property
+	def disk_path(self) -> str:
+		"""
+		The file on the disk: the file itself, or the archive it was read from.
+		"""
+		return self.container or self.filepath
+
+	@property
+	def encoding(self) -> str:
+		"""
+		The encoding of the file, from its byte order mark or XML declaration (utf-8 by default).
+		"""
+		for mark, encoding in _BYTE_ORDER_MARKS:
+			if self.data.startswith(mark):
+				return encoding
+		match = _ENCODING_DECLARATION.match(self.data[:256])
+		if match is not None:
+			return match.group(1).decode("ascii").lower()
+		return "utf-8"
+
+	@property
+	def header(self) -> str:
+		"""
+		The decoded beginning of the file, up to the first part or measure.
+		"""
+		if self._header is None:
+			end = _HEADER_CHUNK
+			while True:
+				text = self.data[:end].decode(self.encoding, errors="ignore")
+				match = _HEADER_END.search(text)
+				if match is not None:
+					self._header = text[:match.start()]
+					break
+				if end >= len(self.data):
+					self._header = text
+					break
+				end *= 2
+		return self._header
+
+	@property
+	def xml_type(self):
+		"""
+		"Partwise", "Timewise", or None when the header has neither root element.
+		"""
+		match = _ROOT.search(self.header)
+		if match is None:
+			return None
+		return match.group(1).capitalize()
+
+	@property
+	def software_vendor(self) -> list:
+		"""
+		The first software of the encoding information, split on spaces (eg: ["MuseScore", "2.1.0"]).
+		It is empty when the file does not say which software wrote it.
+		"""
+		match = _SOFTWARE.search(self.header)
+		if match is None:
+			return []
+		return match.group(1).split(" ")
+
+	@property
+	def digest(self) -> str:
+		"""
+		The hexadecimal SHA-256 digest of the contents.
+		"""
+		if self._digest is None:
+			self._digest = hashlib.sha256(self.data).hexdigest()
+		return self._digest
+
+	def stream(self):
+		"""
+		A binary file object over the contents, for parsers that want one.
+		"""
+		return io.BytesIO(self.data)
+
+	def music21_score(self):
+		"""
+		Parse the contents with music21, like `music21.converter.parseFile` does for a
+		MusicXML file, without opening the file again.
+		"""
+		importer = xmlToM21.MusicXMLImporter()
+		importer.xmlRoot = ElementTree.parse(self.stream()).getroot()
+		if importer.xmlRoot.tag != "score-partwise":
+			raise xmlToM21.MusicXMLImportException(
+				f"Cannot parse MusicXML files not in score-partwise. Root tag was '{importer.xmlRoot.tag}'"
+			)
+		importer.xmlRootToScore(importer.xmlRoot, importer.stream)
+		if importer.stream.metadata.movementName is None:
+			importer.stream.metadata.movementName = os.path.basename(self.filepath)
+		return importer.stream
+
+
+def _is_musicxml_member(name: str) -> bool:
+	"""
+	Whether a member of an archive is a MusicXML file, and not metadata (hidden files, etc.)
+	"""
+	if name.startswith(("META-INF/", "__MACOSX/")) or name.rsplit("/", 1)[-1].startswith("."):
+		return False
+	return name.lower().endswith(_MUSICXML_EXTENSIONS)
+
+
+def iter_input_files(source):
+	"""
+	Yield the InputFile of a file, or of each MusicXML member of a zip or tar
+	archive. Members are read in memory one at a time, they are named
+	`<archive>/<member>`. A `.mxl` file is a single file, not an archive.
+
+	:param [source]: A filepath or an InputFile.
+	:type [source]: String or InputFile
+	"""
+	if isinstance(source, InputFile):
+		yield source
+		return
+
+	if tarfile.is_tarfile(source):
+		# A stream, the archive is read once from the beginning to the end.
+		with tarfile.open(source, "r|*") as archive:
+			for member in archive:
+				if member.isfile() and _is_musicxml_member(member.name):
+					data = archive.extractfile(member).read()
+					yield InputFile.from_bytes(os.path.join(source, member.name), data, container=source)
+		return
+
+	if zipfile.is_zipfile(source):
+		with zipfile.ZipFile(source) as archive:
+			names = archive.namelist()
+			if _MXL_CONTAINER not in names:
+				for name in names:
+					if not name.endswith("/") and _is_musicxml_member(name):
+						yield InputFile.from_bytes(os.path.join(source, name), archive.read(name), container=source)
+				return
+
+	yield InputFile.open(source)
@@ -2,21 +2,25 @@ import itertools
 import operator
 
 import attr
-import music21
 
 from mupix.core import (
-	NoteObject,
-	RestObject,
-	TimeSignatureObject,
-	KeySignatureObject,
-	ClefObject,
 	Marking,
+	select_categories,
 )
 from mupix.extra import (
 	add_step_information,
+	align_ticks,
+	assign_ticks,
 	normalize_object_list,
 )
-from mupix.typewise import BaseCompareClass
+from mupix.inputs import InputFile
+from mupix.reader import read_musicxml
+from mupix.typewise import (
+	BaseCompareClass,
+	countable_results,
+	extract_part,
+	in_selection,
+)
 
 
 @attr.s
@@ -37,12 +41,19 @@ class MupixPartwiseObject():
 		# 	iterable_validator=attr.validators.instance_of(list)
 		# ),
 	)
+	ticks_per_quarter = attr.ib(kw_only=True, type=int, default=1, repr=False, validator=[attr.validators.instance_of(int)])
 
 	def __iter__(self):
 		return iter(self.parts)
 
+	def markings(self):
+		"""
+		Iterate over every Marking object, part by part.
+		"""
+		return itertools.chain.from_iterable(self.parts)
+
 	@classmethod
-	def from_filepath(cls, filepath):
+	def from_filepath(cls, filepath, reader="music21", detach=False, categories=None, measures=None, parts=None):
 		"""
 
 		Music notation software will sometimes repeat time signature, key signature
@@ -53,16 +64,35 @@ class MupixPartwiseObject():
 		Sometimes key signature information gets deleted in music21 objects, to
 		combat this we force the key signature to be reintroduced to specify a note
 		step.
+
+		The reader, detach, categories, measures and parts options are the same as :func:`mupix.typewise.MupixObject.from_filepath`.
 		"""
 
+		selected = select_categories(categories)
+		extracted_categories = selected + ("keySignatures",) if "notes" in selected else selected
+		input_file = InputFile.open(filepath)
+		if reader == "lxml":
+			extracted_parts, _ = read_musicxml(input_file.stream(), categories=extracted_categories, measures=measures, parts=parts)
+		elif reader == "music21":
+			extracted_parts = [
+				extract_part(score_part, parts_index, categories=extracted_categories)
+				for parts_index, score_part in enumerate(input_file.music21_score().recurse().getElementsByClass("Part"), 1)
+			]
+		else:
+			raise ValueError(f"Unknown reader {reader}, use 'music21' or 'lxml'.")
+
 		notes, rests, timeSignatures, keySignatures, clefs = [], [], [], [], []
 		# Creates lists of lists notes[part][index]
-		for parts_index, parts in enumerate(music21.converter.parseFile(filepath).recurse().getElementsByClass("Part"), 1):  # noqa
-			notes.append([NoteObject(item, parts_index) for item in parts.recurse().notes if not item.isChord])
-			rests.append([RestObject(item, parts_index) for item in parts.recurse().notesAndRests if not item.isNote])
-			timeSignatures.append([TimeSignatureObject(item, parts_index) for item in parts.recurse().getElementsByClass("TimeSignature")])  # noqa
-			keySignatures.append([KeySignatureObject(item, parts_index) for item in parts.recurse().getElementsByClass("KeySignature")])  # noqa
-			clefs.append([ClefObject(item, parts_index) for item in parts.recurse().getElementsByClass("Clef")])
+		for parts_index, extracted in enumerate(extracted_parts, 1):
+			notes.append(extracted["notes"])
+			rests.append(extracted["rests"])
+			timeSignatures.append(extracted["timeSignatures"])
+			keySignatures.append(extracted["keySignatures"])
+			clefs.append(extracted["clefs"])
+		# Before the objects are copied into every measure, so that the copies have their ticks.
+		ticks_per_quarter = assign_ticks(
+			itertools.chain.from_iterable(itertools.chain(notes, rests, timeSignatures, keySignatures, clefs))
+		)
 
 		try:
 			measuresInScore = max(notes[0] + rests[0], key=operator.attrgetter('measure')).measure
@@ -93,6 +123,8 @@ class MupixPartwiseObject():
 		for part in range(parts_index):
 			# only once keySignatures are normalized can we add the step information.
 			notes[part] = add_step_information(notes[part], keySignatures[part])
+			if "keySignatures" not in selected:
+				keySignatures[part] = []
 
 		# Finally sort all elements in the correct musical stream
 		out = []
@@ -100,7 +132,7 @@ class MupixPartwiseObject():
 			# Get notes and rests together first
 			notes_and_rests = sorted(
 				itertools.chain(notes[part], rests[part]),
-				key=operator.attrgetter("measure", "onset")
+				key=operator.attrgetter("measure", "onset_ticks")
 			)
 			# Make sure clefs, time sigs, and key sigs come first.
 			out.append(
@@ -111,18 +143,45 @@ class MupixPartwiseObject():
 						keySignatures[part],
 						notes_and_rests,
 					),
-					key=operator.attrgetter("measure", "onset")
+					key=operator.attrgetter("measure", "onset_ticks")
 				)
 			)
-		return cls(parts=out)
+
+		if measures is not None or parts is not None:
+			out = [[item for item in part if in_selection(item, measures, parts)] for part in out]
+
+		if detach:
+			for marking in itertools.chain.from_iterable(out):
+				marking.detach()
+		return cls(parts=out, ticks_per_quarter=ticks_per_quarter)
 
 
 class PartiwiseCompareClass(BaseCompareClass):
 	"""
+	The base comparison class for part-wise Mupix Objects.
+
+	:param [do_not_count]: The results that are left out (eg: ["notes_beam"]), see :func:`countable_results`.
+	:type [do_not_count]: List
+
+	:param [visualize]: Not supported by part-wise comparisons, must be False.
+	:type [visualize]: Boolean
+
+	:param [confusion]: Not supported by part-wise comparisons, must be False.
+	:type [confusion]: Boolean
 	"""
-	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = []):
-		self.true_data = MupixPartwiseObject.from_filepath(true_filepath)
-		self.test_data = MupixPartwiseObject.from_filepath(test_filepath)
+	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = [], visualize=False, confusion=False, **parse_options):
+		unknown = set(do_not_count) - set(countable_results())
+		if unknown:
+			raise ValueError(f"Unknown results {sorted(unknown)}, use {countable_results()}.")
+		if visualize or confusion:
+			raise ValueError("Part-wise comparisons can not visualize their errors or count confusion matrices.")
+		self._do_not_count = frozenset(do_not_count)
+		self._plans = {}
+		# Part-wise objects are not cached.
+		parse_options.pop("cache", None)
+		self.true_data = MupixPartwiseObject.from_filepath(true_filepath, **parse_options)
+		self.test_data = MupixPartwiseObject.from_filepath(test_filepath, **parse_options)
+		align_ticks(self.true_data, self.test_data)
 
 	def sequence_alignment(self, func):
 
@@ -134,7 +193,7 @@ class PartiwiseCompareClass(BaseCompareClass):
 			break
 
 		# print(true_part)
-		a = func(true_part, test_part)
+		a = func(true_part, test_part, ignored=self._do_not_count)
 		print(a)
 		import sys
 		sys.exit(0)
@@ -0,0 +1,567 @@
+"""
+A MusicXML reader built on `lxml`, it creates the Mupix objects directly from a
+part-wise MusicXML file without building a music21 stream.
+
+It follows the way music21 imports MusicXML, so both readers give the same Mupix
+objects:
+
+	- Offsets and durations are quarter lengths, written like music21 writes them ("1.5", "1/3").
+	- Parts with multiple staves are split in one part per staff.
+	- Voices are only numbered when a staff has more than one voice in a measure.
+	- Chords are kept with the rests, like `notesAndRests` without the notes.
+	- Key signatures are read in the major mode.
+	- Wedges (crescendo, diminuendo) are the only spanners.
+
+Elements are released as soon as their measure is read, which keeps the memory
+usage low even for large scores.
+"""
+import re
+from fractions import Fraction
+
+from lxml import etree
+
+from mupix.core import (
+	select_categories,
+	NoteObject,
+	RestObject,
+	TimeSignatureObject,
+	KeySignatureObject,
+	ClefObject,
+	SpannerObject,
+	DynamicObject,
+)
+
+_STEP_SEMITONES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+_ALTER_MODIFIERS = {-2: "--", -1.5: "`-", -1: "-", -0.5: "`", 0: "", 0.5: "~", 1: "#", 1.5: "#~", 2: "##"}
+_BEAM_TYPES = {"begin": "start", "continue": "continue", "end": "stop", "forward hook": "partial", "backward hook": "partial"}
+_TYPE_QUARTER_LENGTHS = {
+	"maxima": Fraction(32),
+	"long": Fraction(16),
+	"breve": Fraction(8),
+	"whole": Fraction(4),
+	"half": Fraction(2),
+	"quarter": Fraction(1),
+	"eighth": Fraction(1, 2),
+	"16th": Fraction(1, 4),
+	"32nd": Fraction(1, 8),
+	"64th": Fraction(1, 16),
+	"128th": Fraction(1, 32),
+	"256th": Fraction(1, 64),
+	"512th": Fraction(1, 128),
+	"1024th": Fraction(1, 256),
+}
+_STEM_DIRECTIONS = {"none": "noStem"}
+_CLEF_LINES = {"G": 2, "F": 4, "C": 3, "TAB": 5}
+_TIE_ORIENTATIONS = {"over": "above", "under": "below"}
+_DYNAMIC_LONG_NAMES = {
+	"ppp": "pianississimo",
+	"pp": "pianissimo",
+	"p": "piano",
+	"mp": "mezzopiano",
+	"mf": "mezzoforte",
+	"f": "forte",
+	"fp": "fortepiano",
+	"sf": "sforzando",
+	"ff": "fortissimo",
+	"fff": "fortississimo",
+}
+_DENOMINATOR_LIMIT = 65535
+_WEDGE_TYPES = {"crescendo", "diminuendo"}
+# The category of each child of <attributes> that becomes a Mupix object.
+_ATTRIBUTE_CATEGORIES = {"key": "keySignatures", "time": "timeSignatures", "clef": "clefs"}
+# DynamicWedge defaults in music21, neither is read from MusicXML.
+_WEDGE_PLACEMENT = "below"
+_WEDGE_SPREAD = 15
+
+
+def _op_frac(value):
+	"""
+	Same as `music21.common.opFrac`, which music21 applies to every offset and
+	duration. Fractions with a power of two denominator become floats, and floats
+	that are not exact (like an accumulated 1/3) become fractions.
+	"""
+	if isinstance(value, Fraction):
+		if value.denominator & (value.denominator - 1) == 0:
+			return float(value)
+		return value
+	value = float(value)
+	if value.as_integer_ratio()[1] > _DENOMINATOR_LIMIT:
+		return Fraction(value).limit_denominator(_DENOMINATOR_LIMIT)
+	return value
+
+
+def quarter_length_string(value) -> str:
+	"""
+	Write a quarter length the way music21 does ("1.5", "1/3").
+	"""
+	return str(_op_frac(value))
+
+
+def _text(element, path, default=None):
+	found = element.find(path)
+	if found is None or found.text is None:
+		return default
+	return found.text.strip()
+
+
+def _measure_number(element) -> int:
+	"""
+	music21 keeps the digits of the number attribute ("X1" -> 1, "44b" -> 44).
+	"""
+	digits = re.sub(r"\D", "", element.get("number", ""))
+	return int(digits) if digits else 0
+
+
+def _key_tonic(fifths: int) -> str:
+	"""
+	Return the tonic of the major key with the given number of fifths (-3 -> E-).
+	"""
+	index = fifths + 1
+	accidentals = index // 7
+	return "FCGDAEB"[index % 7] + ("#" * accidentals if accidentals > 0 else "-" * -accidentals)
+
+
+def _pitch_space(note_element) -> Fraction:
+	step = _text(note_element, "pitch/step", "C")
+	octave = int(_text(note_element, "pitch/octave", "4"))
+	return (octave + 1) * 12 + _STEP_SEMITONES[step] + Fraction(_text(note_element, "pitch/alter", "0"))
+
+
+def _articulations(note_element) -> list:
+	return [
+		item.tag.replace("-", " ")
+		for item in note_element.iterfind("notations/articulations/*")
+		if isinstance(item.tag, str) and item.tag != "other-articulation"
+	]
+
+
+def _tie(note_element) -> tuple:
+	"""
+	Return the (style, type, placement) of a tie, or None for each if there is no tie.
+	"""
+	types = [item.get("type") for item in note_element.iterfind("tie")]
+	if not types:
+		return None, None, None
+
+	if len(types) == 1:
+		tie_type = types[0]
+	elif "start" in types and "stop" in types:
+		tie_type = "continue"
+	else:
+		tie_type = "start"
+
+	style, placement = "normal", None
+	tied = note_element.find("notations/tied")
+	if tied is not None:
+		if tied.get("line-type") not in (None, "wavy"):
+			style = tied.get("line-type")
+		placement = tied.get("placement") or _TIE_ORIENTATIONS.get(tied.get("orientation"))
+	return style, tie_type, placement
+
+
+def _wedge_end(wedge: dict):
+	"""
+	The measure of the last note of a wedge, never before its first note (a wedge
+	stopped before any note, or never stopped, only covers its first measure).
+	"""
+	if wedge["end"] is None:
+		return wedge["measure"]
+	return max(wedge["measure"], wedge["end"])
+
+
+def _release(measure_element):
+	"""
+	Release a measure that was read, and the measures before it.
+	"""
+	measure_element.clear()
+	while measure_element.getprevious() is not None:
+		del measure_element.getparent()[0]
+
+
+class _PartReader:
+	"""
+	Reads the measures of a single MusicXML part, keeping the information that
+	carries over from one measure to the next (divisions, number of staves, and
+	the wedges waiting for their first note).
+	"""
+	def __init__(self, first_part_number, categories=None, measures=None, parts=None):
+		self.first_part_number = first_part_number
+		self.categories = frozenset(select_categories(categories))
+		self.selected_measures = measures
+		self.selected_parts = None if parts is None else frozenset(parts)
+		self.divisions = 1
+		self.staves = 1
+		self.measures = 0
+		self.staff_events = {}
+		self.wedges = []
+		self._waiting_wedges = []
+		# Wedges that are not stopped yet, by number, and where the last note was read.
+		self._open_wedges = {}
+		self._last_note_measure = None
+
+	def _staff(self, element) -> int:
+		return int(_text(element, "staff", "1"))
+
+	def _events(self, staff):
+		if staff not in self.staff_events:
+			self.staff_events[staff] = {
+				"notes": [],
+				"rests": [],
+				"timeSignatures": [],
+				"keySignatures": [],
+				"clefs": [],
+				"dynamics": [],
+			}
+		return self.staff_events[staff]
+
+	def _all_staves(self):
+		return range(1, self.staves + 1)
+
+	def _is_selected(self, measure) -> bool:
+		"""
+		Whether a measure is in the selected measures, and one of the staves of the part is a selected part.
+		"""
+		if self.selected_measures is not None:
+			first, last = self.selected_measures
+			if not first <= measure <= last:
+				return False
+		if self.selected_parts is not None:
+			return any(self.first_part_number + staff - 1 in self.selected_parts for staff in self._all_staves())
+		return True
+
+	def skip_measure(self, measure_element, measure):
+		"""
+		Only read what carries over to the next measures (divisions, staves, the context
+		markings and the wedges), the notes are not read at all.
+		"""
+		for element in measure_element:
+			if element.tag == "note":
+				self._last_note_measure = measure
+				for wedge in self._waiting_wedges:
+					wedge["measure"] = measure
+				self._waiting_wedges = []
+			elif element.tag == "attributes":
+				for staff, category, mupix_object in self._read_attributes(element, measure, 0.0):
+					self._events(staff)[category].append(mupix_object)
+			elif element.tag == "direction" and "spanners" in self.categories:
+				self._read_direction(element, measure, 0.0)
+		_release(measure_element)
+
+	def read_measure(self, measure_element):
+		"""
+		Create the Mupix objects of one measure.
+		"""
+		self.measures += 1
+		measure = _measure_number(measure_element)
+		# The number of staves of a part is known before its first measure is read.
+		staves = measure_element.find("attributes/staves")
+		if self.measures == 1 and staves is not None:
+			self.staves = int(staves.text)
+		if not self._is_selected(measure):
+			self.skip_measure(measure_element, measure)
+			return
+		# A float, music21 accumulates the offsets the same way.
+		position = 0.0
+
+		# Notes and rests of each staff as (voice, offset, sequence, category, values), and
+		# the other markings as (offset, sequence, staff, category, object). Both are put in
+		# musical order at the end of the measure.
+		sounding = {}
+		markings = []
+		voices = {}
+		chord = []
+
+		def flush_chord():
+			"""
+			A note followed by <chord/> notes becomes a single chord, which music21
+			lists with the rests.
+			"""
+			if not chord:
+				return
+			offset, sequence, first = chord[0]
+			category = "notes" if len(chord) == 1 else "rests"
+			if category not in self.categories:
+				del chord[:]
+				return
+			values = self._event_values(first, measure, offset, pitched=category == "notes")
+			if category == "rests":
+				values["articulation"] = []
+				for element in sorted((element for _, _, element in chord), key=_pitch_space):
+					values["articulation"] += _articulations(element)
+			sounding.setdefault(self._staff(first), []).append((values.pop("_voice"), offset, sequence, category, values))
+			del chord[:]
+
+		for sequence, element in enumerate(measure_element):
+			tag = element.tag
+			if tag == "note":
+				staff = self._staff(element)
+				voices.setdefault(staff, set()).add(_text(element, "voice", "1"))
+				self._last_note_measure = measure
+
+				if element.find("chord") is not None and chord:
+					chord.append((chord[0][0], sequence, element))
+					continue
+				flush_chord()
+
+				for wedge in self._waiting_wedges:
+					wedge["measure"] = measure
+				self._waiting_wedges = []
+
+				if element.find("rest") is not None:
+					if "rests" in self.categories:
+						values = self._event_values(element, measure, position)
+						sounding.setdefault(staff, []).append((values.pop("_voice"), position, sequence, "rests", values))
+				elif element.find("pitch") is not None:
+					chord.append((position, sequence, element))
+
+				position += self._note_duration(element)
+
+			elif tag == "backup":
+				flush_chord()
+				position -= self._duration(element)
+
+			elif tag == "forward":
+				flush_chord()
+				position += self._duration(element)
+
+			elif tag == "attributes":
+				flush_chord()
+				markings += [(position, sequence) + item for item in self._read_attributes(element, measure, position)]
+
+			elif tag == "direction":
+				flush_chord()
+				markings += [(offset, sequence) + item for offset, item in self._read_direction(element, measure, position)]
+
+		flush_chord()
+
+		for _, _, staff, category, mupix_object in sorted(markings, key=lambda marking: marking[:2]):
+			self._events(staff)[category].append(mupix_object)
+
+		for staff, events in sounding.items():
+			multiple_voices = len(voices.get(staff, ())) > 1
+			if multiple_voices:
+				events.sort(key=lambda event: event[:3])
+			else:
+				events.sort(key=lambda event: event[1:3])
+
+			part = self.first_part_number + staff - 1
+			for voice, _, _, category, values in events:
+				values["voice"] = int(voice) if multiple_voices else 1
+				mupix_class = NoteObject if category == "notes" else RestObject
+				self._events(staff)[category].append(mupix_class.from_values(part, **values))
+
+		_release(measure_element)
+
+	def _duration(self, element):
+		"""
+		The raw duration of an element, in quarter lengths.
+		"""
+		return _op_frac(float(_text(element, "duration", "0")) / self.divisions)
+
+	def _note_duration(self, element):
+		"""
+		Like music21, the duration of a note comes from its type, dots and time
+		modification. The raw duration is only used when the type is missing.
+		"""
+		if element.find("grace") is not None:
+			return 0.0
+
+		note_type = _text(element, "type")
+		if note_type not in _TYPE_QUARTER_LENGTHS:
+			return self._duration(element)
+
+		dots = len(element.findall("dot"))
+		duration = _TYPE_QUARTER_LENGTHS[note_type] * (2 - Fraction(1, 2 ** dots))
+		actual = _text(element, "time-modification/actual-notes")
+		normal = _text(element, "time-modification/normal-notes")
+		if actual is not None and normal is not None:
+			duration *= Fraction(int(normal), int(actual))
+		return _op_frac(duration)
+
+	def _event_values(self, element, measure, offset, pitched=True) -> dict:
+		"""
+		The values shared by notes and rests, and the note values when there is a
+		pitch. Chords are rests, they don't get the note values (pitched=False).
+		"""
+		values = {
+			"measure": measure,
+			"onset": quarter_length_string(offset),
+			"duration": quarter_length_string(self._note_duration(element)),
+			"articulation": _articulations(element),
+			"_voice": _text(element, "voice", "1"),
+		}
+		if not pitched or element.find("pitch") is None:
+			return values
+
+		tie_style, tie_type, tie_placement = _tie(element)
+		values.update({
+			"step": None,
+			"name": _text(element, "pitch/step"),
+			"octave": int(_text(element, "pitch/octave", "4")),
+			"accidental": _ALTER_MODIFIERS.get(float(_text(element, "pitch/alter", "0")), ""),
+			"stemdirection": _STEM_DIRECTIONS.get(_text(element, "stem"), _text(element, "stem", "unspecified")),
+			"beam": set(_BEAM_TYPES.get(item.text.strip(), item.text.strip()) for item in element.iterfind("beam") if item.text),
+			"tiestyle": tie_style,
+			"tietype": tie_type,
+			"tieplacement": tie_placement,
+		})
+		return values
+
+	def _read_attributes(self, element, measure, position) -> list:
+		"""
+		Return the key signatures, time signatures and clefs of an <attributes>
+		element as (staff, category, object).
+		"""
+		output = []
+		onset = quarter_length_string(position)
+		# <staves> comes after <key> and <time>, which apply to every staff.
+		self.divisions = int(_text(element, "divisions", self.divisions))
+		self.staves = int(_text(element, "staves", self.staves))
+
+		for item in element:
+			tag = item.tag
+			if _ATTRIBUTE_CATEGORIES.get(tag) not in self.categories:
+				continue
+			if tag == "key":
+				fifths = _text(item, "fifths")
+				if fifths is None:
+					continue
+				for staff in [int(item.get("number"))] if item.get("number") else self._all_staves():
+					output.append((staff, "keySignatures", KeySignatureObject.from_values(
+						self.first_part_number + staff - 1,
+						measure=measure,
+						onset=onset,
+						step=_key_tonic(int(fifths)),
+						mode="major",
+					)))
+			elif tag == "time":
+				beats = _text(item, "beats")
+				beat_type = _text(item, "beat-type")
+				if beats is None or beat_type is None:
+					continue
+				for staff in [int(item.get("number"))] if item.get("number") else self._all_staves():
+					output.append((staff, "timeSignatures", TimeSignatureObject.from_values(
+						self.first_part_number + staff - 1,
+						measure=measure,
+						onset=onset,
+						numerator=sum(int(value) for value in beats.split("+")),
+						denominator=int(beat_type),
+					)))
+			elif tag == "clef":
+				sign = _text(item, "sign")
+				line = _text(item, "line")
+				staff = int(item.get("number", "1"))
+				output.append((staff, "clefs", ClefObject.from_values(
+					self.first_part_number + staff - 1,
+					measure=measure,
+					onset=onset,
+					name=sign,
+					line=int(line) if line is not None else _CLEF_LINES.get(sign),
+					octave=int(_text(item, "clef-octave-change", "0")),
+				)))
+		return output
+
+	def _read_direction(self, element, measure, position) -> list:
+		"""
+		Return the dynamics of a <direction> element as (offset, (staff, category, object)),
+		wedges are kept until their first note is found and until they are stopped.
+		"""
+		output = []
+		staff = self._staff(element)
+		offset = _op_frac(position + _op_frac(float(_text(element, "offset", "0")) / self.divisions))
+
+		for item in element.iterfind("direction-type/*"):
+			if item.tag == "dynamics" and "dynamics" in self.categories:
+				for dynamic in item:
+					if not isinstance(dynamic.tag, str):
+						continue
+					text = dynamic.text.strip() if dynamic.tag == "other-dynamic" else dynamic.tag
+					output.append((offset, (staff, "dynamics", DynamicObject.from_values(
+						self.first_part_number + staff - 1,
+						measure=measure,
+						onset=quarter_length_string(offset),
+						name=_DYNAMIC_LONG_NAMES.get(text),
+					))))
+			elif item.tag != "wedge" or "spanners" not in self.categories:
+				continue
+			elif item.get("type") in _WEDGE_TYPES:
+				# The measure of its first note, or the measure it starts in when no note follows it.
+				wedge = {"staff": staff, "name": item.get("type"), "measure": measure, "end": None}
+				self.wedges.append(wedge)
+				self._waiting_wedges.append(wedge)
+				self._open_wedges[item.get("number", "1")] = wedge
+			elif item.get("type") == "stop":
+				# Like music21, a wedge ends on the last note before it is stopped.
+				wedge = self._open_wedges.pop(item.get("number", "1"), None)
+				if wedge is not None:
+					wedge["end"] = self._last_note_measure
+		return output
+
+	def parts(self) -> list:
+		"""
+		Return the Mupix objects of each staff of the part, as a list of dictionaries.
+		"""
+		output = []
+		for staff in sorted(set(self._all_staves()) | set(self.staff_events)):
+			extracted = self._events(staff)
+			part = self.first_part_number + staff - 1
+			spanners = [
+				SpannerObject.from_values(
+					part,
+					onset="0.0",
+					name=wedge["name"],
+					measure=wedge["measure"],
+					end=_wedge_end(wedge),
+					placement=_WEDGE_PLACEMENT,
+					length=_WEDGE_SPREAD,
+				)
+				for wedge in self.wedges
+				if wedge["staff"] == staff
+			]
+			extracted["spanners"] = spanners
+			output.append(extracted)
+		return output
+
+
+def read_musicxml(source, categories=None, measures=None, parts=None) -> tuple:
+	"""
+	Read a part-wise MusicXML file and create its Mupix objects, part by part.
+
+	:param [source]: A filepath or a binary file object.
+	:type [source]: String or file object
+
+	:param [categories]: The names of the categories to create, every category when None.
+	:type [categories]: Iterable
+
+	:param [measures]: The first and last measure numbers to read (inclusive), every measure when None.
+		The notes of the other measures are skipped, their context markings are still read.
+	:type [measures]: Tuple
+
+	:param [parts]: The part numbers to read, every part when None.
+	:type [parts]: Iterable
+
+	:return: A list of dictionaries (one per part, like :func:`mupix.typewise.extract_part`),
+		and the software vendor.
+	:rtype: Tuple
+	"""
+	extracted_parts = []
+	software_vendor = []
+	part_reader = None
+
+	for event, element in etree.iterparse(source, events=("start", "end"), tag=("part", "measure", "software")):
+		if event == "start":
+			if element.tag == "part":
+				part_reader = _PartReader(len(extracted_parts) + 1, categories, measures, parts)
+			continue
+
+		if element.tag == "software":
+			if not software_vendor and element.text:
+				software_vendor = element.text.split(" ")
+		elif element.tag == "measure" and part_reader is not None:
+			part_reader.read_measure(element)
+		elif element.tag == "part":
+			extracted_parts += part_reader.parts()
+			part_reader = None
+			element.clear()
+
+	return extracted_parts, software_vendor
@@ -1,5 +1,21 @@
+"""
+Right and wrong counts of the properties of compared objects.
+
+Results are plain counts, so they can be merged: the results of files (or of
+parts of files) compared in different processes or on different machines add
+up to the results of the whole corpus, without comparing anything again.
+Adding is associative and commutative, and a :class:`ResultSet` is serialized
+as the output of `mupix -p compare`.
+"""
+import json
+
 import attr
 
+from mupix.core import CATEGORIES
+
+# The name of each category in the output of a comparison (eg: "TimeSignatures").
+_OUTPUT_NAMES = {category: category[0].upper() + category[1:] for category in CATEGORIES}
+
 
 @attr.s
 class Result:
@@ -30,6 +46,37 @@ class Result:
 		"""
 		return attr.asdict(self)
 
+	@classmethod
+	def from_dict(cls, data: dict):
+		"""
+		The inverse of :func:`asdict`, the Result subclass is found with the name.
+
+		:param [data]: A dictionary with a name and the right and wrong counts.
+		:type [data]: Dictionary
+		"""
+		result = _result_classes().get(data["name"], cls)(name=data["name"])
+		result.right = data["right"]
+		result.wrong = data["wrong"]
+		return result
+
+	def __add__(self, other):
+		"""
+		A new Result with the counts of both results, which must have the same name.
+		"""
+		if other == 0:
+			# So that the results can be summed with `sum`.
+			return self + type(self)(name=self.name)
+		if not isinstance(other, Result):
+			return NotImplemented
+		if other.name != self.name:
+			raise ValueError(f"Can't add a {other.name} to a {self.name}.")
+		result = type(self)(name=self.name)
+		result.right = self.right + other.right
+		result.wrong = self.wrong + other.wrong
+		return result
+
+	__radd__ = __add__
+
 
 @attr.s
 class NoteStepResult(Result):
@@ -283,3 +330,84 @@ class DynamicNameResult(Result):
 class DynamicTotalResult(Result):
 	"""
 	"""
+
+
+def _result_classes() -> dict:
+	"""
+	Every Result class, by name.
+	"""
+	classes, subclasses = {}, [Result]
+	while subclasses:
+		subclass = subclasses.pop()
+		classes[subclass.__name__] = subclass
+		subclasses += subclass.__subclasses__()
+	return classes
+
+
+@attr.s
+class ResultSet:
+	"""
+	The results of one or many comparisons, by category. Adding two sets adds
+	the results with the same name, so the results of many files can be
+	reduced to the results of the corpus in any order.
+
+	:param [results]: The Result objects of each category (eg: "notes"), in output order.
+	:type [results]: Dictionary
+	"""
+	results = attr.ib(factory=dict)
+
+	@classmethod
+	def from_comparison(cls, comparison):
+		"""
+		The results of a comparison (eg: a BasicCompare object), totals included.
+		"""
+		return cls({
+			category: list(getattr(comparison, category))
+			for category in CATEGORIES if hasattr(comparison, category)
+		})
+
+	def __add__(self, other):
+		if other == 0:
+			return self + ResultSet()
+		if not isinstance(other, ResultSet):
+			return NotImplemented
+		results = {}
+		for category in list(self.results) + [category for category in other.results if category not in self.results]:
+			merged = {}
+			for result in self.results.get(category, []) + other.results.get(category, []):
+				merged[result.name] = merged.get(result.name, 0) + result
+			results[category] = list(merged.values())
+		return ResultSet(results)
+
+	__radd__ = __add__
+
+	def asdict(self) -> dict:
+		"""
+		The results as the output of a comparison, for example:
+			{"Notes": [{"right": 7, "wrong": 1, "name": "NoteAccidentalResult"}, ...], "Rests": [...]}
+		"""
+		return {_OUTPUT_NAMES[category]: [result.asdict() for result in results] for category, results in self.results.items()}
+
+	@classmethod
+	def from_dict(cls, data: dict):
+		"""
+		The inverse of :func:`asdict`. Other keys of the output of a comparison
+		(eg: "ErrorDescription") are ignored.
+		"""
+		return cls({
+			category: [Result.from_dict(result) for result in data[name]]
+			for category, name in _OUTPUT_NAMES.items() if name in data
+		})
+
+	def dumps(self) -> str:
+		"""
+		Serialize the results to a JSON string.
+		"""
+		return json.dumps(self.asdict())
+
+	@classmethod
+	def loads(cls, text: str):
+		"""
+		The inverse of :func:`dumps`.
+		"""
+		return cls.from_dict(json.loads(text))
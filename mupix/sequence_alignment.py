@@ -42,6 +42,9 @@ class SequenceAlignment:
 	gap_open_y = attr.ib(kw_only=True, default=-10)
 	gap_extend_y = attr.ib(kw_only=True, default=-1)
 
+	# The results that are not counted (eg: "notes_beam"), the scoring method does not look at them.
+	ignored = attr.ib(kw_only=True, factory=frozenset)
+
 	_skips = attr.ib(init=False, default=0)
 
 	def __attrs_post_init__(self):
@@ -232,6 +235,44 @@ class AffineNeedlemanWunsch(SequenceAlignment):
 
 @attr.s
 class AdvancedAffineNeedlemanWunsch(AffineNeedlemanWunsch):
+	# The (result, property, weight) of each type of object, the weight is added when the
+	# property of both objects is the same, and removed otherwise.
+	_weights = {
+		"notes": [
+			("notes_octave", "octave", 1),
+			# ("notes_voice", "voice", 1),
+			("notes_step", "step", 4),
+			("notes_duration", "duration_ticks", 2),
+			# ("notes_beam", "beam", 1),
+			("notes_accidental", "accidental", 1),
+			# ("notes_stemdirection", "stemdirection", 1),
+		],
+		"rests": [
+			("rests_voice", "voice", 1),
+			("rests_duration", "duration_ticks", 5),
+		],
+		"timeSignatures": [
+			("timeSignatures_numerator", "numerator", 2),
+			("timeSignatures_denominator", "denominator", 2),
+		],
+		"keySignatures": [
+			("keySignatures_step", "step", 2),
+			("keySignatures_mode", "mode", 2),
+			("keySignatures_onset", "onset_ticks", 2),
+		],
+		"clefs": [
+			("clefs_name", "name", 5),
+			("clefs_line", "line", 2),
+			("clefs_octave", "octave", 2),
+			("clefs_onset", "onset_ticks", 2),
+		],
+		"spanners": [
+			("spanners_name", "name", 5),
+			("spanners_placement", "placement", 2),
+			("spanners_length", "length", 1),
+		],
+	}
+
 	def scoring_method(self, true, test):
 		"""
 		Grading method for comparing the two elements in scope.
@@ -247,44 +288,16 @@ class AdvancedAffineNeedlemanWunsch(AffineNeedlemanWunsch):
 		except AttributeError:
 			return score
 
-		# If both objects are Notes
-		if true.asname() == "Note" and test.asname() == "Note":
-			score += 1 if true.octave == test.octave else -1
-			# score += 1 if true.voice == test.voice else -1
-			score += 4 if true.step == test.step else -4
-			score += 2 if true.duration == test.duration else -2
-			# score += 1 if true.beam == test.beam else -1
-			score += 1 if true.accidental == test.accidental else -1
-			# score += 1 if true.stemdirection == test.stemdirection else -1
-
-		if true.asname() == "Rest" and test.asname() == "Rest":
-			score += 1 if true.voice == test.voice else -1
-			score += 5 if true.duration == test.duration else -5
-
-		if true.asname() == "TimeSignature" and test.asname() == "TimeSignature":
-			score += 2 if true.numerator == test.numerator else -2
-			score += 2 if true.denominator == test.denominator else -2
-
-		if true.asname() == "KeySignature" and test.asname() == "KeySignature":
-			score += 2 if true.step == test.step else -2
-			score += 2 if true.mode == test.mode else -2
-			score += 2 if true.onset == test.onset else -2
-
-		if true.asname() == "Clef" and test.asname() == "Clef":
-			score += 5 if true.name == test.name else -5
-			score += 2 if true.line == test.line else -2
-			score += 2 if true.octave == test.octave else -2
-			score += 2 if true.onset == test.onset else -2
-
-		if true.asname() == "Spanner" and test.asname() == "Spanner":
-			score += 5 if true.name == test.name else -5
-			score += 2 if true.placement == test.placement else -2
-			score += 1 if true.length == test.length else -1
+		# If both objects are of the same type
+		if true.asname() == test.asname():
+			for result, property_, weight in self._weights.get(true.asname(), []):
+				if result not in self.ignored:
+					score += weight if getattr(true, property_) == getattr(test, property_) else -weight
 
 		# If the objects are the same type
 		score += 10 if true.part == test.part else -10
 		score += 5 if true.measure == test.measure else -5
-		score += 5 if true.onset == test.onset else -5
+		score += 5 if true.onset_ticks == test.onset_ticks else -5
 		score += 5 if true.asname() == test.asname() else -5
 
 		return score
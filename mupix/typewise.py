@@ -5,13 +5,17 @@
 # TODO: Create an automated method for testing multiple versions of Notation software (Almost done)
 """
 
-import re
+import functools
+import itertools
 import operator
 
 import attr
 import music21
+import numpy
 
 from mupix.core import (
+	CATEGORIES,
+	select_categories,
 	NoteObject,
 	RestObject,
 	TimeSignatureObject,
@@ -59,12 +63,147 @@ from mupix.result_objects import (
 	DynamicNameResult,
 	DynamicTotalResult,
 )
+from mupix.cache import ground_truths
+from mupix.columnar import ColumnarCategory
+from mupix.confusion import ConfusionMatrices
+from mupix.error_records import (
+	MISSING,
+	ErrorRecords,
+)
 from mupix.extra import (
+	ContextTrack,
 	add_step_information,
-	normalize_object_list,
+	align_ticks,
+	assign_ticks,
+	match_equal,
+	match_intervals,
 	return_char_except,
 	boundary_search,
 )
+from mupix.inputs import InputFile
+from mupix.reader import read_musicxml
+
+
+# The music21 classes that are extracted, and the Mupix object each one becomes.
+_EXTRACTED_CLASSES = {
+	music21.meter.TimeSignature: ("timeSignatures", TimeSignatureObject),
+	music21.key.KeySignature: ("keySignatures", KeySignatureObject),
+	music21.clef.Clef: ("clefs", ClefObject),
+	music21.dynamics.Dynamic: ("dynamics", DynamicObject),
+}
+
+
+# The tick attribute used to compare a time property of two objects.
+_TICKS = {"onset": "onset_ticks", "duration": "duration_ticks"}
+# The category of the results of each compared Marking class. Dynamics are not compared yet.
+_COMPARED_CATEGORIES = {
+	NoteObject: "notes",
+	RestObject: "rests",
+	TimeSignatureObject: "timeSignatures",
+	KeySignatureObject: "keySignatures",
+	ClefObject: "clefs",
+	SpannerObject: "spanners",
+}
+# The categories whose articulations are also counted one by one.
+_ARTICULATED_CATEGORIES = {"notes", "rests"}
+
+
+@functools.lru_cache(maxsize=None)
+def _dispatch(music21_class):
+	"""
+	Return the (category, Mupix object) pair of a music21 class, or None if it
+	is not extracted. Subclasses (eg: TrebleClef) are found through their mro.
+	"""
+	for klass in music21_class.__mro__:
+		if klass in _EXTRACTED_CLASSES:
+			return _EXTRACTED_CLASSES[klass]
+	return None
+
+
+def extract_part(part, parts_index: int, categories=None) -> dict:
+	"""
+	Create the Mupix objects of a single music21 part, walking through the part
+	only once and dispatching each element according to its class. Only the
+	selected categories are created, the others stay empty.
+
+	.. note::
+
+		Notes and rests keep the same meaning as `part.recurse().notes` (without
+		chords) and `part.recurse().notesAndRests` (without notes). The spanners
+		of the part are added once each, in the order of the spanner bundle.
+
+	:param [part]: A music21 Part.
+	:type [part]: music21.stream.Part
+
+	:param [parts_index]: The part number (1 for the first instrument, etc.)
+	:type [parts_index]: Integer
+
+	:param [categories]: The names of the categories to create, every category when None.
+	:type [categories]: Iterable
+
+	:return: A dictionary of lists, one for each category of Mupix objects.
+	:rtype: Dictionary
+	"""
+	extracted = {category: [] for category in CATEGORIES}
+	selected = select_categories(categories)
+	notes, rests, spanners = "notes" in selected, "rests" in selected, "spanners" in selected
+	# The spanners of a measure are the spanners of its part (its active site), which
+	# are looked up once per site instead of once per measure.
+	sites = {}
+
+	for item in part.recurse():
+		if isinstance(item, music21.note.GeneralNote):
+			if notes and isinstance(item, music21.note.NotRest) and not item.isChord:
+				extracted["notes"].append(NoteObject(item, parts_index))
+			if rests and not item.isNote:
+				extracted["rests"].append(RestObject(item, parts_index))
+		elif isinstance(item, music21.stream.Measure):
+			if spanners:
+				sites.setdefault(id(item.activeSite), item.activeSite)
+		else:
+			dispatched = _dispatch(type(item))
+			if dispatched is not None and dispatched[0] in selected:
+				category, mupix_class = dispatched
+				extracted[category].append(mupix_class(item, parts_index))
+
+	unique_spanners = {}
+	for site in sites.values():
+		for spanner in site.spanners:
+			unique_spanners.setdefault(id(spanner), spanner)
+	extracted["spanners"] = [SpannerObject(spanner, parts_index) for spanner in unique_spanners.values()]
+	return extracted
+
+
+def in_selection(marking, measures=None, parts=None) -> bool:
+	"""
+	Whether a Mupix object is in the selected parts and measures. A spanner is
+	selected when it covers at least one selected measure.
+
+	:param [measures]: The first and last selected measure numbers (inclusive), every measure when None.
+	:type [measures]: Tuple
+
+	:param [parts]: The selected part numbers, every part when None.
+	:type [parts]: Iterable
+	"""
+	if parts is not None and marking.part not in parts:
+		return False
+	if measures is None:
+		return True
+	first, last = measures
+	end = getattr(marking, "end", None)
+	return marking.measure <= last and (marking.measure if end is None else end) >= first
+
+
+def _restrict(values: dict, categories, measures=None, parts=None) -> dict:
+	"""
+	Keep the selected categories, parts and measures of the values of a Mupix object.
+	"""
+	for category in CATEGORIES:
+		if category not in categories:
+			values[category] = []
+		elif measures is not None or parts is not None:
+			values[category] = [item for item in values[category] if in_selection(item, measures, parts)]
+	return values
 
 
 @attr.s
@@ -92,6 +231,9 @@ class MupixObject():
 
 	:param [error_description]: More detailed error information
 	:type [error_description]: Dictionary
+
+	:param [ticks_per_quarter]: The resolution of the `onset_ticks` and `duration_ticks` of the objects.
+	:type [ticks_per_quarter]: Integer
 	"""
 	notes = attr.ib(kw_only=True,)
 	rests = attr.ib(kw_only=True,)
@@ -104,6 +246,7 @@ class MupixObject():
 	error_description = attr.ib(kw_only=True, type=dict, validator=[attr.validators.instance_of(dict)])
 	visualize = attr.ib(kw_only=True)
 	software_vendor = attr.ib(kw_only=True, type=list, default=[], validator=[attr.validators.instance_of(list)])
+	ticks_per_quarter = attr.ib(kw_only=True, type=int, default=1, repr=False, validator=[attr.validators.instance_of(int)])
 
 	@notes.validator
 	@rests.validator
@@ -130,8 +273,14 @@ class MupixObject():
 	def __iter__(self):
 		return iter(self.ret())
 
+	def markings(self):
+		"""
+		Iterate over every Marking object, category by category.
+		"""
+		return itertools.chain.from_iterable(getattr(self, category) for category in CATEGORIES)
+
 	@classmethod
-	def from_filepath(cls, filepath):
+	def from_filepath(cls, filepath, reader="music21", detach=False, cache=None, categories=None, measures=None, parts=None, skip=None):
 		"""
 		.. note::
 
@@ -150,77 +299,198 @@ class MupixObject():
 				noteEnd=item).semitones % 12) for item in parts.recurse().notes if not item.isChord]
 
 
-		:param [filepath]: A character string that represents the filepath and filename of the file to open.
-		:type [filepath]: String
+		:param [filepath]: A character string that represents the filepath and filename of the file to open,
+			or a file that was already read.
+		:type [filepath]: String or mupix.inputs.InputFile
+
+		:param [reader]: Either "music21" (default) or "lxml", which reads part-wise MusicXML
+			files directly, without building a music21 stream (see :mod:`mupix.reader`).
+			There is nothing to visualize when using "lxml".
+		:type [reader]: String
+
+		:param [detach]: Drop every reference to music21 once the objects are extracted, so that
+			the music21 stream can be freed. Nothing can be visualized afterwards.
+		:type [detach]: Boolean
+
+		:param [cache]: Where parsed files are stored and looked up before parsing. Cached objects
+			are detached, so the cache is only read when `detach` is True.
+		:type [cache]: mupix.cache.ParseCache
+
+		:param [categories]: The names of the categories to extract (eg: ["notes", "clefs"]), the
+			others are left empty. Every category is extracted when None.
+		:type [categories]: Iterable
+
+		:param [measures]: The first and last measure numbers to extract (inclusive), eg: (120, 180).
+			Every measure is extracted when None. The key signatures of earlier measures still
+			give the steps of the notes.
+		:type [measures]: Tuple
+
+		:param [parts]: The part numbers to extract (1 for the first instrument, etc.), every part when None.
+		:type [parts]: Iterable
+
+		:param [skip]: The properties that are not extracted when detaching, by category
+			(eg: {"notes": ["beam", "stemdirection"]}), they are None. Only the lazy properties of
+			the music21 reader can be skipped, "lxml" reads every property anyway.
+		:type [skip]: Dictionary
 
 		:return: A fully populated Mupix Object, with all the components of the symbolic music file analysized and sorted in their sections.
 		:rtype: Mupix Object
 		"""
 
-		with open(filepath, "r") as f:
-			data = f.read()
-
-		software_vendor = re.finditer(r"(?<=<software>).+(?=<\/software>)", data).__next__().group().split(" ")
+		# The file is only read once, for the cache, the header and the parser.
+		input_file = InputFile.open(filepath)
+		software_vendor = input_file.software_vendor
+
+		selected = select_categories(categories)
+		# The step of a note depends on the key signature acting on it.
+		extracted_categories = selected + ("keySignatures",) if "notes" in selected else selected
+		if measures is not None:
+			measures = tuple(measures)
+		if parts is not None:
+			parts = sorted(set(parts))
+		cache_options = {"reader": reader}
+		skip = {category: sorted(properties) for category, properties in (skip or {}).items() if properties}
+		for name, value in [("categories", categories and list(selected)), ("measures", measures), ("parts", parts), ("skip", skip or None)]:
+			if value is not None:
+				cache_options[name] = value
+
+		if cache is not None and detach:
+			# An entry of the whole file has every selection.
+			cached = cache.load(input_file, reader=reader)
+			if cached is None and len(cache_options) > 1:
+				cached = cache.load(input_file, **cache_options)
+			if cached is not None:
+				return cls(error_description={}, visualize=None, **_restrict(cached, selected, measures, parts))
+
+		if reader == "lxml":
+			extracted_parts, _ = read_musicxml(input_file.stream(), categories=extracted_categories, measures=measures, parts=parts)
+			file_ = None
+		elif reader == "music21":
+			file_ = input_file.music21_score()
+			# Parts that are not selected are skipped, but still counted.
+			extracted_parts = [
+				extract_part(part, parts_index, categories=extracted_categories)
+				if parts is None or parts_index in parts else {category: [] for category in CATEGORIES}
+				for parts_index, part in enumerate(file_.recurse().getElementsByClass("Part"), 1)
+			]
+		else:
+			raise ValueError(f"Unknown reader {reader}, use 'music21' or 'lxml'.")
 
 		notes, rests, timeSignatures, keySignatures, clefs, spanners, dynamics = [], [], [], [], [], [], []
-		_keySignatures = []
-		# _clefs = []
-		file_ = music21.converter.parseFile(filepath, forceSource=True)
-		for parts_index, parts in enumerate(file_.recurse().getElementsByClass("Part"), 1):  # noqa
-			notes += [NoteObject(item, parts_index) for item in parts.recurse().notes if not item.isChord]
-			rests += [RestObject(item, parts_index) for item in parts.recurse().notesAndRests if not item.isNote]
-			timeSignatures += [TimeSignatureObject(item, parts_index) for item in parts.recurse().getElementsByClass("TimeSignature")]  # noqa
-			keySignatures += [KeySignatureObject(item, parts_index) for item in parts.recurse().getElementsByClass("KeySignature")]  # noqa
-			clefs += [ClefObject(item, parts_index) for item in parts.recurse().getElementsByClass("Clef")]
-			dynamics += [DynamicObject(item, parts_index) for item in parts.recurse().getElementsByClass("Dynamic")]
-
-			for measure in parts.recurse().getElementsByClass("Measure"):
-				spanners += [SpannerObject(item, parts_index) for item in measure.activeSite.spanners]
-
-		########################################################
-		# Expand keys
-		#
-		# Because even with activeState, note objects can't find 
-		# the key for some reason?
-			_keySignatures += [KeySignatureObject(item, parts_index) for item in parts.recurse().getElementsByClass("KeySignature")]  # noqa
-			# _clefs += [ClefObject(item, parts_index) for item in parts.recurse().getElementsByClass("Clef")]
+		for extracted in extracted_parts:
+			notes += extracted["notes"]
+			rests += extracted["rests"]
+			timeSignatures += extracted["timeSignatures"]
+			keySignatures += extracted["keySignatures"]
+			clefs += extracted["clefs"]
+			dynamics += extracted["dynamics"]
+			spanners += extracted["spanners"]
+		parts_index = len(extracted_parts)
 
 		try:
 			measuresInScore = max(notes + rests, key=operator.attrgetter('measure')).measure
 		except ValueError:
 			measuresInScore = 0
-			parts_index = 0
+			# A score without notes and rests has no parts, when all of them were extracted.
+			if "notes" in selected and "rests" in selected and measures is None and parts is None:
+				parts_index = 0
 
-		_keySignatures = normalize_object_list(object_list=_keySignatures, total_measures=measuresInScore, total_parts=parts_index)
-		# _clefs = normalize_object_list(object_list=_clefs, total_measures=measuresInScore, total_parts=parts_index)
+		########################################################
+		# Expand keys
+		#
+		# Because even with activeState, note objects can't find
+		# the key for some reason? The context track finds the key acting on
+		# every measure without copying any key signature.
+		_keySignatures = ContextTrack(keySignatures, measuresInScore)
 
 		# only once _keySignatures are normalized can we add the step information.
 		notes = add_step_information(notes, _keySignatures)
 		########################################################
 
-		return cls(
-			notes=notes,
-			rests=rests,
-			timeSignatures=timeSignatures,
-			keySignatures=keySignatures,
-			clefs=clefs,
-			parts=parts_index,
-			spanners=spanners,
-			dynamics=dynamics,
-			error_description={},
-			visualize=file_,
-			software_vendor=software_vendor,
+		if detach:
+			for category, markings in [
+				("notes", notes), ("rests", rests), ("timeSignatures", timeSignatures), ("keySignatures", keySignatures),
+				("clefs", clefs), ("spanners", spanners), ("dynamics", dynamics),
+			]:
+				skipped = skip.get(category, ())
+				for marking in markings:
+					marking.detach(skipped)
+			file_ = None
+		ticks_per_quarter = assign_ticks(itertools.chain(notes, rests, timeSignatures, keySignatures, clefs, spanners, dynamics))
+
+		values = _restrict(
+			dict(
+				notes=notes,
+				rests=rests,
+				timeSignatures=timeSignatures,
+				keySignatures=keySignatures,
+				clefs=clefs,
+				parts=parts_index,
+				spanners=spanners,
+				dynamics=dynamics,
+				software_vendor=software_vendor,
+				ticks_per_quarter=ticks_per_quarter,
+			),
+			selected,
+			measures,
+			parts,
 		)
+		if cache is not None:
+			cache.store(input_file, values, **cache_options)
+		return cls(error_description={}, visualize=file_, **values)
 
 
 class BaseCompareClass(MupixObject):
 	"""
 	The base comparison class for Mupix Objects.
-	"""
-	def __init__(self, true_filepath: str, test_filepath: str, do_not_count: list = []):
-		# for result_to_exclude in do_not_count:
-		#   del self.__getattribute__(result_to_exclude)
 
+	:param [do_not_count]: The results that are left out (eg: ["notes_beam", "notes_stemdirection"]),
+		see :func:`countable_results`. Their properties are not extracted, aligned on, compared or reported.
+	:type [do_not_count]: List
+
+	:param [visualize]: Keep the music21 stream of the test file and color its errors once
+		the comparison is done. Otherwise both files are detached as soon as they are parsed,
+		so their music21 streams can be freed.
+	:type [visualize]: Boolean
+
+	:param [confusion]: Also count which value of each property is compared with which, in
+		`confusion_matrices` (see :mod:`mupix.confusion`). Only aligned pairs are counted.
+	:type [confusion]: Boolean
+	"""
+	def __init__(
+		self, true_filepath: str, test_filepath: str, do_not_count: list = [], visualize=False, confusion=False, **parse_options
+	):
+		self._create_results()
+		self._plans = {}
+		unknown = set(do_not_count) - set(countable_results())
+		if unknown:
+			raise ValueError(f"Unknown results {sorted(unknown)}, use {countable_results()}.")
+		self._do_not_count = frozenset(do_not_count)
+		skip = {}
+		for result_to_exclude in sorted(self._do_not_count):
+			delattr(self, result_to_exclude)
+			category, property_ = result_to_exclude.split("_")
+			# Onsets and durations are always extracted, they place the objects in time.
+			if property_ not in _TICKS:
+				skip.setdefault(category, []).append(property_)
+
+		# Parse both files, parse_options are given to MupixObject.from_filepath (eg: reader="lxml")
+		# Only the test data is ever visualized. The same ground truth is often
+		# compared with many files, it is only parsed once.
+		if skip:
+			parse_options["skip"] = skip
+		self._visualize = visualize
+		self.true_data = ground_truths.get(true_filepath, MupixObject.from_filepath, **dict(parse_options, detach=True))
+		self.test_data = MupixObject.from_filepath(test_filepath, **dict(parse_options, detach=not visualize))
+		# Onsets and durations are compared as ticks, at the same resolution.
+		align_ticks(self.true_data, self.test_data)
+		self.errors = ErrorRecords(self.true_data, self.test_data)
+		self.confusion_matrices = ConfusionMatrices() if confusion else None
+
+	def _create_results(self):
+		"""
+		Create an empty list and the Result objects of every category.
+		"""
 		# Notes
 		self.notes = []
 		self.notes_step = NoteStepResult()
@@ -278,12 +548,13 @@ class BaseCompareClass(MupixObject):
 		self.dynamics_name = DynamicNameResult()
 		self.dynamics_total = DynamicTotalResult()
 
-
-		self.error_description = {}
-
-		# Parse both files
-		self.true_data = MupixObject.from_filepath(true_filepath)
-		self.test_data = MupixObject.from_filepath(test_filepath)
+	@property
+	def error_description(self):
+		"""
+		The errors as strings, by name. They are formatted every time they are read,
+		see :func:`mupix.error_records.ErrorRecords.descriptions`.
+		"""
+		return self.errors.descriptions()
 
 	def _return_object_names(self):
 		"""
@@ -292,7 +563,7 @@ class BaseCompareClass(MupixObject):
 		For example:
 			['clefs', 'keySignatures', 'notes', 'rests', 'timeSignatures', 'spanners']
 		"""
-		return [item for item in dir(self) if "_" not in item and item not in ["check", "ret"]]
+		return [item for item in dir(self) if "_" not in item and item not in ["check", "ret", "markings", "errors"]]
 
 	def _return_parameter_names(self, field):
 		"""
@@ -303,61 +574,45 @@ class BaseCompareClass(MupixObject):
 		"""
 		return [item for item in dir(self) if field in item and "_" in item and "total" not in item]
 
-	def _compare_expand_objects_same(self, true_object, test_object, object_):
+	def _color_wrong(self, test_object):
 		"""
-		Compare the properties of two same objects for any property that may be incorrect.
+		Color a wrong marking for the visualization. There is nothing to color when
+		the marking is missing ("_") or was not read with music21.
 		"""
-		for result_parameter in self._return_parameter_names(object_):
-			property_ = result_parameter.split("_")[-1]
-			try:
-				if true_object.__getattribute__(property_) == test_object.__getattribute__(property_):
-					self.__getattribute__(result_parameter).right += 1
-				else:
-					out = (
-						f"{true_object.part}-{true_object.measure}-{true_object.onset}=>{test_object.part}-"
-						f"{test_object.measure}-{test_object.onset}__{true_object.__getattribute__(property_)}"
-						f"_{test_object.__getattribute__(property_)}"
-					)
-					try:
-						self.error_description[result_parameter].append(out)
-					except KeyError:
-						self.error_description[result_parameter] = [out]
-					self.__getattribute__(result_parameter).wrong += 1
-					# Adding color to wrong notes for visualization
-					test_object._music21_object.style.color = "pink"
-			except AttributeError:
-				raise Exception(type(true_object), type(test_object), "What happened here???")
-
-	def _compare_expand_objects_different(self, true_object, test_object, object_):
-		for parameter in self._return_parameter_names(object_):
-
-			if isinstance(test_object, str):
-				out = (
-					f"{true_object.part}-{true_object.measure}-{true_object.onset}=>"
-					"skip adjustment"
-				)
-			elif isinstance(true_object, str):
-				out = (
-					f"skip adjustment=>{test_object.part}"
-					f"-{test_object.measure}-{test_object.onset}__{parameter}"
-				)
-			else:
-				out = (
-					f"{true_object.part}-{true_object.measure}-{true_object.onset}=>{test_object.part}"
-					f"-{test_object.measure}-{test_object.onset}__{parameter}"
-				)
-			try:
-				self.error_description[parameter].append(out)
-			except KeyError:
-				self.error_description[parameter] = [out]
+		music21_object = getattr(test_object, "_music21_object", None)
+		if music21_object is not None:
+			music21_object.style.color = "pink"
+
+	def _annotate_errors(self):
+		"""
+		Color every test object that has an error, once the comparison is done.
+		This is the only time the music21 stream is changed.
+		"""
+		for category in self.errors.categories_with_errors():
+			objects = getattr(self.test_data, category)
+			for index in self.errors.test_indices(category):
+				self._color_wrong(objects[index])
 
-			self.__getattribute__(parameter).wrong += 1
-			# Adding color to wrong notes for visualization
-			test_object._music21_object.style.color = "pink"
+	def _comparison_plan(self, category):
+		"""
+		The results of a category (eg: "notes"), as a list of (result name, property,
+		getter of the compared value, Result object). A plan is made once per comparison,
+		so that comparing a pair of objects does not look the results up again.
+		"""
+		if category in self._plans:
+			return self._plans[category]
+		plan = []
+		for result_parameter in self._return_parameter_names(category):
+			property_ = result_parameter.split("_")[-1]
+			# Onsets and durations are compared exactly, as ticks, and shown as strings.
+			getter = operator.attrgetter(_TICKS.get(property_, property_))
+			plan.append((result_parameter, property_, getter, self.__getattribute__(result_parameter)))
+		self._plans[category] = plan
+		return plan
 
-	def _compare(self, true_object, test_object):
+	def _compare_aligned(self, true_objects, test_objects):
 		"""
-		Compare two Mupix Objects.
+		Compare two aligned lists of objects ("_" where the alignment has a gap).
 
 			- If the sequence alignment believes there is an extra note in the OMR output, simply deleting the extra note
 			should be the solution. Removing each wrong element individually and finally removing the note is not how a
@@ -365,121 +620,92 @@ class BaseCompareClass(MupixObject):
 
 			- Then check for each parameter available in the type of marking, count an error for each wrong element and a
 			right for every correct. This function should works for all Mupix objects.
-		"""
-		# If object is misaligned
-		try:
-			self.true_part = true_object.part
-			self.true_onset = true_object.onset
-			self.true_mu21_obj = true_object._music21_object
-		except AttributeError:
-			self.true_part = "_"
-			self.true_onset = ""
-			self.true_mu21_obj = ""
-
-		# If object is missaligned
-		try:
-			self.test_part = test_object.part
-			self.test_onset = test_object.onset
-			self.test_mu21_obj = test_object._music21_object
-		except AttributeError:
-			self.test_part = "_"
-			self.test_onset = ""
-			self.test_mu21_obj = ""
-
-		# As much as I liked how small and compact this was vs writing them out,
-		# it became hard to find out where the real problem was...
-		#
-		# # If there is an extra object in the test data, it's better to just delete
-		# # it and note it as wrong for being additional incorrect data.
-		# if true_object == "_":
-		#   self.__getattribute__(f"{test_object.asname()}_total").wrong += 1
-		#   self.error_description[f"part{self.true_part}_onset{self.true_onset}_not_aligned_{self.true_mu21_obj}"] = f"part{self.test_part}_onset{self.test_onset}_{self.test_mu21_obj}"  # noqa
-		# else:
-		#   for param in self._return_parameter_names(true_object.asname()):
-		#     try:
-		#       if true_object.__getattribute__(param.split("_")[-1]) == test_object.__getattribute__(param.split("_")[-1]):
-		#         self.__getattribute__(param).right += 1
-		#       else:
-		#         self.__getattribute__(param).wrong += 1
-		#         self.error_description[f"part{self.true_part}_onset{self.true_onset}_{param}_{self.true_mu21_obj}"] = f"part{self.test_part}_onset{self.test_onset}_{self.test_mu21_obj}"  # noqa
-		#     except AttributeError:
-		#       # If the object needs to be created, each parameter needs to be added individually, +1 error each.
-		#       self.__getattribute__(param).wrong += 1
-		#       self.error_description[f"part{self.true_part}_onset{self.true_onset}_{param}_{self.true_mu21_obj}"] = f"part{self.test_part}_onset{self.test_onset}_{self.test_mu21_obj}"  # noqa
-
-		if isinstance(true_object, NoteObject) and isinstance(test_object, NoteObject):
-			self._compare_expand_objects_same(true_object, test_object, "notes")
-
-			for i in true_object.articulation:
-				if i in test_object.articulation:
-					self.notes_articulation.right += 1
-				else:
-					out = (
-						f"{true_object.part}-{true_object.measure}-{true_object.onset}=>{test_object.part}"
-						f"-{test_object.measure}-{test_object.onset}"
-					)
-					try:
-						self.error_description["note_articulation"].append(out)
-					except KeyError:
-						self.error_description["note_articulation"] = [out]
-					self.notes_articulation.wrong += 1
-
-		elif (isinstance(true_object, NoteObject) and isinstance(test_object, str)) or (isinstance(true_object, str) and isinstance(test_object, NoteObject)):
-			self._compare_expand_objects_different(true_object, test_object, "notes")
-
-		elif isinstance(true_object, RestObject) and isinstance(test_object, RestObject):
-			self._compare_expand_objects_same(true_object, test_object, "rests")
-
-			for i in true_object.articulation:
-				if i in test_object.articulation:
-					self.rests_articulation.right += 1
-				else:
-					out = (
-						f"{true_object.part}-{true_object.measure}-{true_object.onset}=>{test_object.part}-"
-						f"{test_object.measure}-{test_object.onset}"
-					)
-					try:
-						self.error_description["rest_articulation"].append(out)
-					except KeyError:
-						self.error_description["rest_articulation"] = [out]
-					self.rests_articulation.wrong += 1
-
-		elif (isinstance(true_object, RestObject) and isinstance(test_object, str)) or (isinstance(true_object, str) and isinstance(test_object, RestObject)):
-			self._compare_expand_objects_different(true_object, test_object, "rests")
-
-		elif isinstance(true_object, TimeSignatureObject) and isinstance(test_object, TimeSignatureObject):
-			self._compare_expand_objects_same(true_object, test_object, "timeSignatures")
-
-		elif (isinstance(true_object, TimeSignatureObject) and isinstance(test_object, str)) or (isinstance(true_object, str) and isinstance(test_object, TimeSignatureObject)):
-			self._compare_expand_objects_different(true_object, test_object, "timeSignatures")
 
-		elif isinstance(true_object, KeySignatureObject) and isinstance(test_object, KeySignatureObject):
-			self._compare_expand_objects_same(true_object, test_object, "keySignatures")
-
-		elif (isinstance(true_object, KeySignatureObject) and isinstance(test_object, str)) or (isinstance(true_object, str) and isinstance(test_object, KeySignatureObject)):
-			self._compare_expand_objects_different(true_object, test_object, "keySignatures")
-
-		elif isinstance(true_object, ClefObject) and isinstance(test_object, ClefObject):
-			self._compare_expand_objects_same(true_object, test_object, "clefs")
-
-		elif (isinstance(true_object, ClefObject) and isinstance(test_object, str)) or (isinstance(true_object, str) and isinstance(test_object, ClefObject)):
-			self._compare_expand_objects_different(true_object, test_object, "clefs")
-
-		elif isinstance(true_object, SpannerObject) and isinstance(test_object, SpannerObject):
-			self._compare_expand_objects_same(true_object, test_object, "spanners")
-
-		elif (isinstance(true_object, SpannerObject) and isinstance(test_object, str)) or (isinstance(true_object, str) and isinstance(test_object, SpannerObject)):
-			self._compare_expand_objects_different(true_object, test_object, "spanners")
+		The category of each object is found in :data:`_COMPARED_CATEGORIES`. The properties
+		of the pairs of a category are compared as columns (see :mod:`mupix.columnar`), with
+		NumPy, a whole category at once. The errors are recorded pair by pair.
+		"""
+		true_categories = [_COMPARED_CATEGORIES.get(type(item)) for item in true_objects]
+		test_categories = [_COMPARED_CATEGORIES.get(type(item)) for item in test_objects]
+		true_gaps = [isinstance(item, str) for item in true_objects]
+		test_gaps = [isinstance(item, str) for item in test_objects]
+		# Arrays of (pair index, position in the pair) and of records, put back in the order of the pairs.
+		orders, records = [], []
+
+		pairs = list(enumerate(zip(true_categories, test_categories)))
+		for category in dict.fromkeys(true_categories + test_categories):
+			if category is None:
+				continue
+			plan = self._comparison_plan(category)
+			same = [index for index, (true_category, test_category) in pairs if true_category == category == test_category]
+			# An object of the category aligned with "_".
+			gaps = [
+				index for index, (true_category, test_category) in pairs
+				if (true_category == category and test_gaps[index]) or (test_category == category and true_gaps[index])
+			]
+			# The index of every aligned object in its category, MISSING for "_".
+			true_index, test_index = self.errors.positions(category, "true"), self.errors.positions(category, "test")
+			true_positions = numpy.array([true_index.get(id(item), MISSING) for item in true_objects], dtype=numpy.int64)
+			test_positions = numpy.array([test_index.get(id(item), MISSING) for item in test_objects], dtype=numpy.int64)
+
+			def record(indices, position, name):
+				indices = numpy.asarray(indices, dtype=numpy.int64)
+				orders.append(numpy.column_stack([indices, numpy.full(len(indices), position)]))
+				records.append(numpy.column_stack([
+					numpy.full(len(indices), self.errors.category_code(category)),
+					numpy.full(len(indices), self.errors.name_code(name)),
+					true_positions[indices],
+					test_positions[indices],
+				]))
+
+			same = numpy.array(same, dtype=numpy.int64)
+			if len(same):
+				marking_class = type(true_objects[same[0]])
+				compared = [_TICKS.get(property_, property_) for _, property_, _, _ in plan]
+				columns = compared
+				if self.confusion_matrices is not None:
+					# The confusion matrices count the values that are shown, the ticks of each file differ.
+					columns = list(dict.fromkeys(compared + [property_ for _, property_, _, _ in plan]))
+				true_rows = ColumnarCategory.from_markings(marking_class, [true_objects[index] for index in same], columns)
+				test_rows = ColumnarCategory.from_markings(marking_class, [test_objects[index] for index in same], columns)
+				for position, (result_parameter, property_, _, result) in enumerate(plan):
+					wrong = same[~true_rows.equal(test_rows, compared[position])]
+					result.right += len(same) - len(wrong)
+					result.wrong += len(wrong)
+					record(wrong, position, result_parameter)
+					if self.confusion_matrices is not None:
+						self.confusion_matrices.add_columns(result_parameter, property_, true_rows, test_rows)
+
+				if category in _ARTICULATED_CATEGORIES and f"{category}_articulation" not in self._do_not_count:
+					result = self.__getattribute__(f"{category}_articulation")
+					missing = []
+					for index in same.tolist():
+						true_object, test_object = true_objects[index], test_objects[index]
+						if true_object.articulation:
+							count = sum(i not in test_object.articulation for i in true_object.articulation)
+							result.right += len(true_object.articulation) - count
+							result.wrong += count
+							missing += [index] * count
+					record(missing, len(plan), f"{category[:-1]}_articulation")
+
+			for position, (parameter, _, _, result) in enumerate(plan):
+				result.wrong += len(gaps)
+				record(gaps, position, parameter)
+
+		if records:
+			orders, records = numpy.concatenate(orders), numpy.concatenate(records)
+			# Stable, by pair then by position in the pair.
+			self.errors.extend(records[numpy.lexsort((orders[:, 1], orders[:, 0]))])
 
 	def _object_split(self):
 		"""
-		Align Objects together by comparing voice, measure and onset.
+		Align Objects together by comparing voice, measure and onset. Objects
+		sharing the same part, measure, onset and voice are paired in order, see
+		:func:`mupix.extra.match_equal`.
 		"""
 		for obj in self._return_object_names():
-			for true_object in self.true_data.__getattribute__(obj):
-				for test_object in self.test_data.__getattribute__(obj):
-					if true_object == test_object:
-						self._compare(true_object, test_object)
+			pairs = match_equal(self.true_data.__getattribute__(obj), self.test_data.__getattribute__(obj))
+			self._compare_aligned([true_object for true_object, _ in pairs], [test_object for _, test_object in pairs])
 
 	def _total(self):
 		"""
@@ -492,13 +718,22 @@ class BaseCompareClass(MupixObject):
 		the part.
 		"""
 
-		try:
-			if self.notes_step.wrong > self.notes_name.wrong:
-				del self.notes_step
-			else:
-				del self.notes_name
-		except AttributeError:
-			self.error_description["Error"] = "Could not remove note_step or note_name"
+		# Only the step or the name of the notes is counted, unless one of them is left out already.
+		if not self._do_not_count & {"notes_step", "notes_name"}:
+			try:
+				if self.notes_step.wrong > self.notes_name.wrong:
+					del self.notes_step
+				else:
+					del self.notes_name
+			except AttributeError:
+				self.errors.messages["Error"] = "Could not remove note_step or note_name"
+
+		# Only the results that are shown have errors and a confusion matrix.
+		for name in ["notes_step", "notes_name"]:
+			if not hasattr(self, name):
+				self.errors.discard(name)
+				if self.confusion_matrices is not None:
+					self.confusion_matrices.matrices.pop(name, None)
 
 		for obj in self._return_object_names():
 			for params in self._return_parameter_names(obj):
@@ -509,9 +744,9 @@ class BaseCompareClass(MupixObject):
 
 			self.__getattribute__(obj).append(self.__getattribute__(f"{obj}_total"))
 
-		# Add the visualize file after the alignment
-		# TODO: Color all properties as they are found. {Working somewhat}
-		# TODO: Test what is shown to work and what isn't.
+		# Add the visualize file after the alignment, the errors are only colored when it is shown.
+		if self._visualize:
+			self._annotate_errors()
 		self.visualize = self.test_data.visualize
 
 	def _rebuild(self, aligned_data, unaligned_data):
@@ -550,7 +785,7 @@ class BaseCompareClass(MupixObject):
 
 			- Clefs           are aligned by measure number as a single char
 
-			- Spanners 				are aligned by spanner names
+			- Spanners        are paired by the measures they cover (see :func:`mupix.extra.match_intervals`)
 
 		:param [func]: A class that inherited from the SequenceAlignment class
 			which is defined in the sequence_alignment.py file.
@@ -564,8 +799,7 @@ class BaseCompareClass(MupixObject):
 
 		true_note_objects = self._rebuild(notes_anw.aligned_true_data, self.true_data.notes)
 		test_note_objects = self._rebuild(notes_anw.aligned_test_data, self.test_data.notes)
-		for index, objects in enumerate(true_note_objects):
-			self._compare(objects, test_note_objects[index])
+		self._compare_aligned(true_note_objects, test_note_objects)
 
 		# Rests
 		true_rests = [return_char_except(item.measure) for item in self.true_data.rests]
@@ -574,8 +808,7 @@ class BaseCompareClass(MupixObject):
 
 		true_rest_objects = self._rebuild(rests_anw.aligned_true_data, self.true_data.rests)
 		test_rest_objects = self._rebuild(rests_anw.aligned_test_data, self.test_data.rests)
-		for index, objects in enumerate(true_rest_objects):
-			self._compare(objects, test_rest_objects[index])
+		self._compare_aligned(true_rest_objects, test_rest_objects)
 
 		# Time Signature
 		true_timeSignatures = [return_char_except(item.measure) for item in self.true_data.timeSignatures]
@@ -584,8 +817,7 @@ class BaseCompareClass(MupixObject):
 
 		true_timeSignature_objects = self._rebuild(timeSignatures_anw.aligned_true_data, self.true_data.timeSignatures)
 		test_timeSignature_objects = self._rebuild(timeSignatures_anw.aligned_test_data, self.test_data.timeSignatures)
-		for index, objects in enumerate(true_timeSignature_objects):
-			self._compare(objects, test_timeSignature_objects[index])
+		self._compare_aligned(true_timeSignature_objects, test_timeSignature_objects)
 
 		# Key Signature
 		true_keySignatures = [return_char_except(item.measure) for item in self.true_data.keySignatures]
@@ -594,8 +826,7 @@ class BaseCompareClass(MupixObject):
 
 		true_keySignature_objects = self._rebuild(keySignatures_anw.aligned_true_data, self.true_data.keySignatures)
 		test_keySignature_objects = self._rebuild(keySignatures_anw.aligned_test_data, self.test_data.keySignatures)
-		for index, objects in enumerate(true_keySignature_objects):
-			self._compare(objects, test_keySignature_objects[index])
+		self._compare_aligned(true_keySignature_objects, test_keySignature_objects)
 
 		# Clefs
 		true_clefs = [return_char_except(item.measure) for item in self.true_data.clefs]
@@ -604,18 +835,11 @@ class BaseCompareClass(MupixObject):
 
 		true_clef_objects = self._rebuild(clef_anw.aligned_true_data, self.true_data.clefs)
 		test_clef_objects = self._rebuild(clef_anw.aligned_test_data, self.test_data.clefs)
-		for index, objects in enumerate(true_clef_objects):
-			self._compare(objects, test_clef_objects[index])
+		self._compare_aligned(true_clef_objects, test_clef_objects)
 
 		# Spanners
-		true_spanners = [item.name for item in self.true_data.spanners]
-		test_spanners = [item.name for item in self.test_data.spanners]
-		spanner_anw = func(true_spanners, test_spanners)
-
-		true_spanner_objects = self._rebuild(spanner_anw.aligned_true_data, self.true_data.spanners)
-		test_spanner_objects = self._rebuild(spanner_anw.aligned_test_data, self.true_data.spanners)
-		for index, objects in enumerate(true_spanner_objects):
-			self._compare(objects, test_spanner_objects[index])
+		pairs = match_intervals(self.true_data.spanners, self.test_data.spanners)
+		self._compare_aligned([true_spanner for true_spanner, _ in pairs], [test_spanner for _, test_spanner in pairs])
 
 	def sequence_alignment(self, func):
 		"""
@@ -632,49 +856,56 @@ class BaseCompareClass(MupixObject):
 		# Notes
 		true_notes = [item for item in self.true_data.notes]
 		test_notes = [item for item in self.test_data.notes]
-		notes_anw = func(true_notes, test_notes)
+		notes_anw = func(true_notes, test_notes, ignored=self._do_not_count)
 
 		true_note_objects = self._rebuild(notes_anw.aligned_true_data, self.true_data.notes)
 		test_note_objects = self._rebuild(notes_anw.aligned_test_data, self.test_data.notes)
-		for index, objects in enumerate(true_note_objects):
-			self._compare(objects, test_note_objects[index])
+		self._compare_aligned(true_note_objects, test_note_objects)
 
 		# Rests
 		true_rests = [item for item in self.true_data.rests]
 		test_rests = [item for item in self.test_data.rests]
-		rests_anw = func(true_rests, test_rests)
+		rests_anw = func(true_rests, test_rests, ignored=self._do_not_count)
 
 		true_rest_objects = self._rebuild(rests_anw.aligned_true_data, self.true_data.rests)
 		test_rest_objects = self._rebuild(rests_anw.aligned_test_data, self.test_data.rests)
-		for index, objects in enumerate(true_rest_objects):
-			self._compare(objects, test_rest_objects[index])
+		self._compare_aligned(true_rest_objects, test_rest_objects)
 
 		# Time Signature
 		true_timeSignatures = [item for item in self.true_data.timeSignatures]
 		test_timeSignatures = [item for item in self.test_data.timeSignatures]
-		timeSignatures_anw = func(true_timeSignatures, test_timeSignatures)
+		timeSignatures_anw = func(true_timeSignatures, test_timeSignatures, ignored=self._do_not_count)
 
 		true_timeSignature_objects = self._rebuild(timeSignatures_anw.aligned_true_data, self.true_data.timeSignatures)
 		test_timeSignature_objects = self._rebuild(timeSignatures_anw.aligned_test_data, self.test_data.timeSignatures)
-		for index, objects in enumerate(true_timeSignature_objects):
-			self._compare(objects, test_timeSignature_objects[index])
+		self._compare_aligned(true_timeSignature_objects, test_timeSignature_objects)
 
 		# Key Signature
 		true_keySignatures = [item for item in self.true_data.keySignatures]
 		test_keySignatures = [item for item in self.test_data.keySignatures]
-		keySignatures_anw = func(true_keySignatures, test_keySignatures)
+		keySignatures_anw = func(true_keySignatures, test_keySignatures, ignored=self._do_not_count)
 
 		true_keySignature_objects = self._rebuild(keySignatures_anw.aligned_true_data, self.true_data.keySignatures)
 		test_keySignature_objects = self._rebuild(keySignatures_anw.aligned_test_data, self.test_data.keySignatures)
-		for index, objects in enumerate(true_keySignature_objects):
-			self._compare(objects, test_keySignature_objects[index])
+		self._compare_aligned(true_keySignature_objects, test_keySignature_objects)
 
 		# Clefs
 		true_clefs = [item for item in self.true_data.clefs]
 		test_clefs = [item for item in self.test_data.clefs]
-		clef_anw = func(true_clefs, test_clefs)
+		clef_anw = func(true_clefs, test_clefs, ignored=self._do_not_count)
 
 		true_clef_objects = self._rebuild(clef_anw.aligned_true_data, self.true_data.clefs)
 		test_clef_objects = self._rebuild(clef_anw.aligned_test_data, self.test_data.clefs)
-		for index, objects in enumerate(true_clef_objects):
-			self._compare(objects, test_clef_objects[index])
+		self._compare_aligned(true_clef_objects, test_clef_objects)
+
+
+def countable_results() -> list:
+	"""
+	The names of the results a comparison can leave out with `do_not_count`.
+
+	For example:
+		['notes_accidental', 'notes_articulation', 'notes_beam', ..., 'dynamics_name', 'dynamics_onset']
+	"""
+	comparison = BaseCompareClass.__new__(BaseCompareClass)
+	comparison._create_results()
+	return [name for category in CATEGORIES for name in comparison._return_parameter_names(category)]
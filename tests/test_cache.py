@@ -0,0 +1,119 @@
+import os
+import shutil
+
+from click.testing import CliRunner
+import pytest
+
+from mupix.cache import (
+	ParseCache,
+	ground_truths,
+)
+from mupix.commands import cli
+from mupix.core import CATEGORIES
+from mupix.extra import __return_root_path
+from mupix.inputs import InputFile
+from mupix.typewise import MupixObject
+
+ROOT_DIR = __return_root_path() + "/tests/xml"
+true_file = ROOT_DIR + "/sheets/1-right.xml"
+test_file = ROOT_DIR + "/sheets/1-wrong.xml"
+
+
+def _no_parsing(*args, **kwargs):
+	raise AssertionError("The file should not be parsed.")
+
+
+def test_parse_cache(tmpdir, monkeypatch):
+	parse_cache = ParseCache(str(tmpdir))
+	parsed = MupixObject.from_filepath(true_file, detach=True, cache=parse_cache)
+	assert parse_cache.stats()["Entries"] == 1
+
+	monkeypatch.setattr(InputFile, "music21_score", _no_parsing)
+	cached = MupixObject.from_filepath(true_file, detach=True, cache=parse_cache)
+	assert cached == parsed
+	for category in CATEGORIES:
+		assert [item.asdict() for item in getattr(cached, category)] == [item.asdict() for item in getattr(parsed, category)]
+
+	# Objects that keep their music21 objects are never read from the cache.
+	with pytest.raises(AssertionError):
+		MupixObject.from_filepath(true_file, cache=parse_cache)
+
+
+def test_parse_cache_key(tmpdir):
+	parse_cache = ParseCache(str(tmpdir))
+	copy = str(tmpdir.join("copy.xml"))
+	shutil.copy(true_file, copy)
+	assert parse_cache.key(copy, reader="music21") == parse_cache.key(true_file, reader="music21")
+	assert parse_cache.key(copy, reader="lxml") != parse_cache.key(true_file, reader="music21")
+	assert parse_cache.key(test_file, reader="music21") != parse_cache.key(true_file, reader="music21")
+
+
+def test_parse_cache_eviction(tmpdir):
+	parse_cache = ParseCache(str(tmpdir))
+	MupixObject.from_filepath(true_file, detach=True, cache=parse_cache)
+	MupixObject.from_filepath(test_file, detach=True, cache=parse_cache)
+	entries = sorted(os.listdir(str(tmpdir)))
+	assert len(entries) == 2
+
+	# The ground truth is used again, the other file becomes the least recently used.
+	true_entry = parse_cache._path(parse_cache.key(true_file, reader="music21"))
+	test_entry = parse_cache._path(parse_cache.key(test_file, reader="music21"))
+	os.utime(test_entry, (0, 0))
+	os.utime(true_entry, (1, 1))
+	assert parse_cache.load(true_file, reader="music21") is not None
+
+	assert parse_cache.prune(max_bytes=os.path.getsize(true_entry)) == 1
+	assert os.path.exists(true_entry) and not os.path.exists(test_entry)
+	assert parse_cache.clear() == 1
+	assert parse_cache.stats()["Entries"] == 0
+
+
+def test_cli_cache(tmpdir):
+	runner = CliRunner()
+	cache_dir = str(tmpdir.join("cache"))
+	without_cache = runner.invoke(cli, ["-T", "compare", true_file, test_file])
+	# The ground truth would not be parsed again in this process otherwise.
+	ground_truths.clear()
+	with_cache = runner.invoke(cli, ["-T", "--cache-dir", cache_dir, "compare", true_file, test_file])
+	assert with_cache.exit_code == 0
+	assert with_cache.output == without_cache.output
+	again = runner.invoke(cli, ["-T", "--cache-dir", cache_dir, "compare", true_file, test_file])
+	assert again.output == without_cache.output
+
+	result = runner.invoke(cli, ["--cache-dir", cache_dir, "cache"])
+	assert result.exit_code == 0
+	assert "'Entries': 2" in result.output
+	result = runner.invoke(cli, ["--cache-dir", cache_dir, "cache", "--clear"])
+	assert "'Removed': 2" in result.output
+	assert runner.invoke(cli, ["cache"]).exit_code != 0
+
+
+def test_ground_truth_parsed_once(monkeypatch):
+	ground_truths.clear()
+	parsed = []
+	music21_score = InputFile.music21_score
+
+	def counting_music21_score(input_file):
+		parsed.append(input_file.filepath)
+		return music21_score(input_file)
+
+	monkeypatch.setattr(InputFile, "music21_score", counting_music21_score)
+	runner = CliRunner()
+	result = runner.invoke(cli, ["-T", "compare", true_file, test_file, test_file, true_file])
+	assert result.exit_code == 0
+	assert parsed.count(true_file) == 2  # Once as the ground truth, once as a test file.
+	assert parsed.count(test_file) == 2
+
+
+def test_ground_truth_isolation():
+	ground_truths.clear()
+	first = ground_truths.get(true_file, MupixObject.from_filepath, detach=True)
+	first.notes[0].measure = 100
+	first.notes.pop()
+	first.error_description["Error"] = "changed"
+
+	second = ground_truths.get(true_file, MupixObject.from_filepath, detach=True)
+	assert len(ground_truths) == 1
+	assert second.notes[0].measure == 1
+	assert len(second.notes) == len(first.notes) + 1
+	assert second.error_description == {}
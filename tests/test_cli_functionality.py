@@ -1,6 +1,7 @@
 # [TODO] This is only testing one file until many files can be generated
 # for tests
 import itertools
+import json
 
 from click.testing import CliRunner
 import pytest
@@ -11,6 +12,7 @@ from mupix.commands import (
 	cli,
 )
 from mupix.extra import __return_root_path
+from mupix.typewise import MupixObject
 
 ROOT_DIR = __return_root_path() + "/tests/xml"
 true_file = ROOT_DIR + "/sheets/1-right.xml"
@@ -65,3 +67,49 @@ def test_cli_compare():
 			for sort_option in sort_options:
 				result = runner.invoke(cli, [print_option, "compare", sort_option, true_file, test_file])
 				assert result.exit_code == 0
+
+
+def test_category_selection():
+	"""
+	Only the selected categories are extracted, and they are the same as when every category is.
+	"""
+	everything = MupixObject.from_filepath(true_file)
+	for reader in ["music21", "lxml"]:
+		selected = MupixObject.from_filepath(true_file, reader=reader, categories=["clefs", "notes"])
+		assert selected.rests == [] and selected.keySignatures == [] and selected.timeSignatures == []
+		assert [i.asdict() for i in selected.clefs] == [i.asdict() for i in everything.clefs]
+		# The key signatures are still used for the note steps.
+		assert [i.asdict() for i in selected.notes] == [i.asdict() for i in everything.notes]
+
+	with pytest.raises(ValueError):
+		MupixObject.from_filepath(true_file, categories=["notes", "lyrics"])
+
+
+@pytest.mark.parametrize("command", [["read", test_file], ["compare", true_file, test_file], ["compare", "--sort=anw", true_file, test_file]])
+def test_cli_category_selection(command):
+	"""
+	Selecting categories with flags gives the same output as filtering the whole output.
+	"""
+	runner = CliRunner()
+	everything = json.loads(runner.invoke(cli, ["-p"] + command).output)
+	for flags, categories in [("-pn", ["Notes"]), ("-pkc", ["KeySignatures", "Clefs"]), ("-prt", ["Rests", "TimeSignatures"])]:
+		result = runner.invoke(cli, [flags] + command)
+		assert result.exit_code == 0
+		assert json.loads(result.output) == {category: everything[category] for category in categories}
+
+
+def test_cli_do_not_count():
+	"""
+	The results that are not counted are left out, the others are the same.
+	"""
+	runner = CliRunner()
+	everything = json.loads(runner.invoke(cli, ["-pn", "compare", true_file, test_file]).output)["Notes"]
+	result = runner.invoke(cli, ["-pn", "compare", "--do-not-count", "notes_beam,notes_stemdirection", true_file, test_file])
+	assert result.exit_code == 0
+	notes = json.loads(result.output)["Notes"]
+	left_out = {"NoteBeamResult", "NoteStemDirectionResult"}
+	assert notes[:-1] == [item for item in everything[:-1] if item["name"] not in left_out]
+	assert notes[-1]["right"] + notes[-1]["wrong"] < everything[-1]["right"] + everything[-1]["wrong"]
+
+	result = runner.invoke(cli, ["compare", "--do-not-count", "notes_lyrics", true_file, test_file])
+	assert result.exit_code != 0
@@ -0,0 +1,99 @@
+import glob
+import operator
+
+import numpy
+import pytest
+
+from mupix.columnar import (
+	CATEGORIES,
+	ColumnarCategory,
+	ColumnarMupixObject,
+	note_steps,
+)
+from mupix.core import KeySignatureObject
+from mupix.extra import (
+	STEP_SEMITONES,
+	__return_root_path,
+	normalize_object_list,
+	tonic_semitones,
+)
+from mupix.typewise import MupixObject
+
+ROOT_DIR = __return_root_path() + "/tests/xml"
+test_files = sorted(glob.glob(ROOT_DIR + "/*/*.xml"))
+
+
+@pytest.mark.parametrize("filepath", test_files)
+def test_columnar_rows(filepath):
+	"""
+	The row views read like the Marking objects they were built from.
+	"""
+	output = MupixObject.from_filepath(filepath, detach=True)
+	columnar = ColumnarMupixObject.from_mupix_object(output)
+
+	for category in CATEGORIES:
+		markings = getattr(output, category)
+		rows = getattr(columnar, category)
+		assert len(rows) == len(markings)
+		assert [row.asdict() for row in rows] == [marking.asdict() for marking in markings]
+		assert list(rows) == markings
+		assert all(row.asname() == category for row in rows)
+
+	assert columnar.to_mupix_object() == output
+
+
+def test_columnar_sort_and_filter():
+	filepath = ROOT_DIR + "/read/reader.xml"
+	output = MupixObject.from_filepath(filepath, detach=True)
+	notes = ColumnarMupixObject.from_filepath(filepath).notes
+
+	# Same order as sorting the objects, onsets are sorted like strings.
+	expected = sorted(output.notes, key=operator.attrgetter("part", "measure", "onset"))
+	assert list(notes.sort("part", "measure", "onset")) == expected
+
+	upper = notes.filter(notes.values("octave") >= 5)
+	assert [row.asdict() for row in upper] == [note.asdict() for note in output.notes if note.octave >= 5]
+	assert notes[-1] == output.notes[-1]
+	assert len(notes[1:3]) == 2
+
+	with pytest.raises(ValueError):
+		notes.sort("beam")
+
+
+def test_columnar_equal():
+	true_notes = ColumnarMupixObject.from_filepath(ROOT_DIR + "/compare/ms_F_Lydian_quarter_true.xml").notes
+	test_notes = ColumnarMupixObject.from_filepath(ROOT_DIR + "/compare/ms_F_Lydian_quarter_test.xml").notes
+
+	for name in ["name", "octave", "beam", "step"]:
+		expected = [getattr(true, name) == getattr(test, name) for true, test in zip(true_notes, test_notes)]
+		assert true_notes.equal(test_notes, name).tolist() == expected
+	assert true_notes.equal(true_notes, "name").all()
+	numpy.testing.assert_array_equal(true_notes.codes("measure"), true_notes.values("measure"))
+
+
+@pytest.mark.parametrize("filepath", test_files)
+def test_note_steps(filepath):
+	output = MupixObject.from_filepath(filepath, detach=True)
+	columnar = ColumnarMupixObject.from_mupix_object(output)
+	# Like MupixObject.from_filepath, the steps come from the keys normalized to every measure.
+	keys = ColumnarCategory.from_markings(
+		KeySignatureObject,
+		normalize_object_list(list(output.keySignatures), max([0] + [note.measure for note in output.notes + output.rests]), output.parts),
+	)
+	expected = [-1 if note.step is None else note.step for note in output.notes]
+	assert note_steps(columnar.notes, keys).tolist() == expected
+
+
+def test_step_table():
+	"""
+	The lookup table gives the same steps as music21 intervals.
+	"""
+	from music21.interval import Interval
+	from music21.key import KeySignature
+	from music21.note import Note
+
+	for sharps in range(-7, 8):
+		tonic = KeySignature(sharps).asKey().tonic
+		for name in STEP_SEMITONES:
+			expected = Interval(noteStart=Note(tonic), noteEnd=Note(name)).semitones % 12
+			assert (STEP_SEMITONES[name] - tonic_semitones(tonic.name)) % 12 == expected
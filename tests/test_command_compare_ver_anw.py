@@ -1,7 +1,10 @@
 import pytest
 
-from mupix.application import SimpleNeedlemanWunsch
+from mupix.application import SimpleNeedlemanWunsch, WeightedNeedlemanWunsch
+from mupix.core import ClefObject, NoteObject
 from mupix.extra import __return_root_path
+from mupix.sequence_alignment import AdvancedAffineNeedlemanWunsch
+from mupix.typewise import _ARTICULATED_CATEGORIES, _COMPARED_CATEGORIES, BaseCompareClass
 
 # Test Files path
 ROOT_DIR = __return_root_path() + "/tests/xml"
@@ -44,3 +47,80 @@ def test_compare_anw_single_voice_notes_duration(load_single_voice_compare_resou
   # raise Exception(load_single_voice_compare_resources.notes[2])
   assert load_single_voice_compare_resources.notes[2].right == 8
   assert load_single_voice_compare_resources.notes[2].wrong == 0
+
+
+def _pairwise(self, true_objects, test_objects):
+  # A reference for _compare_aligned, the objects are compared one pair at a time.
+  def record(category, name, result, true_object, test_object):
+    result.wrong += 1
+    self.errors.add(
+      category, name, self.errors.index(true_object, category, "true"), self.errors.index(test_object, category, "test"),
+    )
+
+  for true_object, test_object in zip(true_objects, test_objects):
+    true_category = _COMPARED_CATEGORIES.get(type(true_object))
+    test_category = _COMPARED_CATEGORIES.get(type(test_object))
+    if true_category is not None and true_category == test_category:
+      for name, _, getter, result in self._comparison_plan(true_category):
+        if getter(true_object) == getter(test_object):
+          result.right += 1
+        else:
+          record(true_category, name, result, true_object, test_object)
+      if true_category in _ARTICULATED_CATEGORIES and f"{true_category}_articulation" not in self._do_not_count:
+        result = getattr(self, f"{true_category}_articulation")
+        for articulation in true_object.articulation:
+          if articulation in test_object.articulation:
+            result.right += 1
+          else:
+            # The errors are named after the singular ("note_articulation").
+            record(true_category, f"{true_category[:-1]}_articulation", result, true_object, test_object)
+      continue
+
+    # An object aligned with "_", all of its properties are wrong.
+    category = true_category if isinstance(test_object, str) else test_category if isinstance(true_object, str) else None
+    if category is not None:
+      for name, _, _, result in self._comparison_plan(category):
+        record(category, name, result, true_object, test_object)
+
+
+@pytest.mark.parametrize("compare_class", [SimpleNeedlemanWunsch, WeightedNeedlemanWunsch])
+@pytest.mark.parametrize("true_filepath,test_filepath", [
+  ("/compare/ms_F_Lydian_quarter_true.xml", "/compare/ms_F_Lydian_quarter_test.xml"),
+  ("/compare/content_test_ground_truth.xml", "/compare/content_test_wrong_rhythm.xml"),
+  ("/sheets/1-right.xml", "/sheets/1-wrong.xml"),
+])
+def test_compare_aligned_same_as_pairwise(compare_class, true_filepath, test_filepath, monkeypatch):
+  # Counting the aligned objects as columns gives the same results as comparing each pair.
+  vectorized = compare_class(ROOT_DIR + true_filepath, ROOT_DIR + test_filepath)
+  monkeypatch.setattr(BaseCompareClass, "_compare_aligned", _pairwise)
+  pairwise = compare_class(ROOT_DIR + true_filepath, ROOT_DIR + test_filepath)
+
+  for category in ["notes", "rests", "timeSignatures", "keySignatures", "clefs", "spanners"]:
+    assert getattr(vectorized, category) == getattr(pairwise, category)
+  assert list(vectorized.error_description.items()) == list(pairwise.error_description.items())
+
+
+def _note(step, octave=4):
+  note = NoteObject.from_values(
+    1, measure=1, onset="0.0", duration="1.0", voice=1, articulation=[], step=step, name=step, octave=octave,
+    accidental="", stemdirection="up", beam=set(), tiestyle=None, tietype=None, tieplacement=None,
+  )
+  note.onset_ticks, note.duration_ticks = 0, 12
+  return note
+
+
+def test_advanced_anw_scores_same_type_properties():
+  true, same, other_step = _note("C"), _note("C"), _note("D", octave=5)
+  clef = ClefObject.from_values(1, measure=1, onset="0.0", name="G", line=2, octave=0)
+  clef.onset_ticks = 0
+  alignment = AdvancedAffineNeedlemanWunsch([true], [same])
+
+  # Notes score their octave (1), step (4), duration (2) and accidental (1) on top of their position (25).
+  assert alignment.scoring_method(true, same) == 25 + 8
+  assert alignment.scoring_method(true, other_step) == 25 - 4 - 1 + 2 + 1
+  # Objects of different types only score their position.
+  assert alignment.scoring_method(true, clef) == 20 - 5
+
+  # The results that are not counted are not scored.
+  ignored = AdvancedAffineNeedlemanWunsch([true], [same], ignored=frozenset(["notes_step", "notes_octave"]))
+  assert ignored.scoring_method(true, same) == ignored.scoring_method(true, other_step) == 25 + 3
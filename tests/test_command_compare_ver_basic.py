@@ -2,6 +2,7 @@ import pytest
 
 from mupix.application import BasicCompare
 from mupix.extra import __return_root_path
+from mupix.partwise import PartiwiseCompareClass
 
 # Test Files path
 ROOT_DIR = __return_root_path() + "/tests/xml"
@@ -45,3 +46,53 @@ def test_compare_basic_single_voice_notes_duration(load_single_voice_compare_res
   # raise Exception(load_single_voice_compare_resources.notes[2])
   assert load_single_voice_compare_resources.notes[2].right == 8
   assert load_single_voice_compare_resources.notes[2].wrong == 0
+
+
+def test_compare_basic_comparison_plan(load_single_voice_compare_resources):
+  plan = load_single_voice_compare_resources._comparison_plan("notes")
+  # The plan is made once, with the Result objects that are counted.
+  assert load_single_voice_compare_resources._comparison_plan("notes") is plan
+  results = {name: result for name, _, _, result in plan}
+  assert "notes_total" not in results
+  assert results["notes_duration"] is load_single_voice_compare_resources.notes_duration
+
+
+def test_compare_basic_visualize_only_when_asked(load_single_voice_compare_resources):
+  # Nothing is kept for the visualization by default.
+  assert load_single_voice_compare_resources.visualize is None
+  assert all(note._music21_object is None for note in load_single_voice_compare_resources.test_data.notes)
+
+  visualized = BasicCompare(
+    true_filepath=ROOT_DIR + "/compare/ms_F_Lydian_quarter_true.xml",
+    test_filepath=test_file,
+    do_not_count=[],
+    visualize=True,
+  )
+  assert visualized.visualize is not None
+  colored = [index for index, note in enumerate(visualized.test_data.notes) if note._music21_object.style.color == "pink"]
+  assert colored == visualized.errors.test_indices("notes") and colored
+  assert visualized.notes[-1].wrong == load_single_voice_compare_resources.notes[-1].wrong
+
+
+def test_compare_basic_do_not_count():
+  left_out = ["notes_beam", "notes_stemdirection", "notes_duration"]
+  compared = BasicCompare(
+    true_filepath=ROOT_DIR + "/compare/ms_F_Lydian_quarter_true.xml",
+    test_filepath=test_file,
+    do_not_count=left_out,
+  )
+  assert not any(hasattr(compared, name) for name in left_out)
+  assert not set(left_out) & set(compared.error_description)
+  # The beams and stem directions are not extracted, the durations still place the notes in time.
+  assert all(note.beam is None and note.stemdirection is None for note in compared.test_data.notes)
+  assert all(note.duration is not None for note in compared.test_data.notes)
+
+  with pytest.raises(ValueError):
+    BasicCompare(ROOT_DIR + "/compare/ms_F_Lydian_quarter_true.xml", test_file, do_not_count=["notes_lyrics"])
+
+
+@pytest.mark.parametrize("options", [{"do_not_count": ["notes_lyrics"]}, {"visualize": True}, {"confusion": True}])
+def test_compare_partwise_options(options):
+  # The part-wise comparison checks its options like the other comparisons, instead of ignoring them.
+  with pytest.raises(ValueError):
+    PartiwiseCompareClass(ROOT_DIR + "/compare/ms_F_Lydian_quarter_true.xml", test_file, **options)
@@ -0,0 +1,49 @@
+from click.testing import CliRunner
+
+from mupix.commands import cli
+from mupix.extra import __return_root_path
+from mupix.index import CorpusIndex
+
+ROOT_DIR = __return_root_path() + "/tests/xml"
+true_file = ROOT_DIR + "/compare/ms_F_Lydian_quarter_true.xml"
+test_file = ROOT_DIR + "/compare/ms_F_Lydian_quarter_test.xml"
+corpus = [
+	true_file,
+	ROOT_DIR + "/compare/content_test_ground_truth.xml",
+	ROOT_DIR + "/read/key_signature.xml",
+	ROOT_DIR + "/read/time_signature.xml",
+	ROOT_DIR + "/sheets/1-right.xml",
+]
+
+
+def test_index_lookup(tmp_path):
+	corpus_index = CorpusIndex(str(tmp_path))
+	for f in corpus:
+		corpus_index.add(f)
+	corpus_index.save()
+
+	candidates = CorpusIndex.load(str(tmp_path)).lookup(test_file, top=2)
+	assert len(candidates) <= 2
+	assert candidates[0]["filepath"] == true_file
+
+
+def test_index_add_twice(tmp_path):
+	corpus_index = CorpusIndex(str(tmp_path))
+	corpus_index.add(true_file)
+	corpus_index.add(true_file)
+	assert len(corpus_index.filepaths) == 1
+	assert corpus_index.lookup(true_file)[0]["similarity"] == 1.0
+
+
+def test_cli_index_lookup(tmp_path):
+	runner = CliRunner()
+	result = runner.invoke(cli, ["index", str(tmp_path)] + corpus)
+	assert result.exit_code == 0
+
+	result = runner.invoke(cli, ["lookup", "--top=1", str(tmp_path), test_file])
+	assert result.exit_code == 0
+	assert true_file in result.output
+
+	result = runner.invoke(cli, ["-T", "lookup", "--compare", str(tmp_path), test_file])
+	assert result.exit_code == 0
+	assert "NoteTotalResult" in result.output
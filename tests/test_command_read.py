@@ -142,3 +142,45 @@ def test_voice_parse_xml():
 	assert voices[1].voice == 2
 	assert voices[2].voice == 3
 	assert voices[3].voice == 4
+
+
+def _is_evaluated(marking, name):
+	try:
+		object.__getattribute__(marking, name)
+	except AttributeError:
+		return False
+	return True
+
+
+def test_lazy_attributes():
+	"""
+	Properties that only depend on the music21 object are evaluated when they are first read.
+	"""
+	output = MupixObject.from_filepath(ROOT_DIR + "/compare/ms_F_Lydian_quarter_true.xml")
+	note = output.notes[0]
+	assert not _is_evaluated(note, "stemdirection")
+	assert note.stemdirection == "up"
+	assert _is_evaluated(note, "stemdirection")
+
+	clef = output.clefs[0]
+	assert not _is_evaluated(clef, "line")
+	assert clef.evaluate() is clef
+	assert _is_evaluated(clef, "line")
+	assert clef == output.clefs[0]
+
+
+def test_detached_objects():
+	"""
+	Detached objects hold the same values, without any reference to music21.
+	"""
+	filepath = ROOT_DIR + "/compare/ms_F_Lydian_quarter_true.xml"
+	output = MupixObject.from_filepath(filepath)
+	detached = MupixObject.from_filepath(filepath, detach=True)
+
+	assert detached.visualize is None
+	assert all(item._music21_object is None for item in detached.notes + detached.clefs)
+	assert [item.asdict() for item in detached.notes] == [item.asdict() for item in output.notes]
+	assert detached.notes == output.notes
+	assert not hasattr(detached.notes[0], "__dict__")
+	# Repeated values are shared
+	assert detached.notes[0].duration is detached.notes[1].duration
@@ -0,0 +1,56 @@
+import json
+
+from click.testing import CliRunner
+import numpy
+
+from mupix.application import BasicCompare, WeightedNeedlemanWunsch
+from mupix.commands import cli
+from mupix.confusion import ConfusionMatrices, ConfusionMatrix
+from mupix.extra import __return_root_path
+
+ROOT_DIR = __return_root_path() + "/tests/xml"
+true_file = ROOT_DIR + "/sheets/1-right.xml"
+test_file = ROOT_DIR + "/sheets/1-wrong.xml"
+
+
+def test_confusion_matrix_merge():
+	first = ConfusionMatrix()
+	first.add(first.codes(["1/2", "1/4", "1/2"]), first.codes(["1/2", "1/2", "1/4"]))
+	second = ConfusionMatrix()
+	second.add(second.codes(["1", "1/4"]), second.codes(["1", "1/4"]))
+
+	merged = sum([first, second])
+	assert merged.labels == ["1/2", "1/4", "1"]
+	assert merged.counts.tolist() == [[1, 1, 0], [1, 1, 0], [0, 0, 1]]
+	# The merged matrices are not changed.
+	assert first.counts.sum() == 3 and second.counts.sum() == 2
+	assert ConfusionMatrix.from_dict(json.loads(json.dumps(merged.asdict()))) == merged
+
+
+def test_confusion_matrices_match_results():
+	for compare_class in [BasicCompare, WeightedNeedlemanWunsch]:
+		comparison = compare_class(true_file, test_file, confusion=True)
+		matrices = comparison.confusion_matrices
+		for name in ["notes_duration", "notes_octave", "notes_accidental", "keySignatures_step", "clefs_name"]:
+			result = getattr(comparison, name)
+			# Only aligned pairs are counted, an object aligned with a gap is only wrong.
+			assert numpy.trace(matrices[name].counts) == result.right
+			assert matrices[name].counts.sum() <= result.right + result.wrong
+		# Only the step or the name of the notes is shown.
+		assert ("notes_step" in matrices) != ("notes_name" in matrices)
+		assert ConfusionMatrices.loads(matrices.dumps()) == matrices
+
+	assert BasicCompare(true_file, test_file).confusion_matrices is None
+
+
+def test_cli_confusion(tmpdir):
+	runner = CliRunner()
+	result = runner.invoke(cli, ["-pT", "compare", "--confusion", true_file, test_file])
+	assert result.exit_code == 0
+	confusion = json.loads(result.output)["Confusion"]
+	assert confusion["notes_duration"]["labels"]
+
+	tmpdir.join("results.json").write(result.output + result.output)
+	merged = json.loads(runner.invoke(cli, ["-p", "merge", str(tmpdir.join("results.json"))]).output)["Confusion"]
+	assert merged["notes_duration"]["labels"] == confusion["notes_duration"]["labels"]
+	assert [cell[2] for cell in merged["notes_duration"]["counts"]] == [2 * cell[2] for cell in confusion["notes_duration"]["counts"]]
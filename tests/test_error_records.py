@@ -0,0 +1,103 @@
+import collections
+import json
+
+from click.testing import CliRunner
+import numpy
+
+from mupix.application import BasicCompare, SimpleNeedlemanWunsch
+from mupix.commands import cli
+from mupix.core import CATEGORIES
+from mupix.error_records import MISSING, ErrorRecords
+from mupix.extra import __return_root_path
+from mupix.typewise import MupixObject
+
+ROOT_DIR = __return_root_path() + "/tests/xml"
+true_file = ROOT_DIR + "/sheets/1-right.xml"
+test_file = ROOT_DIR + "/sheets/1-wrong.xml"
+
+
+def test_records_grow():
+	data = MupixObject.from_filepath(true_file, detach=True)
+	errors = ErrorRecords(data, data, capacity=2)
+	for index in range(3):
+		errors.add("notes", "notes_step", index, index)
+	errors.extend(numpy.array([[0, errors.name_code("notes_octave"), 3, MISSING]] * 5))
+
+	assert len(errors) == 8
+	assert errors.records[:, 2].tolist() == [0, 1, 2, 3, 3, 3, 3, 3]
+	assert list(errors.descriptions()) == ["notes_step", "notes_octave"]
+	note = data.notes[3]
+	assert errors.descriptions()["notes_octave"][0] == f"{note.part}-{note.measure}-{note.onset}=>skip adjustment"
+	assert errors.asdicts()[-1]["test"] is None
+
+
+def test_records_are_formatted_on_demand(monkeypatch):
+	def fail(self):
+		raise AssertionError("The errors were formatted.")
+
+	monkeypatch.setattr(ErrorRecords, "descriptions", fail)
+	monkeypatch.setattr(ErrorRecords, "asdicts", fail)
+	runner = CliRunner()
+	result = runner.invoke(cli, ["-T", "compare", true_file, test_file])
+	assert result.exit_code == 0
+
+
+def test_records_match_descriptions():
+	for compare_class in [BasicCompare, SimpleNeedlemanWunsch]:
+		result = compare_class(true_file, test_file)
+		descriptions = result.error_description
+		records = result.errors.asdicts()
+		assert len(records) == len(result.errors) == sum(len(value) for value in descriptions.values())
+		assert collections.Counter(record["name"] for record in records) == {name: len(value) for name, value in descriptions.items()}
+
+		step = next(record for record in records if record["name"] == "keySignatures_step")
+		assert (step["true"]["value"], step["test"]["value"]) == ("C", "G")
+		assert step["true"]["part"] == 2 and step["true"]["index"] == 1
+
+
+def test_cli_error_records():
+	runner = CliRunner()
+	result = runner.invoke(cli, ["-zp", "compare", true_file, test_file])
+	assert result.exit_code == 0
+	records = json.loads(result.output[result.output.index("{"):])["ErrorDescription"]
+	assert records and all({"category", "name", "property", "true", "test"} <= set(record) for record in records)
+
+
+def test_error_density():
+	for compare_class in [BasicCompare, SimpleNeedlemanWunsch]:
+		result = compare_class(true_file, test_file)
+		first_measure, density = result.errors.density()
+		assert first_measure == 1
+		assert density.shape == (result.true_data.parts, max(note.measure for note in result.true_data.notes))
+		# The errors of the results that are not reported (notes_name or notes_step) are not counted.
+		assert density.sum() == sum(getattr(result, f"{category}_total").wrong for category in CATEGORIES)
+
+		records = result.errors.asdicts()
+		for category in ["notes", "keySignatures"]:
+			_, category_density = result.errors.density(category)
+			assert category_density.shape == density.shape
+			located = collections.Counter(
+				((record["true"] or record["test"])["part"], (record["true"] or record["test"])["measure"])
+				for record in records if record.get("category") == category
+			)
+			assert {(part + 1, measure + first_measure): count for (part, measure), count in numpy.ndenumerate(category_density) if count} == located
+
+
+def test_cli_error_density():
+	runner = CliRunner()
+	result = runner.invoke(cli, ["-pe", "compare", true_file, test_file])
+	assert result.exit_code == 0
+	density = json.loads(result.output[result.output.index("{"):])
+	assert list(density) == ["ErrorDensity"]
+	assert density["ErrorDensity"]["FirstMeasure"] == 1
+	totals = json.loads(runner.invoke(cli, ["-pT", "compare", true_file, test_file]).output)
+	assert sum(map(sum, density["ErrorDensity"]["Errors"])) == sum(category[0]["wrong"] for category in totals.values())
+
+
+def test_cli_error_records_total_only():
+	runner = CliRunner()
+	result = runner.invoke(cli, ["-zT", "compare", true_file, test_file])
+	assert result.exit_code == 0
+	# JSON even without -p, and the errors are not filtered like the results.
+	records = json.loads(result.output[result.output.index("{"):])["ErrorDescription"]
+	assert len([record for record in records if "category" in record]) == len(BasicCompare(true_file, test_file).errors)
@@ -0,0 +1,163 @@
+import operator
+
+from mupix.application import BasicCompare, SimpleNeedlemanWunsch
+import mupix.extra
+from mupix.core import ClefObject, NoteObject, SpannerObject, equality_key
+from mupix.extra import (
+	ContextTrack,
+	IntervalIndex,
+	__return_root_path,
+	align_ticks,
+	assign_ticks,
+	match_equal,
+	match_intervals,
+	normalize_object_list,
+)
+from mupix.typewise import MupixObject
+
+
+def _clef(part, measure, name="G"):
+	return ClefObject.from_values(part, measure=measure, onset="0.0", name=name, line=2, octave=0)
+
+
+def test_context_track_active():
+	clefs = [_clef(1, 3, "G"), _clef(1, 5, "F"), _clef(1, 5, "C"), _clef(2, 0, "F")]
+	track = ContextTrack(clefs, total_measures=8)
+
+	assert track.parts == [1, 2]
+	# Before the first clef of a part, the first clef acts.
+	assert track.active(1, 1).name == "G"
+	assert track.active(1, 4).name == "G"
+	# The last clef of a measure acts on the rest of the score.
+	assert track.active(1, 5).name == "C"
+	assert track.active(1, 8).name == "C"
+	assert track.active(1, 9) is None
+	assert track.active(2, 0).name == "F"
+	assert track.active(3, 1) is None
+
+
+def test_context_track_expand():
+	clefs = [_clef(1, 0, "F"), _clef(1, 3, "G"), _clef(1, 3, "C")]
+	expanded = list(ContextTrack(clefs, total_measures=5).expand(1))
+
+	assert [(clef.measure, clef.name) for clef in expanded] == [(0, "F"), (1, "F"), (2, "F"), (3, "G"), (3, "C"), (4, "C"), (5, "C")]
+	# The objects of the score are not copied.
+	assert expanded[0] is clefs[0] and expanded[3] is clefs[1]
+	assert expanded[1] is not clefs[0]
+	assert clefs[0].measure == 0
+
+
+def test_normalize_large_score():
+	clefs = [_clef(part, 1) for part in range(1, 31)] + [_clef(part, 250, "F") for part in range(1, 31)]
+	track = ContextTrack(clefs, total_measures=500)
+	# The track answers from the objects of the score, no object is made per measure.
+	assert all(
+		any(track.active(part, measure) is clef for clef in clefs[part - 1::30])
+		for part in range(1, 31) for measure in range(1, 501)
+	)
+
+	normalized = normalize_object_list(clefs, 500, 30)
+	assert len(normalized) == 30 * 500
+	assert [clef.part for clef in normalized] == sorted(clef.part for clef in normalized)
+
+
+def _spanner(part, measure, end, name="crescendo"):
+	return SpannerObject.from_values(part, measure=measure, end=end, onset="0.0", name=name, placement="below", length=15)
+
+
+def test_interval_index_overlapping():
+	spanners = [_spanner(1, 1, 8), _spanner(1, 2, 2), _spanner(1, 4, 5), _spanner(1, 9, 12), _spanner(2, 1, 12)]
+	index = IntervalIndex(spanners)
+
+	assert len(index) == 5
+	assert [(item.measure, item.end) for item in index.overlapping(1, 3, 4)] == [(1, 8), (4, 5)]
+	assert [(item.measure, item.end) for item in index.overlapping(1, 12, 20)] == [(9, 12)]
+	assert index.overlapping(1, 13, 20) == []
+	assert index.overlapping(3, 1, 1) == []
+
+
+def test_match_intervals():
+	true_spanners = [_spanner(1, 1, 2), _spanner(1, 3, 4, "diminuendo"), _spanner(1, 10, 10)]
+	test_spanners = [_spanner(1, 3, 3, "crescendo"), _spanner(1, 4, 6, "diminuendo"), _spanner(1, 2, 2), _spanner(2, 1, 2)]
+	pairs = match_intervals(true_spanners, test_spanners)
+
+	assert pairs == [
+		(true_spanners[0], test_spanners[2]),
+		# The same name is preferred to a larger overlap.
+		(true_spanners[1], test_spanners[1]),
+		(true_spanners[2], "_"),
+		("_", test_spanners[0]),
+		("_", test_spanners[3]),
+	]
+
+
+def test_spanners_extracted_once():
+	filepath = __return_root_path() + "/tests/xml/read/reader.xml"
+	for reader in ["music21", "lxml"]:
+		spanners = MupixObject.from_filepath(filepath, reader=reader).spanners
+		assert [(item.name, item.measure, item.end) for item in spanners] == [("crescendo", 1, 2), ("diminuendo", 3, 3)]
+
+	result = SimpleNeedlemanWunsch(filepath, filepath)
+	assert result.spanners_name.right == 2 and result.spanners_name.wrong == 0
+
+
+def _note(measure, onset, duration):
+	return NoteObject.from_values(
+		1, measure=measure, onset=onset, duration=duration, voice=1, articulation=[], step=0, name="C", octave=4,
+		accidental="", stemdirection="up", beam=set(), tiestyle=None, tietype=None, tieplacement=None,
+	)
+
+
+def test_assign_ticks():
+	notes = [_note(1, "10.0", "1.0"), _note(1, "2", "1/3"), _note(1, "0.3333333333333333", "0.25")]
+	assert assign_ticks(notes) == 12
+	assert [(note.onset_ticks, note.duration_ticks) for note in notes] == [(120, 12), (24, 4), (4, 3)]
+	# Onsets are sorted in musical order, not like strings.
+	assert [note.onset for note in sorted(notes, key=operator.attrgetter("measure", "onset_ticks"))] == [
+		"0.3333333333333333", "2", "10.0",
+	]
+	# The same time written differently is equal.
+	same = [_note(1, "2", "1/3"), _note(1, "2.0", "1/3")]
+	assign_ticks(same)
+	assert same[0] == same[1]
+	# Ticks are not shown.
+	assert "onset_ticks" not in notes[0].asdict() and "ticks" not in repr(notes[0])
+
+
+def test_align_ticks():
+	filepath = __return_root_path() + "/tests/xml/compare/content_test_ground_truth.xml"
+	triplets = MupixObject.from_filepath(filepath, detach=True)
+	quarters = MupixObject.from_filepath(__return_root_path() + "/tests/xml/compare/ms_F_Lydian_quarter_true.xml", detach=True)
+	assert (triplets.ticks_per_quarter, quarters.ticks_per_quarter) == (12, 1)
+	assert align_ticks(triplets, quarters) == 12
+	assert [note.onset_ticks for note in quarters.notes[:3]] == [0, 12, 24]
+
+	# "2" (after the triplets) and "2.0" are the same onset.
+	result = BasicCompare(filepath, __return_root_path() + "/tests/xml/compare/content_test_wrong_rhythm.xml")
+	assert (result.notes_duration.right, result.notes_duration.wrong) == (6, 1)
+
+
+def test_match_equal(monkeypatch):
+	true_clefs = [_clef(1, 1, "G"), _clef(1, 2, "F"), _clef(1, 2, "C"), _clef(2, 1, "F")]
+	test_clefs = [_clef(2, 1, "G"), _clef(1, 2, "G"), _clef(1, 3, "G")]
+	for clef in true_clefs + test_clefs:
+		clef.onset_ticks = 0
+
+	# Duplicate keys are paired in order, the extra objects are not paired.
+	assert [(true.name, test.name, test.part) for true, test in match_equal(true_clefs, test_clefs)] == [
+		("F", "G", 1), ("F", "G", 2),
+	]
+
+	clefs = [_clef(part, measure) for part in range(1, 31) for measure in range(1, 2001)]
+	for clef in clefs:
+		clef.onset_ticks = 0
+	# Each object is keyed once, a join that compares every pair would key it once per pair.
+	calls = []
+
+	def counted_key(cls):
+		key = equality_key(cls)
+		return lambda item: calls.append(item) or key(item)
+
+	monkeypatch.setattr(mupix.extra, "equality_key", counted_key)
+	assert len(match_equal(clefs, clefs[::-1])) == len(clefs)
+	assert len(calls) == 2 * len(clefs)
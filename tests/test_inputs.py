@@ -0,0 +1,119 @@
+import tarfile
+import zipfile
+
+from click.testing import CliRunner
+
+from mupix.application import xml_type_finder
+from mupix.commands import cli
+from mupix.extra import __return_root_path
+from mupix.inputs import InputFile, iter_input_files
+from mupix.typewise import MupixObject
+
+ROOT_DIR = __return_root_path() + "/tests/xml"
+test_file = ROOT_DIR + "/sheets/1-right.xml"
+
+TIMEWISE = """<?xml version="1.0" encoding="UTF-8"?>
+<score-timewise version="3.0">
+	<part-list><score-part id="P1"><part-name>Music</part-name></score-part></part-list>
+	<measure number="1"><part id="P1"></part></measure>
+</score-timewise>
+"""
+
+
+def test_header_sniffing():
+	input_file = InputFile.open(test_file)
+	assert input_file.encoding == "utf-8"
+	assert input_file.xml_type == "Partwise"
+	# The first software is the vendor.
+	assert input_file.software_vendor == ["Sibelius", "7.1.3"]
+	assert "<part-list>" in input_file.header
+	assert "<measure" not in input_file.header
+	assert InputFile.open(input_file) is input_file
+
+
+def test_timewise_and_encoding(tmpdir):
+	timewise = tmpdir.join("timewise.xml")
+	timewise.write_binary(TIMEWISE.replace("UTF-8", "UTF-16").encode("utf-16"))
+	input_file = InputFile.open(str(timewise))
+	assert input_file.encoding == "utf-16"
+	assert input_file.xml_type == "Timewise"
+	assert input_file.software_vendor == []
+	assert xml_type_finder(input_file) == "Timewise"
+
+
+def test_missing_software(tmpdir):
+	"""
+	Files without any <software> used to stop the parsing.
+	"""
+	with open(test_file, "r") as f:
+		data = "".join(line for line in f if "<software>" not in line)
+	no_software = tmpdir.join("no_software.xml")
+	no_software.write(data)
+
+	output = MupixObject.from_filepath(str(no_software))
+	assert output.software_vendor == []
+	assert output.notes == MupixObject.from_filepath(test_file).notes
+
+	result = CliRunner().invoke(cli, ["-T", "compare", test_file, str(no_software)])
+	assert result.exit_code == 0
+
+
+CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container>
+	<rootfiles>
+		<rootfile full-path="score/1-right.xml" media-type="application/vnd.recordare.musicxml+xml"/>
+	</rootfiles>
+</container>
+"""
+
+
+def _mxl(path):
+	with open(test_file, "rb") as f:
+		data = f.read()
+	with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+		archive.writestr("META-INF/container.xml", CONTAINER)
+		archive.writestr("score/1-right.xml", data)
+	return data
+
+
+def test_mxl(tmpdir):
+	mxl = str(tmpdir.join("1-right.mxl"))
+	data = _mxl(mxl)
+	input_file = InputFile.open(mxl)
+	assert input_file.data == data
+	assert input_file.xml_type == "Partwise"
+	assert list(iter_input_files(mxl))[0].data == data
+
+	expected = MupixObject.from_filepath(test_file)
+	for reader in ["music21", "lxml"]:
+		assert MupixObject.from_filepath(mxl, reader=reader).notes == expected.notes
+
+
+def test_archives(tmpdir):
+	mxl = str(tmpdir.join("1-right.mxl"))
+	data = _mxl(mxl)
+	zip_path = str(tmpdir.join("corpus.zip"))
+	with zipfile.ZipFile(zip_path, "w") as archive:
+		archive.write(test_file, "a/1-right.xml")
+		archive.write(mxl, "b/1-right.mxl")
+		archive.writestr("README.txt", "not a score")
+		archive.writestr("__MACOSX/a/._1-right.xml", "metadata")
+	tar_path = str(tmpdir.join("corpus.tar.gz"))
+	with tarfile.open(tar_path, "w:gz") as archive:
+		archive.add(test_file, "a/1-right.xml")
+		archive.add(mxl, "b/1-right.mxl")
+
+	for archive_path in [zip_path, tar_path]:
+		members = list(iter_input_files(archive_path))
+		assert [member.filepath for member in members] == [archive_path + "/a/1-right.xml", archive_path + "/b/1-right.mxl"]
+		assert all(member.data == data and member.container == archive_path for member in members)
+
+	runner = CliRunner()
+	result = runner.invoke(cli, ["xml_type", zip_path, test_file])
+	assert result.exit_code == 0
+	assert result.output.count("Partwise") == 3
+
+	expected = runner.invoke(cli, ["-T", "compare", test_file, test_file]).output
+	result = runner.invoke(cli, ["-T", "compare", mxl, tar_path])
+	assert result.exit_code == 0
+	assert result.output == expected * 2
@@ -0,0 +1,103 @@
+import glob
+
+from click.testing import CliRunner
+import pytest
+
+from mupix.application import SimpleNeedlemanWunsch
+from mupix.commands import cli
+from mupix.extra import __return_root_path
+from mupix.partwise import MupixPartwiseObject
+from mupix.typewise import MupixObject, in_selection
+
+ROOT_DIR = __return_root_path() + "/tests/xml"
+test_files = sorted(glob.glob(ROOT_DIR + "/*/*.xml"))
+categories = ["notes", "rests", "timeSignatures", "keySignatures", "clefs", "spanners", "dynamics"]
+
+
+@pytest.mark.parametrize("filepath", test_files)
+def test_lxml_reader_equivalence(filepath):
+	"""
+	Both readers must produce the same Mupix objects on the test corpus.
+	"""
+	music21_output = MupixObject.from_filepath(filepath)
+	lxml_output = MupixObject.from_filepath(filepath, reader="lxml")
+
+	for category in categories:
+		expected = [item.asdict() for item in getattr(music21_output, category)]
+		result = [item.asdict() for item in getattr(lxml_output, category)]
+		assert result == expected, category
+	assert lxml_output.parts == music21_output.parts
+	assert lxml_output.software_vendor == music21_output.software_vendor
+	assert lxml_output.visualize is None
+
+
+def test_lxml_reader_partwise():
+	filepath = ROOT_DIR + "/read/reader.xml"
+	music21_output = MupixPartwiseObject.from_filepath(filepath)
+	lxml_output = MupixPartwiseObject.from_filepath(filepath, reader="lxml")
+	for music21_part, lxml_part in zip(music21_output, lxml_output):
+		assert [i.asdict() for i in lxml_part] == [i.asdict() for i in music21_part]
+	assert len(lxml_output.parts) == len(music21_output.parts)
+
+
+def test_unknown_reader():
+	with pytest.raises(ValueError):
+		MupixObject.from_filepath(ROOT_DIR + "/read/reader.xml", reader="sax")
+
+
+def test_cli_reader():
+	runner = CliRunner()
+	filepath = ROOT_DIR + "/read/reader.xml"
+	music21_result = runner.invoke(cli, ["read", filepath])
+	lxml_result = runner.invoke(cli, ["read", "--reader=lxml", filepath])
+	assert lxml_result.exit_code == 0
+	assert lxml_result.output == music21_result.output
+
+	true_file = ROOT_DIR + "/sheets/1-right.xml"
+	test_file = ROOT_DIR + "/sheets/1-wrong.xml"
+	music21_result = runner.invoke(cli, ["-T", "compare", true_file, test_file])
+	lxml_result = runner.invoke(cli, ["-T", "compare", "--reader=lxml", true_file, test_file])
+	assert lxml_result.exit_code == 0
+	assert lxml_result.output == music21_result.output
+
+
+@pytest.mark.parametrize("measures, parts", [((3, 4), None), (None, [2]), ((2, 3), [1, 3]), ((4, 4), [3])])
+def test_measures_and_parts(measures, parts):
+	"""
+	Reading some measures of some parts gives the same objects as filtering the whole file.
+	"""
+	filepath = ROOT_DIR + "/read/reader.xml"
+	everything = MupixObject.from_filepath(filepath)
+	for reader in ["music21", "lxml"]:
+		selection = MupixObject.from_filepath(filepath, reader=reader, measures=measures, parts=parts)
+		for category in categories:
+			expected = [item.asdict() for item in getattr(everything, category) if in_selection(item, measures, parts)]
+			assert [item.asdict() for item in getattr(selection, category)] == expected, (reader, category)
+		assert selection.parts == everything.parts
+
+
+def test_cli_measures_and_parts():
+	runner = CliRunner()
+	filepath = ROOT_DIR + "/read/reader.xml"
+	result = runner.invoke(cli, ["-n", "read", "--reader=lxml", "--measures", "2-3", "--parts", "1,2", filepath])
+	assert result.exit_code == 0
+	assert "'measure': 1" not in result.output and "'part': 3" not in result.output
+
+	assert runner.invoke(cli, ["read", "--measures", "3-2", filepath]).exit_code != 0
+	assert runner.invoke(cli, ["read", "--parts", "one", filepath]).exit_code != 0
+
+	true_file = ROOT_DIR + "/sheets/1-right.xml"
+	result = runner.invoke(cli, ["-T", "compare", "--measures", "2", "--parts", "2", true_file, true_file])
+	assert result.exit_code == 0
+
+
+def test_lxml_reader_trailing_wedge():
+	"""
+	A wedge after the last note of a measure, with no note after it, is in that measure.
+	"""
+	filepath = ROOT_DIR + "/read/trailing_wedge.xml"
+	for reader in ["music21", "lxml"]:
+		spanners = MupixObject.from_filepath(filepath, reader=reader, measures=(1, 1)).spanners
+		assert [(spanner.measure, spanner.end) for spanner in spanners] == [(1, 1)]
+	comparison = SimpleNeedlemanWunsch(filepath, filepath, reader="lxml")
+	assert comparison.spanners[-1].wrong == 0
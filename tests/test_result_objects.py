@@ -0,0 +1,51 @@
+import json
+
+from click.testing import CliRunner
+import pytest
+
+from mupix.application import BasicCompare
+from mupix.commands import cli
+from mupix.extra import __return_root_path
+from mupix.result_objects import NoteStepResult, Result, ResultSet
+
+ROOT_DIR = __return_root_path() + "/tests/xml"
+true_file = ROOT_DIR + "/sheets/1-right.xml"
+test_file = ROOT_DIR + "/sheets/1-wrong.xml"
+
+
+def test_result_add():
+	first, second = NoteStepResult(), NoteStepResult()
+	first.right, first.wrong, second.right = 3, 1, 2
+	total = sum([first, second])
+	assert (total.right, total.wrong) == (5, 1) and isinstance(total, NoteStepResult)
+	# The added results are not changed.
+	assert (first.right, second.right) == (3, 2)
+	assert Result.from_dict(total.asdict()) == total
+
+	with pytest.raises(ValueError):
+		first + Result(name="NoteOctaveResult")
+
+
+def test_result_set_merge():
+	results = ResultSet.from_comparison(BasicCompare(true_file, test_file))
+	doubled = results + results
+	assert list(doubled.results) == list(results.results)
+	for category, category_results in results.results.items():
+		assert [(i.name, 2 * i.right, 2 * i.wrong) for i in category_results] == [
+			(i.name, i.right, i.wrong) for i in doubled.results[category]
+		]
+	# The order of the merged results does not matter.
+	assert sum([results, doubled]) == sum([doubled, results]) == results + results + results
+	assert ResultSet.loads(doubled.dumps()) == doubled
+
+
+def test_cli_merge(tmpdir):
+	runner = CliRunner()
+	output = runner.invoke(cli, ["-p", "compare", true_file, test_file, test_file]).output
+	tmpdir.join("results.json").write(output)
+
+	result = runner.invoke(cli, ["-pT", "merge", str(tmpdir.join("results.json"))])
+	assert result.exit_code == 0
+	expected = ResultSet.from_comparison(BasicCompare(true_file, test_file))
+	totals = json.loads(result.output)
+	assert totals["Notes"] == [(expected + expected).asdict()["Notes"][-1]]